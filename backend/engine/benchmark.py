@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the KMRL optimization engine
+Generates synthetic fleets in the train_induction_dataset.csv schema (25 to
+10,000 trainsets, 1 to 365 days), times each pipeline stage separately and
+writes the results as JSON. With a baseline file, stages that got slower
+than the tolerance are reported and the run exits non-zero.
+
+    python benchmark.py --trains 25 1000 --days 1 365 --output results.json
+    python benchmark.py --baseline results.json          # compare a later run
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+STAGES = [
+    'csv_load', 'preprocess_uploaded_data', 'create_derived_features', 'model_prediction',
+    'run_optimization', 'run_optimization_cached', 'scoring', 'enhanced_evaluate_individual', 'evaluate_population',
+    'training_planner_model', 'training_service_model'
+]
+
+DEFAULT_TOLERANCE = 0.25
+# Slowdowns smaller than this many seconds are treated as noise
+DEFAULT_MIN_DELTA = 0.005
+
+def generate_fleet(num_trains: int = 25, num_days: int = 1, start: str = '2024-01-01',
+                   seed: int = 0) -> pd.DataFrame:
+    """Synthetic daily fleet snapshots with the train_induction_dataset.csv columns.
+
+    Branding hours accumulate over the days and mileage grows with each
+    revenue day. Statuses follow fitness, job cards and the day's mileage
+    balance, so models trained on the data learn a usable signal.
+    """
+    rng = np.random.default_rng(seed)
+    rows = num_trains * num_days
+    train_id = np.tile(np.arange(1, num_trains + 1), num_days)
+    day = np.repeat(np.arange(num_days), num_trains)
+    dates = pd.Timestamp(start) + pd.to_timedelta(day, unit='D')
+
+    fit = rng.random((3, rows)) > 0.1
+    job_open = rng.random(rows) < 0.2
+    serviceable = fit.all(axis=0) & ~job_open
+
+    branding_hours = np.round(rng.uniform(0.05, 12.0, rows), 2)
+    # Contracted hours accumulated so far, per train
+    branding_total = np.round(
+        np.cumsum(branding_hours.reshape(num_days, num_trains), axis=0).ravel() * rng.uniform(0.8, 1.2, rows), 2
+    )
+    base_mileage = rng.uniform(20000, 100000, num_trains)
+    mileage = np.round(np.tile(base_mileage, num_days) + day * rng.uniform(0, 250, rows), 2)
+    daily_mean = mileage.reshape(num_days, num_trains).mean(axis=1).repeat(num_trains)
+    deviation = np.round(np.abs(mileage - daily_mean), 2)
+
+    cleaning_slot = np.where(rng.random(rows) < 0.15, rng.integers(1, 6, rows), 0)
+    stabling_bay = np.where(rng.random(rows) < 0.35, rng.integers(1, 11, rows), 0)
+    shunting = rng.choice([5, 15, 25, 35, 45, 55], rows)
+
+    high_mileage = deviation > np.percentile(deviation, 85) if rows else np.zeros(0, bool)
+    status = np.where(~serviceable, 'maintenance', np.where(high_mileage, 'standby', 'revenue'))
+    revenue = status == 'revenue'
+    sla_met = (branding_hours >= 8.0).astype(int)
+    score = np.where(serviceable, np.round(rng.uniform(30, 90, rows), 2), 0.0)
+
+    return pd.DataFrame({
+        'train_id': train_id,
+        'date': dates.strftime('%Y-%m-%d'),
+        'rolling_stock_fitness': fit[0],
+        'signalling_fitness': fit[1],
+        'telecom_fitness': fit[2],
+        'job_card_status': np.where(job_open, 'open', 'closed'),
+        'branding_hours': branding_hours,
+        'branding_total': branding_total,
+        'mileage': mileage,
+        'cleaning_slot': cleaning_slot,
+        'stabling_bay': stabling_bay,
+        'shunting_time_minutes': shunting,
+        'induction_status': status,
+        'induction_score': score,
+        'punctuality': np.where(revenue, (rng.random(rows) < 0.95).astype(float), 0.0),
+        'maintenance_cost': np.where(status == 'maintenance', np.round(rng.uniform(500, 5000, rows), 2), 0.0),
+        'sla_penalty': np.where(revenue & (sla_met == 0), 1000, 0),
+        'is_serviceable': serviceable.astype(int),
+        'branding_sla_met': sla_met,
+        'mileage_balance_deviation': deviation
+    })
+
+def time_stage(func: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, Any]:
+    """Run ``func`` ``repeat`` times after ``warmup`` untimed runs and summarize the wall-clock seconds"""
+    for _ in range(warmup):
+        func()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return {
+        'min': round(min(runs), 6),
+        'median': round(statistics.median(runs), 6),
+        'mean': round(statistics.fmean(runs), 6),
+        'runs': len(runs)
+    }
+
+def benchmark_case(num_trains: int, num_days: int, repeat: int = 3, skip_training: bool = False,
+                   individuals: int = 3, seed: int = 0) -> Dict[str, Any]:
+    """Time every stage on one synthetic fleet size"""
+    import model
+    from features import feature_engine
+    from model_bundle import write_bundle
+    from planner import prepare_day, train_planner_model
+    from python_optimization_service import MODEL_FEATURES, PythonOptimizationService
+    from scoring import build_results, compute_scores
+    from training_jobs import train_service_model
+
+    history = generate_fleet(num_trains, num_days, seed=seed)
+    day = history[history['date'] == history['date'].max()].reset_index(drop=True)
+    records = day.drop(columns=['date', 'induction_status']).to_dict('records')
+    stages: Dict[str, Dict[str, Any]] = {}
+
+    with tempfile.TemporaryDirectory(prefix='kmrl-bench-') as scratch:
+        csv_path = os.path.join(scratch, 'history.csv')
+        history.to_csv(csv_path, index=False)
+        stages['csv_load'] = time_stage(lambda: model.load_dataset(csv_path, use_cache=False), repeat)
+        typed = model.load_dataset(csv_path, use_cache=False)
+        # Without the training stages, the models are fitted on the last day only to save time
+        fit_on = typed[typed['date'] == typed['date'].max()] if skip_training else typed
+
+        # The service model is trained on the synthetic history, so no model files are needed
+        forest, scaler, encoder = train_service_model(fit_on)
+        bundle_path = os.path.join(scratch, 'service.bundle')
+        write_bundle(bundle_path, forest, MODEL_FEATURES, scaler=scaler, label_encoder=encoder,
+                     metadata={'kind': 'service', 'source': 'benchmark'})
+        service = PythonOptimizationService(bundle_path=bundle_path)
+
+        def cold(func):
+            # Time the computation, not a memoized feature lookup or result
+            def run():
+                feature_engine.cache.clear()
+                service.result_cache.clear()
+                return func()
+            return run
+
+        stages['preprocess_uploaded_data'] = time_stage(cold(lambda: service.preprocess_uploaded_data(records)), repeat)
+        df = service.preprocess_uploaded_data(records)
+        X = service.encode_features(df.copy())
+        stages['model_prediction'] = time_stage(lambda: service.model.predict(X), repeat)
+        predictions = service.model.predict(X)
+        stages['scoring'] = time_stage(lambda: build_results(compute_scores(df, predictions)), repeat)
+        stages['run_optimization'] = time_stage(cold(lambda: service.run_optimization(records)), repeat)
+        stages['run_optimization_cached'] = time_stage(lambda: service.run_optimization(records), repeat)
+
+        enhanced = model.EnhancedTrainInductionModel()
+        stages['create_derived_features'] = time_stage(cold(lambda: enhanced.create_derived_features(typed)), repeat)
+
+        # Training is slow next to the other stages, so it runs once per case
+        training = time_stage(lambda: train_planner_model(enhanced, fit_on, model_type='xgboost'), 1, warmup=0)
+        if not skip_training:
+            stages['training_planner_model'] = training
+            stages['training_service_model'] = time_stage(lambda: train_service_model(typed), 1, warmup=0)
+
+        df_day, feature_names = prepare_day(enhanced, day)
+        rng = random.Random(seed)
+        population = [rng.sample(range(len(df_day)), len(df_day)) for _ in range(individuals)]
+        stages['enhanced_evaluate_individual'] = time_stage(
+            lambda: [model.enhanced_evaluate_individual(ind, df_day, enhanced, enhanced.preprocessor, feature_names)
+                     for ind in population],
+            repeat
+        )
+        stages['evaluate_population'] = time_stage(
+            lambda: model.enhanced_evaluate_population(population, df_day, enhanced,
+                                                       enhanced.preprocessor, feature_names),
+            repeat
+        )
+
+    return {
+        'name': f'{num_trains}x{num_days}',
+        'trains': num_trains,
+        'days': num_days,
+        'rows': len(history),
+        'individuals': individuals,
+        'stages': {name: stages[name] for name in STAGES if name in stages}
+    }
+
+def environment() -> Dict[str, Any]:
+    import sklearn
+    import xgboost
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'xgboost': xgboost.__version__
+    }
+
+def run_benchmarks(trains: List[int], days: List[int], repeat: int = 3, skip_training: bool = False,
+                   individuals: int = 3, seed: int = 0) -> Dict[str, Any]:
+    """Benchmark every (trains, days) combination"""
+    cases = []
+    for num_trains in trains:
+        for num_days in days:
+            logger.info(f"Benchmarking {num_trains} trains x {num_days} days")
+            cases.append(benchmark_case(num_trains, num_days, repeat=repeat, skip_training=skip_training,
+                                        individuals=individuals, seed=seed))
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'repeat': repeat,
+        'environment': environment(),
+        'cases': cases
+    }
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any],
+                        tolerance: float = DEFAULT_TOLERANCE,
+                        min_delta: float = DEFAULT_MIN_DELTA) -> Dict[str, Any]:
+    """Fastest time of each stage against the baseline run with the same case name.
+
+    The minimum is the least noisy of the summaries. A stage regresses when it is more than ``tolerance`` (a fraction) and
+    more than ``min_delta`` seconds slower than the baseline.
+    """
+    baseline_cases = {case['name']: case for case in baseline.get('cases', [])}
+    comparisons = []
+    for case in results['cases']:
+        reference = baseline_cases.get(case['name'])
+        if reference is None:
+            continue
+        for stage, timing in case['stages'].items():
+            if stage not in reference['stages']:
+                continue
+            before, after = reference['stages'][stage]['min'], timing['min']
+            ratio = after / before if before > 0 else float('inf')
+            comparisons.append({
+                'case': case['name'],
+                'stage': stage,
+                'baseline': before,
+                'current': after,
+                'ratio': round(ratio, 3),
+                'regression': ratio > 1 + tolerance and after - before > min_delta
+            })
+    regressions = [c for c in comparisons if c['regression']]
+    return {
+        'tolerance': tolerance,
+        'min_delta': min_delta,
+        'compared': len(comparisons),
+        'regressions': regressions,
+        'stages': comparisons
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the KMRL optimization engine")
+    parser.add_argument('--trains', type=int, nargs='+', default=[25], help="fleet sizes (25-10000)")
+    parser.add_argument('--days', type=int, nargs='+', default=[30], help="history lengths in days (1-365)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage")
+    parser.add_argument('--individuals', type=int, default=3,
+                        help="assignments scored per enhanced_evaluate_individual run")
+    parser.add_argument('--skip-training', action='store_true', help="leave out the training stages and fit the models on the last day only")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the results JSON here (default: stdout)")
+    parser.add_argument('--baseline', help="compare against this earlier results JSON")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown as a fraction of the baseline's fastest run")
+    args = parser.parse_args(argv)
+
+    for value in args.trains:
+        if not 1 <= value <= 10000:
+            parser.error(f"--trains must be between 1 and 10000, got {value}")
+    for value in args.days:
+        if not 1 <= value <= 365:
+            parser.error(f"--days must be between 1 and 365, got {value}")
+
+    results = run_benchmarks(args.trains, args.days, repeat=args.repeat, skip_training=args.skip_training,
+                             individuals=args.individuals, seed=args.seed)
+    if args.baseline:
+        with open(args.baseline) as f:
+            results['comparison'] = compare_to_baseline(results, json.load(f), tolerance=args.tolerance)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    regressions = results.get('comparison', {}).get('regressions', [])
+    for regression in regressions:
+        logger.warning(f"Regression in {regression['case']} {regression['stage']}: "
+                       f"{regression['baseline']:.4f}s -> {regression['current']:.4f}s")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    # Logs go to stderr so stdout stays valid JSON
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
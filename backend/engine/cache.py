@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Bounded caches for the KMRL optimization engine
+"""
+
+import os
+import re
+import time
+import hashlib
+import json
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+_MISSING = object()
+# Expired result files are swept after this many disk writes
+DISK_PRUNE_EVERY = 64
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with hit/miss counters"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+class FitnessCache(LRUCache):
+    """
+    Memoized NSGA-II objectives.
+
+    Keys combine a scenario fingerprint (day data, ``min_revenue_trains``,
+    ``cleaning_slots``, ``depot_bays`` and ``weights``) with a canonical
+    byte encoding of the individual, so one cache can be shared across
+    generations, runs and scenarios.
+    """
+
+    def __init__(self, maxsize: int = 50000):
+        super().__init__(maxsize)
+
+    @staticmethod
+    def scenario_key(evaluator) -> str:
+        """Fingerprint of everything besides the individual that affects fitness"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(json.dumps({
+            'min_revenue_trains': evaluator.min_revenue_trains,
+            'cleaning_slots': evaluator.cleaning_slots,
+            'depot_bays': evaluator.depot_bays,
+            'weights': sorted((k, float(v)) for k, v in evaluator.weights.items())
+        }, sort_keys=True).encode())
+        for array in (evaluator.predictions, evaluator.serviceable, evaluator.mileage,
+                      evaluator.branding_deficit, evaluator.sla_cost, evaluator.shunting_cost,
+                      evaluator.fitness_gain, evaluator.efficiency_gain, evaluator.maintenance_cost,
+                      evaluator.bay_table, evaluator.cleaning_table):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def individual_key(individual) -> bytes:
+        """Canonical encoding of an individual's genes"""
+        return np.asarray(individual, dtype=np.int16).tobytes()
+
+    def lookup(self, scenario: str, individual) -> Optional[tuple]:
+        return self.get((scenario, self.individual_key(individual)))
+
+    def store(self, scenario: str, individual, fitness: tuple):
+        self.put((scenario, self.individual_key(individual)), tuple(fitness))
+
+class ResultCache:
+    """
+    Optimization responses keyed by model version and input digest.
+
+    Entries expire ``ttl`` seconds after they are stored and the least
+    recently used are evicted beyond ``maxsize``. Responses are kept as
+    JSON text and decoded on every hit, so no two callers share a nested
+    list or dict. With ``directory`` that text is also written there, so
+    it outlives the process and is shared by every process pointed at
+    the same directory. Keys
+    start with the model version, so a swapped model never sees the old
+    model's results; ``invalidate`` also drops them.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0, directory: Optional[str] = None):
+        self.memory = LRUCache(maxsize)
+        self.ttl = ttl
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory.maxsize > 0 or bool(self.directory)
+
+    @staticmethod
+    def digest(data) -> Optional[str]:
+        """Digest of a payload or frame, None when it cannot be hashed"""
+        digest = hashlib.blake2b(digest_size=16)
+        try:
+            if isinstance(data, pd.DataFrame):
+                digest.update(repr((list(data.columns), [str(t) for t in data.dtypes])).encode())
+                digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+            else:
+                # Exact rather than canonical, but several times faster than JSON;
+                # equal payloads that pickle differently only cost a miss
+                digest.update(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        except (TypeError, ValueError, AttributeError, pickle.PicklingError):
+            return None
+        return digest.hexdigest()
+
+    @staticmethod
+    def key(version: Optional[str], digest: Optional[str]) -> Optional[str]:
+        if digest is None:
+            return None
+        return f"{re.sub(r'[^A-Za-z0-9_.-]', '_', version or 'unversioned')}--{digest}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key: Optional[str], count_miss: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        A fresh copy of the cached response, or None.
+
+        ``count_miss=False`` is for a first, cheaper lookup that is followed
+        by another, so each request counts one hit or one miss.
+        """
+        if key is None or not self.enabled:
+            return None
+        now = time.time()
+        entry = self.memory.get(key)
+        response = json.loads(entry[1]) if entry is not None and entry[0] > now else None
+        if response is None and self.directory:
+            try:
+                if now - os.path.getmtime(self._path(key)) < self.ttl:
+                    with open(self._path(key)) as f:
+                        entry = (os.path.getmtime(self._path(key)) + self.ttl, f.read())
+                    response = json.loads(entry[1])
+                    self.memory.put(key, entry)
+            except (OSError, ValueError):
+                response = None
+        if response is None:
+            if count_miss:
+                self.misses += 1
+            return None
+        self.hits += 1
+        return response
+
+    def put(self, key: Optional[str], response: Dict[str, Any]):
+        if key is None or not self.enabled:
+            return
+        try:
+            text = json.dumps(response)
+        except (TypeError, ValueError):
+            return
+        self.memory.put(key, (time.time() + self.ttl, text))
+        if self.directory:
+            staging = f'{self._path(key)}.{os.getpid()}.tmp'
+            try:
+                with open(staging, 'w') as f:
+                    f.write(text)
+                os.replace(staging, self._path(key))
+            except OSError:
+                return
+            self._writes += 1
+            if self._writes % DISK_PRUNE_EVERY == 0:
+                self.prune()
+
+    def _sweep(self, drop):
+        if not self.directory:
+            return
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if drop(name, path):
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def prune(self):
+        """Delete expired disk entries"""
+        cutoff = time.time() - self.ttl
+        self._sweep(lambda name, path: os.path.getmtime(path) < cutoff)
+
+    def invalidate(self, version: Optional[str] = None):
+        """Drop every cached response; on disk, keep only those produced by ``version``"""
+        self.memory.clear()
+        prefix = self.key(version, '')
+        cutoff = time.time() - self.ttl
+        self._sweep(lambda name, path: not name.startswith(prefix) or os.path.getmtime(path) < cutoff)
+
+    def clear(self):
+        self.memory.clear()
+        self._sweep(lambda name, path: True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring, in the shape of ``LRUCache.stats``"""
+        lookups = self.hits + self.misses
+        return {
+            **self.memory.stats(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Derived induction features shared by training, serving and optimization
+All derived columns are computed in one vectorized pass over NumPy arrays and
+memoized by a content hash of the input frame, so repeated what-if runs and
+GA evaluations over the same day reuse one result.
+"""
+
+import hashlib
+import logging
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+DERIVED_FEATURES = [
+    'branding_efficiency', 'branding_deficit', 'branding_urgency',
+    'fitness_score', 'mileage_utilization', 'maintenance_urgency',
+    'cleaning_priority', 'bay_efficiency'
+]
+DATE_FEATURES = ['day_of_week', 'is_weekend']
+
+def _column(df: pd.DataFrame, name: str) -> np.ndarray:
+    # Flags may arrive as bool, where pandas would add True + True to True
+    return df[name].to_numpy(dtype=np.float64)
+
+def compute_derived_features(df: pd.DataFrame, include_date: bool = True) -> pd.DataFrame:
+    """Copy of ``df`` with the derived feature columns added.
+
+    With ``include_date`` and a ``date`` column, ``date`` is parsed and the
+    day-of-week features are added too.
+    """
+    branding_hours = _column(df, 'branding_hours')
+    branding_total = _column(df, 'branding_total')
+    mileage = _column(df, 'mileage')
+    stabling_bay = _column(df, 'stabling_bay')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        branding_efficiency = np.where(branding_total > 0, branding_hours / branding_total, 0)
+        bay_efficiency = np.where(stabling_bay > 0, 1 / stabling_bay, 0)
+    branding_deficit = np.clip(branding_total - branding_hours, 0, None)
+    branding_urgency = branding_deficit / (branding_total + 1e-6)
+    fitness_score = (
+        _column(df, 'rolling_stock_fitness') +
+        _column(df, 'signalling_fitness') +
+        _column(df, 'telecom_fitness')
+    ) / 3.0
+
+    columns = {
+        'branding_efficiency': branding_efficiency,
+        'branding_deficit': branding_deficit,
+        'branding_urgency': branding_urgency,
+        'fitness_score': fitness_score,
+        'mileage_utilization': mileage / (branding_total + 1e-6),
+        'maintenance_urgency': (
+            (1 - fitness_score) * 0.4 +
+            (_column(df, 'mileage_balance_deviation') / (mileage + 1e-6)) * 0.3 +
+            branding_urgency * 0.3
+        ),
+        'cleaning_priority': ((_column(df, 'cleaning_slot') == 0) &
+                              (_column(df, 'is_serviceable') == 1)).astype(int),
+        'bay_efficiency': bay_efficiency
+    }
+    if include_date and 'date' in df.columns:
+        dates = pd.to_datetime(df['date'])
+        day_of_week = dates.dt.dayofweek.to_numpy()
+        columns['date'] = dates
+        columns['day_of_week'] = day_of_week
+        columns['is_weekend'] = (day_of_week >= 5).astype(int)
+
+    # Existing columns are replaced in place, new ones appended in order
+    return df.assign(**columns)
+
+def derived_feature_names(df: pd.DataFrame) -> List[str]:
+    """Derived features present in a frame from ``compute_derived_features``"""
+    return DERIVED_FEATURES + (DATE_FEATURES if 'day_of_week' in df.columns else [])
+
+class FeatureEngine:
+    """
+    Memoizing front end to ``compute_derived_features``.
+
+    Results are keyed by a hash of the frame's values, index, column names
+    and dtypes, and kept in a bounded LRU cache. Frames over ``max_rows``
+    rows (training histories) are computed but not cached. Callers get a
+    deep copy, so neither new columns nor in-place edits reach a cached
+    frame, with or without pandas copy-on-write.
+    """
+
+    def __init__(self, maxsize: int = 64, max_rows: int = 50000):
+        self.cache = LRUCache(maxsize)
+        self.max_rows = max_rows
+
+    @staticmethod
+    def frame_key(df: pd.DataFrame, include_date: bool = True) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((include_date, list(df.columns), [str(t) for t in df.dtypes])).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def derive(self, df: pd.DataFrame, include_date: bool = True) -> pd.DataFrame:
+        if len(df) > self.max_rows:
+            return compute_derived_features(df, include_date)
+        try:
+            key = self.frame_key(df, include_date)
+        except TypeError:  # unhashable cells such as dicts
+            return compute_derived_features(df, include_date)
+
+        result = self.cache.get(key)
+        if result is None:
+            result = compute_derived_features(df, include_date)
+            self.cache.put(key, result)
+        return result.copy()
+
+# Process-wide engine used by the model, the planner and the service
+feature_engine = FeatureEngine()
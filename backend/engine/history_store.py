@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Date-partitioned columnar history store for KMRL induction data
+Snapshots keyed by (train_id, date) live in one directory per month, as
+Parquet files named after the first and last date they hold:
+
+    history/
+        month=2024-01/
+            2024-01-01_2024-01-31.parquet    compacted month
+        month=2024-02/
+            2024-02-01_2024-02-27.parquet
+            2024-02-28_2024-02-28.parquet    appended day
+
+Range reads open only the files whose dates overlap the range and read only
+the requested columns; appending a day writes one new file.
+"""
+
+import os
+import re
+import sys
+import glob
+import logging
+from datetime import date as Date
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from ingestion import apply_schema, read_history
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMNS = ['train_id', 'date']
+_FILE_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2})_(\d{4}-\d{2}-\d{2})\.parquet$')
+
+def _as_date(value) -> Date:
+    return pd.Timestamp(value).date()
+
+class HistoryStore:
+    """Month-partitioned Parquet history with date-range and train queries"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _month_dir(self, month: str) -> str:
+        return os.path.join(self.root, f'month={month}')
+
+    def files(self) -> List[Tuple[Date, Date, str]]:
+        """(first date, last date, path) of every data file, oldest first"""
+        entries = []
+        for path in glob.glob(os.path.join(self.root, 'month=*', '*.parquet')):
+            match = _FILE_PATTERN.match(os.path.basename(path))
+            if match:
+                entries.append((_as_date(match.group(1)), _as_date(match.group(2)), path))
+        return sorted(entries)
+
+    def date_range(self) -> Optional[Tuple[Date, Date]]:
+        """First and last stored date, from file names alone"""
+        entries = self.files()
+        if not entries:
+            return None
+        return entries[0][0], max(last for _, last, _ in entries)
+
+    def _overlapping(self, start=None, end=None) -> List[str]:
+        start = _as_date(start) if start is not None else Date.min
+        end = _as_date(end) if end is not None else Date.max
+        return [path for first, last, path in self.files() if first <= end and last >= start]
+
+    def read(self, start=None, end=None, train_ids: Optional[Iterable] = None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Rows with ``start <= date <= end`` (both optional), optionally
+        restricted to ``train_ids``. ``columns`` projects the read; the
+        ``train_id`` and ``date`` keys are always included.
+        """
+        if columns is not None:
+            columns = KEY_COLUMNS + [c for c in columns if c not in KEY_COLUMNS]
+        files = self._overlapping(start, end)
+        if not files:
+            return pd.DataFrame(columns=columns or KEY_COLUMNS)
+        return self._read_files(files, start, end, train_ids, columns)
+
+    def iter_chunks(self, start=None, end=None, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        """Like ``read``, one data file (at most a month) at a time"""
+        if columns is not None:
+            columns = KEY_COLUMNS + [c for c in columns if c not in KEY_COLUMNS]
+        for path in self._overlapping(start, end):
+            yield self._read_files([path], start, end, None, columns)
+
+    def _read_files(self, files, start, end, train_ids, columns) -> pd.DataFrame:
+        condition = None
+        if start is not None:
+            condition = ds.field('date') >= pa.scalar(pd.Timestamp(start), type=pa.timestamp('ns'))
+        if end is not None:
+            # Inclusive end date, whatever the time of day
+            upper = pa.scalar(pd.Timestamp(end).normalize() + pd.Timedelta(days=1), type=pa.timestamp('ns'))
+            condition = (ds.field('date') < upper) if condition is None else condition & (ds.field('date') < upper)
+        if train_ids is not None:
+            ids = ds.field('train_id').isin(list(train_ids))
+            condition = ids if condition is None else condition & ids
+
+        table = ds.dataset(files, format='parquet').to_table(columns=columns, filter=condition)
+        # Dictionary columns may differ per file, so restore the schema dtypes here
+        df = apply_schema(table.to_pandas(ignore_metadata=True))
+        return df.sort_values(KEY_COLUMNS[::-1], kind='stable').reset_index(drop=True)
+
+    def training_window(self, end=None, days: int = 90, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """The ``days`` most recent days up to ``end`` (default: the latest stored date)"""
+        if end is None:
+            stored = self.date_range()
+            if stored is None:
+                return self.read(columns=columns)
+            end = stored[1]
+        start = pd.Timestamp(end) - pd.Timedelta(days=days - 1)
+        return self.read(start=start, end=end, columns=columns)
+
+    def _write(self, df: pd.DataFrame, month: str):
+        first, last = _as_date(df['date'].min()), _as_date(df['date'].max())
+        directory = self._month_dir(month)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{first}_{last}.parquet')
+        staging = f'{path}.{os.getpid()}.tmp'
+        table = pa.Table.from_pandas(df.sort_values(['date', 'train_id'], kind='stable'), preserve_index=False)
+        pq.write_table(table, staging)
+        os.replace(staging, path)
+        return path
+
+    def _drop_dates(self, dates: set):
+        """Rewrite the files holding any of ``dates`` without those rows"""
+        for first, last, path in self.files():
+            if not any(first <= d <= last for d in dates):
+                continue
+            df = pd.read_parquet(path)
+            keep = ~df['date'].dt.date.isin(dates)
+            if keep.all():
+                continue
+            rewritten = None
+            if keep.any():
+                rewritten = self._write(df[keep], os.path.basename(os.path.dirname(path))[len('month='):])
+            if path != rewritten:
+                os.remove(path)
+
+    def append(self, df: pd.DataFrame, overwrite: bool = False) -> List[str]:
+        """Add snapshots (typically one day) as new files, one per month.
+
+        Dates that are already stored raise ValueError unless ``overwrite``
+        is set, in which case the files holding them are rewritten first.
+        """
+        if df.empty:
+            return []
+        df = apply_schema(df)
+        dates = set(df['date'].dt.date.unique())
+        stored = set()
+        for first, last, path in self.files():
+            if any(first <= d <= last for d in dates):
+                stored |= set(pd.read_parquet(path, columns=['date'])['date'].dt.date.unique()) & dates
+        if stored:
+            if not overwrite:
+                raise ValueError(f"History already holds {len(stored)} of these dates, "
+                                 f"first {min(stored)}; pass overwrite=True to replace them")
+            self._drop_dates(stored)
+
+        written = []
+        for month, part in df.groupby(df['date'].dt.strftime('%Y-%m'), sort=True):
+            written.append(self._write(part, month))
+        logger.info(f"Appended {len(df)} rows over {len(dates)} day(s) to {self.root}")
+        return written
+
+    def compact(self, month: Optional[str] = None) -> List[str]:
+        """Merge each month's files (or just ``month``'s) into one file"""
+        months = {}
+        for _, _, path in self.files():
+            name = os.path.basename(os.path.dirname(path))[len('month='):]
+            months.setdefault(name, []).append(path)
+        written = []
+        for name, paths in sorted(months.items()):
+            if (month is not None and name != month) or len(paths) < 2:
+                continue
+            merged = pd.concat([apply_schema(pd.read_parquet(p)) for p in paths], ignore_index=True)
+            # Write the merged file before removing its parts, so a crash never loses rows
+            target = self._write(merged, name)
+            for path in paths:
+                if path != target:
+                    os.remove(path)
+            written.append(target)
+        return written
+
+    def import_csv(self, path: str, overwrite: bool = False) -> List[str]:
+        """Load a history CSV into the store"""
+        return self.append(read_history(path), overwrite=overwrite)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) < 3:
+        print("Usage: python history_store.py <store_dir> <history.csv> [...]")
+        sys.exit(1)
+    store = HistoryStore(sys.argv[1])
+    for csv_path in sys.argv[2:]:
+        store.import_csv(csv_path)
+    store.compact()
+    print(store.date_range())
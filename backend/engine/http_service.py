@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Asyncio HTTP server for the KMRL optimization service
+Optimization requests that arrive within a short window are coalesced into
+one model prediction over all their rows (``run_batch``) and the results
+are split back per request. ``max_wait_ms`` caps the latency a request
+adds by waiting for others to join; ``max_batch_rows`` and
+``max_batch_requests`` cap the size of one prediction.
+
+    POST /optimize   JSON array, {"data": [...], "timings": true}, or an
+                     Arrow IPC / NumPy body (see payloads.py)
+    GET  /health     model state and queue depth
+    GET  /metrics    Prometheus exposition
+"""
+
+import io
+import sys
+import json
+import time
+import signal
+import asyncio
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import os
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+from instrumentation import StageTimer
+from payloads import Payload, PayloadError, read_stream
+from python_optimization_service import PythonOptimizationService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8081
+MAX_HEADER_LINES = 100
+MAX_BODY_BYTES = 512 * 2 ** 20
+DEFAULT_PARSE_WORKERS = min(4, os.cpu_count() or 1)
+
+# Content types of columnar request bodies
+BODY_FORMATS = {
+    'application/json': 'json',
+    'application/x-ndjson': 'jsonl',
+    'application/vnd.apache.arrow.stream': 'arrow',
+    'application/vnd.apache.arrow.file': 'arrow',
+    'application/x-npy': 'npy'
+}
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: Dict[str, List[str]]
+    headers: Dict[str, str]
+    body: bytes
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get('connection', '').lower() != 'close'
+
+class _Pending(NamedTuple):
+    data: Payload
+    timer: StageTimer
+    future: asyncio.Future
+    enqueued: float
+
+class MicroBatcher:
+    """
+    Coalesces concurrent optimization requests into shared predictions.
+
+    A batch starts with the oldest queued request and closes when it holds
+    ``max_batch_requests`` requests or ``max_batch_rows`` rows, or when that
+    request has waited ``max_wait_ms``. Batches run one at a time on a
+    dedicated thread, so requests arriving meanwhile form the next batch.
+    """
+
+    def __init__(self, service: PythonOptimizationService, max_batch_rows: int = 4096,
+                 max_batch_requests: int = 64, max_wait_ms: float = 5.0):
+        self.service = service
+        self.max_batch_rows = max_batch_rows
+        self.max_batch_requests = max_batch_requests
+        self.max_wait = max_wait_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='predict')
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=True)
+
+    async def submit(self, data: Payload, timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+        """Queue one request and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(_Pending(data, timer or StageTimer(), future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> List[_Pending]:
+        batch = [await self.queue.get()]
+        rows = len(batch[0].data)
+        deadline = batch[0].enqueued + self.max_wait
+        while rows < self.max_batch_rows and len(batch) < self.max_batch_requests:
+            timeout = deadline - time.perf_counter()
+            try:
+                # Past the deadline, still take whatever is already queued
+                item = self.queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self.queue.get(), timeout)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            batch.append(item)
+            rows += len(item.data)
+        return batch
+
+    def _predict(self, batch: List[_Pending]) -> List[Dict[str, Any]]:
+        # Between batches is the only point where a swap cannot split one
+        self.service.reload_if_changed()
+        now = time.perf_counter()
+        for item in batch:
+            item.timer.record('queue', now - item.enqueued)
+        return self.service.run_batch([item.data for item in batch], [item.timer for item in batch])
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            try:
+                results = await loop.run_in_executor(self.executor, self._predict, batch)
+            except Exception as e:
+                logger.error(f"Batch of {len(batch)} requests failed: {str(e)}")
+                results = [{'success': False, 'error': str(e)} for _ in batch]
+            for item, result in zip(batch, results):
+                if not item.future.done():
+                    item.future.set_result(result)
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Parse one HTTP/1.1 request, or None when the client closed the connection"""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _version = line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 'Malformed request line')
+
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, 'Too many headers')
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        raise HttpError(HTTPStatus.LENGTH_REQUIRED, 'Chunked bodies are not supported; send Content-Length')
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 'Invalid Content-Length')
+    if length > MAX_BODY_BYTES:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f'Body exceeds {MAX_BODY_BYTES} bytes')
+    body = await reader.readexactly(length) if length else b''
+    url = urlsplit(target)
+    return Request(method.upper(), url.path, parse_qs(url.query), headers, body)
+
+def write_response(writer: asyncio.StreamWriter, status: HTTPStatus, body: bytes,
+                   content_type: str = 'application/json', keep_alive: bool = True):
+    head = (f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+
+def parse_optimize_body(request: Request) -> Tuple[Payload, bool]:
+    """The payload of a POST /optimize and whether timings were asked for"""
+    timings = request.query.get('timings', ['0'])[0].lower() in ('1', 'true', 'yes')
+    content_type = request.headers.get('content-type', 'application/json').split(';')[0].strip().lower()
+    if content_type not in BODY_FORMATS:
+        raise HttpError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, f'Unsupported Content-Type {content_type}')
+
+    if content_type == 'application/json':
+        try:
+            body = json.loads(request.body)
+        except ValueError as e:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f'Invalid JSON: {str(e)}')
+        if isinstance(body, dict):
+            timings = timings or bool(body.get('timings'))
+            body = body.get('data')
+        if not isinstance(body, list):
+            raise HttpError(HTTPStatus.BAD_REQUEST, 'Expected a JSON array of train records')
+        return body, timings
+    try:
+        return read_stream(io.BufferedReader(io.BytesIO(request.body)), BODY_FORMATS[content_type]), timings
+    except PayloadError as e:
+        raise HttpError(HTTPStatus.BAD_REQUEST, str(e))
+
+class HttpOptimizationServer:
+    """HTTP front end of a PythonOptimizationService"""
+
+    def __init__(self, service: Optional[PythonOptimizationService] = None,
+                 parse_workers: int = DEFAULT_PARSE_WORKERS, **batch_options):
+        self.service = service or PythonOptimizationService()
+        self.batch_options = batch_options
+        # Bodies are decoded off the event loop, on threads apart from the predict thread
+        self.parse_executor = ThreadPoolExecutor(max_workers=parse_workers, thread_name_prefix='parse')
+        self.batcher: Optional[MicroBatcher] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.started_at = time.time()
+
+    async def start(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        self.batcher = MicroBatcher(self.service, **self.batch_options)
+        self.batcher.start()
+        self.server = await asyncio.start_server(self._connection, host, port)
+        logger.info(f"Serving optimizations on http://{host}:{self.server.sockets[0].getsockname()[1]}")
+        return self.server
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.batcher is not None:
+            await self.batcher.stop()
+        self.parse_executor.shutdown(wait=True)
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            'status': 'ok' if self.service.is_ready() else 'model_not_loaded',
+            'model_loaded': self.service.is_ready(),
+            'model_version': self.service.model_version,
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - self.started_at, 3),
+            'queued': self.batcher.queue.qsize() if self.batcher else 0
+        }
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    status, body, content_type = await self._dispatch(request)
+                except HttpError as e:
+                    metrics.ERRORS.inc(type='http_' + str(e.status.value))
+                    write_response(writer, e.status, json.dumps({'success': False, 'error': str(e)}).encode(),
+                                   keep_alive=False)
+                    await writer.drain()
+                    break
+                write_response(writer, status, body, content_type, request.keep_alive)
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: Request) -> Tuple[HTTPStatus, bytes, str]:
+        if request.path == '/optimize':
+            if request.method != 'POST':
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, 'Use POST /optimize')
+            timer = StageTimer()
+            with timer.stage('parse'):
+                data, timings = await asyncio.get_running_loop().run_in_executor(
+                    self.parse_executor, parse_optimize_body, request)
+            result = await self.batcher.submit(data, timer)
+            if timings:
+                result['timings'] = timer.report()
+            if result.get('success'):
+                status = HTTPStatus.OK
+            else:
+                status = HTTPStatus.SERVICE_UNAVAILABLE if not self.service.is_ready() else HTTPStatus.UNPROCESSABLE_ENTITY
+            return status, json.dumps(result).encode(), 'application/json'
+        if request.method != 'GET':
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, f'Use GET {request.path}')
+        if request.path == '/health':
+            return HTTPStatus.OK, json.dumps(self.health()).encode(), 'application/json'
+        if request.path == '/metrics':
+            return HTTPStatus.OK, metrics.registry.render().encode(), metrics.CONTENT_TYPE
+        raise HttpError(HTTPStatus.NOT_FOUND, f'No route for {request.path}')
+
+async def serve(host: str, port: int, **options):
+    """Serve until SIGINT or SIGTERM"""
+    app = HttpOptimizationServer(**options)
+    await app.start(host, port)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):  # Windows
+            pass
+    try:
+        await stop.wait()
+    finally:
+        await app.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="KMRL induction optimization HTTP server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('KMRL_HTTP_PORT', DEFAULT_PORT)))
+    parser.add_argument('--max-batch-rows', type=int, default=4096,
+                        help="rows that close a batch early (default: 4096)")
+    parser.add_argument('--max-batch-requests', type=int, default=64,
+                        help="requests that close a batch early (default: 64)")
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help="longest a request waits for others to join its batch (default: 5)")
+    parser.add_argument('--parse-workers', type=int, default=DEFAULT_PARSE_WORKERS,
+                        help=f"threads that decode request bodies (default: {DEFAULT_PARSE_WORKERS})")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(serve(args.host, args.port, parse_workers=args.parse_workers,
+                      max_batch_rows=args.max_batch_rows, max_batch_requests=args.max_batch_requests,
+                      max_wait_ms=args.max_wait_ms))
+
+if __name__ == "__main__":
+    main()
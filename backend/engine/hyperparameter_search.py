@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Budgeted hyperparameter search for the induction model
+Successive halving over randomly sampled candidates, bounded by a fit count
+and/or wall-clock budget, on a memory-mapped training matrix
+"""
+
+import os
+import math
+import time
+import logging
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterSampler, StratifiedKFold, train_test_split
+
+logger = logging.getLogger(__name__)
+
+def _fit_and_score(estimator, params, X, y, train, test, scorer):
+    """Fit one candidate on one fold and return its test score and fit time"""
+    start = time.time()
+    estimator = clone(estimator).set_params(**params)
+    estimator.fit(X[train], y[train])
+    return scorer(estimator, X[test], y[test]), time.time() - start
+
+class SharedTrainingMatrix:
+    """
+    Context manager that spills a training matrix to a temporary .npy file and
+    reopens it memory-mapped, so parallel workers share one on-disk copy
+    instead of each receiving a pickled array.
+    """
+
+    def __init__(self, X, directory: Optional[str] = None):
+        self.X = X
+        self.directory = directory
+        self.path = None
+
+    def __enter__(self):
+        if isinstance(self.X, np.memmap) or not isinstance(self.X, np.ndarray):
+            return self.X
+        handle, self.path = tempfile.mkstemp(suffix='.npy', dir=self.directory)
+        os.close(handle)
+        np.save(self.path, np.ascontiguousarray(self.X))
+        return np.load(self.path, mmap_mode='r')
+
+    def __exit__(self, *exc):
+        if self.path and os.path.exists(self.path):
+            try:
+                os.remove(self.path)
+            except OSError:  # still mapped on some platforms
+                logger.warning(f"Could not remove shared training matrix {self.path}")
+        return False
+
+class BudgetedSearch:
+    """
+    Successive-halving hyperparameter search with an explicit budget.
+
+    Each rung scores the surviving candidates with ``cv``-fold CV on a growing
+    stratified subsample, keeping the best ``1 / factor``; the last rung uses
+    all rows. The search stops early once ``max_fits`` or ``time_budget``
+    (seconds) would be exceeded, and picks the best candidate of the deepest
+    rung reached. Per-split scores are kept in ``cv_results_`` so the caller
+    does not need another cross-validation of the winner.
+    """
+
+    def __init__(self, estimator, param_distributions, n_candidates=27, factor=3,
+                 cv=5, scoring='f1_macro', max_fits=None, time_budget=None,
+                 min_resources=None, n_jobs=-1, random_state=42, refit=True):
+        self.estimator = estimator
+        self.param_distributions = param_distributions
+        self.n_candidates = n_candidates
+        self.factor = factor
+        self.cv = cv
+        self.scoring = scoring
+        self.max_fits = max_fits
+        self.time_budget = time_budget
+        self.min_resources = min_resources
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.refit = refit
+
+    def _candidates(self) -> List[Dict[str, Any]]:
+        grid_size = 1
+        for values in self.param_distributions.values():
+            grid_size = grid_size * len(values) if hasattr(values, '__len__') else math.inf
+        n_iter = int(min(self.n_candidates, grid_size))
+        return list(ParameterSampler(self.param_distributions, n_iter=n_iter,
+                                     random_state=self.random_state))
+
+    def _resources(self, n_samples, n_classes, n_rungs):
+        """Rows used at each rung, the last rung always uses every row"""
+        floor = self.min_resources or n_classes * self.cv * 10
+        smallest = max(floor, n_samples // (self.factor ** (n_rungs - 1)))
+        sizes = [min(n_samples, int(smallest * self.factor ** rung)) for rung in range(n_rungs)]
+        sizes[-1] = n_samples
+        return sizes
+
+    def _subsample(self, y, size):
+        if size >= len(y):
+            return np.arange(len(y))
+        indices, _ = train_test_split(np.arange(len(y)), train_size=size, stratify=y,
+                                      random_state=self.random_state)
+        return np.sort(indices)
+
+    def fit(self, X, y):
+        start = time.time()
+        y = np.asarray(y)
+        scorer = get_scorer(self.scoring)
+        candidates = self._candidates()
+        n_rungs = max(1, math.ceil(math.log(len(candidates), self.factor)) + 1) if len(candidates) > 1 else 1
+        resources = self._resources(len(y), len(np.unique(y)), n_rungs)
+        splitter = StratifiedKFold(n_splits=self.cv, shuffle=True, random_state=self.random_state)
+
+        self.cv_results_ = []
+        self.n_fits_ = 0
+        self.stopped_early_ = False
+        survivors = list(range(len(candidates)))
+        rung_time = None
+
+        with SharedTrainingMatrix(X) as X_shared:
+            for rung, n_resources in enumerate(resources):
+                elapsed = time.time() - start
+                if self.max_fits is not None:
+                    # Survivors are ranked, so keep the best ones the budget still allows
+                    affordable = (self.max_fits - self.n_fits_) // self.cv
+                    if affordable < len(survivors):
+                        self.stopped_early_ = True
+                        survivors = survivors[:max(affordable, 1 if rung == 0 else 0)]
+                over_time = (self.time_budget is not None and rung_time is not None
+                             and elapsed + rung_time * self.factor > self.time_budget)
+                if not survivors or over_time:
+                    self.stopped_early_ = True
+                    logger.info(f"Search budget reached after {self.n_fits_} fits in {elapsed:.1f}s")
+                    break
+
+                subset = self._subsample(y, n_resources)
+                folds = [(subset[train], subset[test]) for train, test in splitter.split(subset, y[subset])]
+                rung_start = time.time()
+                outcomes = Parallel(n_jobs=self.n_jobs)(
+                    delayed(_fit_and_score)(self.estimator, candidates[c], X_shared, y, train, test, scorer)
+                    for c in survivors for train, test in folds
+                )
+                rung_time = time.time() - rung_start
+                self.n_fits_ += len(outcomes)
+
+                rung_scores = {}
+                for position, c in enumerate(survivors):
+                    split = outcomes[position * self.cv:(position + 1) * self.cv]
+                    scores = np.array([score for score, _ in split])
+                    rung_scores[c] = scores.mean()
+                    self.cv_results_.append({
+                        'params': candidates[c],
+                        'rung': rung,
+                        'n_resources': n_resources,
+                        'split_scores': scores,
+                        'mean_test_score': scores.mean(),
+                        'std_test_score': scores.std(),
+                        'mean_fit_time': float(np.mean([t for _, t in split]))
+                    })
+
+                ranked = sorted(survivors, key=lambda c: rung_scores[c], reverse=True)
+                self.best_index_ = ranked[0]
+                self.best_rung_ = rung
+                if rung < len(resources) - 1:
+                    survivors = ranked[:max(1, math.ceil(len(ranked) / self.factor))]
+
+        best = [r for r in self.cv_results_ if r['rung'] == self.best_rung_ and r['params'] == candidates[self.best_index_]][0]
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = best['mean_test_score']
+        self.best_cv_scores_ = best['split_scores']
+        self.best_n_resources_ = best['n_resources']
+
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+            self.best_estimator_.fit(X, y)
+        self.elapsed_seconds_ = time.time() - start
+        logger.info(f"Budgeted search: {self.n_fits_} fits, {len(candidates)} candidates, "
+                    f"best {self.scoring}={self.best_score_:.3f} in {self.elapsed_seconds_:.1f}s")
+        return self
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Typed ingestion of KMRL induction history files
+Parses the train_induction_dataset*.csv files against an explicit schema and
+keeps a Parquet sidecar next to each CSV, so later loads skip CSV parsing
+until the source file changes.
+"""
+
+import os
+import hashlib
+import logging
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (parser engine and Parquet cache)
+    HAS_PYARROW = True
+except ImportError:  # fall back to the C parser without a cache
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+# Bump when the schema or the cleaning rules change, so old sidecars are ignored
+SCHEMA_VERSION = 1
+
+FLAG_COLUMNS = [
+    'rolling_stock_fitness', 'signalling_fitness', 'telecom_fitness',
+    'is_serviceable', 'branding_sla_met'
+]
+CATEGORY_COLUMNS = {
+    'job_card_status': ['closed', 'open'],
+    'induction_status': ['maintenance', 'revenue', 'standby']
+}
+# Empty slot/bay cells mean "none assigned"
+SLOT_COLUMNS = {'cleaning_slot': 'int8', 'stabling_bay': 'int8'}
+INTEGER_COLUMNS = {'shunting_time_minutes': 'int16', 'sla_penalty': 'int32'}
+FLOAT_COLUMNS = [
+    'branding_hours', 'branding_total', 'mileage', 'induction_score',
+    'punctuality', 'maintenance_cost', 'mileage_balance_deviation'
+]
+
+_TRUE = {'true', 't', 'yes', 'y', '1', '1.0'}
+_FALSE = {'false', 'f', 'no', 'n', '0', '0.0'}
+
+def sidecar_path(csv_path: str) -> str:
+    """Parquet cache that sits next to ``csv_path``"""
+    directory, name = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(directory, f'.{name}.parquet')
+
+def file_digest(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _to_flag(series: pd.Series) -> pd.Series:
+    """Normalize True/False, 1/0 and yes/no encodings to int8 0/1"""
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        return series.fillna(0).astype('int8')
+    text = series.astype(str).str.strip().str.lower()
+    flags = pd.Series(np.where(text.isin(_TRUE), 1, 0), index=series.index, dtype='int8')
+    unknown = ~(text.isin(_TRUE) | text.isin(_FALSE) | series.isna())
+    if unknown.any():
+        raise ValueError(f"Column {series.name} has non-boolean values: {sorted(text[unknown].unique())[:5]}")
+    return flags
+
+def _to_category(series: pd.Series, categories) -> pd.Series:
+    text = series.astype('string').str.strip().str.lower()
+    extra = sorted(set(text.dropna().unique()) - set(categories))
+    return text.astype(pd.CategoricalDtype(list(categories) + extra))
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Coerce a raw history frame to the engine's compact dtypes.
+
+    Flags become int8 0/1, statuses categoricals, empty cleaning slots and
+    stabling bays 0, and ``date`` a datetime. Measurements stay float64 so
+    models train on exactly the values in the file. Columns outside the
+    schema are left as parsed.
+    """
+    df = df.copy()
+    for column in FLAG_COLUMNS:
+        if column in df.columns:
+            df[column] = _to_flag(df[column])
+    for column, categories in CATEGORY_COLUMNS.items():
+        if column in df.columns:
+            df[column] = _to_category(df[column], categories)
+    for column, dtype in SLOT_COLUMNS.items():
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce').fillna(0).astype(dtype)
+    for column, dtype in INTEGER_COLUMNS.items():
+        if column in df.columns:
+            values = pd.to_numeric(df[column], errors='coerce')
+            df[column] = values.astype(dtype) if values.notna().all() else values.astype('float64')
+    for column in FLOAT_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('float64')
+    if 'train_id' in df.columns and pd.api.types.is_integer_dtype(df['train_id']):
+        df['train_id'] = df['train_id'].astype('int32')
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date']).astype('datetime64[ns]')
+    return df
+
+def parse_csv(source) -> pd.DataFrame:
+    """Parse a CSV path or file object with the fastest available engine"""
+    if HAS_PYARROW:
+        try:
+            return pd.read_csv(source, engine='pyarrow')
+        except Exception as e:  # ragged rows and other input the pyarrow parser rejects
+            logger.debug(f"pyarrow CSV parser failed ({e}), retrying with the C parser")
+            if hasattr(source, 'seek'):
+                source.seek(0)
+    return pd.read_csv(source)
+
+def _source_stamp(path: str) -> Dict[str, str]:
+    stat = os.stat(path)
+    return {'size': str(stat.st_size), 'mtime_ns': str(stat.st_mtime_ns)}
+
+def _read_sidecar(path: str, cache: str) -> Optional[pd.DataFrame]:
+    """Cached frame for ``path``, or None when the sidecar is missing or stale"""
+    import pyarrow.parquet as pq
+
+    if not os.path.exists(cache):
+        return None
+    try:
+        metadata = {k.decode(): v.decode() for k, v in (pq.read_schema(cache).metadata or {}).items()}
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable dataset cache {cache}: {e}")
+        return None
+    if metadata.get('kmrl.schema_version') != str(SCHEMA_VERSION):
+        return None
+    stamp = _source_stamp(path)
+    if all(metadata.get(f'kmrl.{key}') == value for key, value in stamp.items()):
+        return pd.read_parquet(cache)
+    digest = file_digest(path)
+    if metadata.get('kmrl.digest') != digest:
+        return None
+    # A touched but unchanged file keeps its cache; re-stamp it so the next load skips the hash
+    table = pq.read_table(cache)
+    _write_table(table, path, cache, digest)
+    return table.to_pandas()
+
+def _write_sidecar(df: pd.DataFrame, path: str, cache: str):
+    import pyarrow as pa
+
+    _write_table(pa.Table.from_pandas(df, preserve_index=False), path, cache, file_digest(path))
+
+def _write_table(table, path: str, cache: str, digest: str):
+    import pyarrow.parquet as pq
+
+    stamp = {f'kmrl.{key}': value for key, value in _source_stamp(path).items()}
+    stamp['kmrl.digest'] = digest
+    stamp['kmrl.schema_version'] = str(SCHEMA_VERSION)
+    stamp = {key.encode(): value.encode() for key, value in stamp.items()}
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **stamp})
+    staging = f'{cache}.{os.getpid()}.tmp'
+    try:
+        pq.write_table(table, staging)
+        os.replace(staging, cache)
+    except OSError as e:  # read-only checkout: serve uncached
+        logger.warning(f"Could not write dataset cache {cache}: {e}")
+        if os.path.exists(staging):
+            os.remove(staging)
+
+def read_history(source, use_cache: bool = True) -> pd.DataFrame:
+    """Load an induction history CSV with the engine's schema.
+
+    ``source`` may be a path or a file object (uploads are never cached).
+    For paths, a Parquet sidecar is reused while the CSV's size and mtime,
+    or failing that its content hash, are unchanged.
+    """
+    if not isinstance(source, (str, os.PathLike)):
+        return apply_schema(parse_csv(source))
+
+    path = os.fspath(source)
+    cache = sidecar_path(path)
+    if use_cache and HAS_PYARROW:
+        df = _read_sidecar(path, cache)
+        if df is not None:
+            logger.debug(f"Loaded {path} from cache {cache}")
+            return df
+
+    df = apply_schema(parse_csv(path))
+    if use_cache and HAS_PYARROW:
+        _write_sidecar(df, path, cache)
+    return df
+
+def iter_history(path: str, chunksize: int = 50000) -> Iterator[pd.DataFrame]:
+    """Typed chunks of a history CSV, for histories too large to load at once"""
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        yield apply_schema(chunk)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Request instrumentation for the KMRL optimization service
+StageTimer records wall-clock milliseconds per pipeline stage of one
+request; RequestProfiler runs a single request under cProfile and
+tracemalloc and writes a text report.
+"""
+
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import tempfile
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:  # Windows
+    HAS_RESOURCE = False
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR_ENV = 'KMRL_PROFILE_DIR'
+# Rows of each section in a profile report
+PROFILE_TOP = 40
+
+def max_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process so far, in MB"""
+    if not HAS_RESOURCE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 2)
+
+def rss_mb() -> Optional[float]:
+    """Current resident memory of this process in MB, or the peak where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident = int(f.read().split()[1])
+        return round(resident * os.sysconf('SC_PAGE_SIZE') / 2 ** 20, 2)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return max_rss_mb()
+
+class StageTimer:
+    """Per-stage wall-clock timings of one request, in milliseconds"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.rss_at_start = rss_mb()
+
+    def record(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds * 1000
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def report(self) -> Dict[str, Any]:
+        """The ``timings`` block of a response"""
+        report = {
+            'stages_ms': {name: round(ms, 3) for name, ms in self.stages.items()},
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'rss_delta_mb': None,
+            # Lifetime peak of the process, not of this request; it never falls in a long-lived worker
+            'process_peak_rss_mb': max_rss_mb()
+        }
+        current = rss_mb()
+        if current is not None and self.rss_at_start is not None:
+            report['rss_delta_mb'] = round(current - self.rss_at_start, 2)
+        if tracemalloc.is_tracing():
+            report['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 3)
+        return report
+
+def stage(timer: Optional[StageTimer], name: str):
+    """``timer.stage(name)``, or a no-op without a timer"""
+    return timer.stage(name) if timer is not None else nullcontext()
+
+def profile_path(target=True) -> str:
+    """Report path for ``target``: a file path, a directory, or True for the default directory"""
+    if isinstance(target, str) and not os.path.isdir(target):
+        return target
+    directory = target if isinstance(target, str) else os.environ.get(
+        PROFILE_DIR_ENV, os.path.join(tempfile.gettempdir(), 'kmrl-profiles'))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}.txt")
+
+class RequestProfiler:
+    """
+    Profile one request with cProfile and tracemalloc.
+
+    Used as a context manager; on exit the report (top functions by
+    cumulative time, then top allocation sites and the traced peak) is
+    written to ``path``.
+    """
+
+    def __init__(self, target=True, label: str = 'request'):
+        self.path = profile_path(target)
+        self.label = label
+        self.profiler = cProfile.Profile()
+        self._started_tracing = False
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        tracemalloc.reset_peak()
+        self.started = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.disable()
+        elapsed = time.perf_counter() - self.started
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._started_tracing:
+            tracemalloc.stop()
+
+        out = io.StringIO()
+        out.write(f"Profile of {self.label} at {datetime.now().isoformat(timespec='seconds')}, "
+                  f"{elapsed * 1000:.1f} ms\n\n")
+        stats = pstats.Stats(self.profiler, stream=out)
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+        out.write(f"\nMemory: peak {peak / 2 ** 20:.2f} MB traced, {current / 2 ** 20:.2f} MB still allocated\n")
+        for entry in snapshot.statistics('lineno')[:PROFILE_TOP]:
+            out.write(f"{entry}\n")
+
+        with open(self.path, 'w') as f:
+            f.write(out.getvalue())
+        logger.info(f"Wrote profile of {self.label} to {self.path}")
+        return False
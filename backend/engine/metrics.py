@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Prometheus-format metrics for the KMRL optimization engine
+A small in-process registry of counters, gauges and histograms rendered in
+the Prometheus text exposition format (version 0.0.4). Metrics can be
+scraped from a local HTTP port or written periodically to a file for the
+node_exporter textfile collector.
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: Tuple = ()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def values(self) -> Dict[Tuple, float]:
+        """Copy of every labelled value, keyed by label-value tuples"""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f'{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}'
+                                for k, v in items]
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum and count"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = (('le', _format_value(bound)),)
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+class MetricsRegistry:
+    """Named metrics plus collectors that report values at render time"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]):
+        """``collector()`` returns exposition lines, including HELP/TYPE"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        for collector in list(self._collectors):
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {str(e)}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        """Write the exposition atomically, for the node_exporter textfile collector"""
+        staging = f'{path}.{os.getpid()}.tmp'
+        with open(staging, 'w') as f:
+            f.write(self.render())
+        os.replace(staging, path)
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter('kmrl_requests_total', 'Optimization requests handled', ['outcome'])
+REQUEST_LATENCY = registry.histogram('kmrl_request_duration_seconds', 'End-to-end optimization request latency')
+STAGE_LATENCY = registry.histogram('kmrl_stage_duration_seconds', 'Optimization request latency per stage', ['stage'])
+BATCH_SIZE = registry.histogram('kmrl_request_trains', 'Trains per optimization request', buckets=BATCH_BUCKETS)
+PREDICTION_BATCH = registry.histogram('kmrl_prediction_batch_requests', 'Requests coalesced into one model prediction',
+                                      buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+ERRORS = registry.counter('kmrl_errors_total', 'Errors by type', ['type'])
+MODEL_LOADS = registry.counter('kmrl_model_loads_total', 'Model loads and reloads', ['outcome'])
+MODEL_LOAD_SECONDS = registry.gauge('kmrl_model_load_seconds', 'Duration of the most recent model load')
+MODEL_INFO = registry.gauge('kmrl_model_info', 'Currently served model version', ['version'])
+POOL_WORKERS = registry.gauge('kmrl_pool_workers', 'Forked workers by state', ['state'])
+POOL_QUEUED = registry.gauge('kmrl_pool_queued_requests', 'Requests waiting for an idle worker')
+WORKER_RESTARTS = registry.counter('kmrl_worker_restarts_total', 'Forked workers replaced', ['reason'])
+STARTED = registry.gauge('kmrl_process_start_time_seconds', 'Start time of the process since the epoch')
+STARTED.set(time.time())
+
+def observe_request(stages_ms: Dict[str, float], total_seconds: float, trains: int, success: bool):
+    """Record one optimization request"""
+    REQUESTS.inc(outcome='success' if success else 'error')
+    REQUEST_LATENCY.observe(total_seconds)
+    BATCH_SIZE.observe(trains)
+    for stage, ms in stages_ms.items():
+        STAGE_LATENCY.observe(ms / 1000, stage=stage)
+
+def observe_model_load(seconds: float, success: bool, version: Optional[str]):
+    MODEL_LOADS.inc(outcome='success' if success else 'error')
+    MODEL_LOAD_SECONDS.set(seconds)
+    if success:
+        MODEL_INFO.clear()
+        MODEL_INFO.set(1, version=version or 'unknown')
+
+_watched_caches: Dict[str, object] = {}
+
+def watch_cache(name: str, cache):
+    """Report an LRUCache's counters and hit ratio under ``cache="name"``"""
+    first = not _watched_caches
+    _watched_caches[name] = cache
+    if first:
+        registry.add_collector(_collect_caches)
+
+def _collect_caches() -> List[str]:
+    fields = [
+        ('hits', 'counter', 'Cache lookups that found an entry'),
+        ('misses', 'counter', 'Cache lookups that found nothing'),
+        ('evictions', 'counter', 'Entries evicted to respect the size bound'),
+        ('size', 'gauge', 'Entries currently cached'),
+        ('hit_ratio', 'gauge', 'Hits over lookups since start')
+    ]
+    stats = {name: cache.stats() for name, cache in sorted(_watched_caches.items())}
+    lines = []
+    for field, kind, documentation in fields:
+        metric = f'kmrl_cache_{field}' + ('_total' if kind == 'counter' else '')
+        lines += [f'# HELP {metric} {documentation}', f'# TYPE {metric} {kind}']
+        lines += [f'{metric}{{cache="{_escape(name)}"}} {_format_value(values[field])}'
+                  for name, values in stats.items()]
+    return lines
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = registry
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+def start_http_server(port: int, addr: str = '127.0.0.1',
+                      metrics_registry: MetricsRegistry = registry) -> ThreadingHTTPServer:
+    """Serve ``/metrics`` from a daemon thread; call ``shutdown()`` to stop"""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': metrics_registry})
+    server = ThreadingHTTPServer((addr, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f"Serving metrics on http://{addr}:{server.server_address[1]}/metrics")
+    return server
+
+def make_http_server(port: int, addr: str = '127.0.0.1',
+                     metrics_registry: MetricsRegistry = registry, timeout: float = 5.0) -> HTTPServer:
+    """A single-threaded ``/metrics`` server for a caller's own event loop.
+
+    Call ``handle_request()`` when ``server.socket`` is readable. Processes
+    that fork use this instead of ``start_http_server``, since a thread
+    holding a lock at fork time would leave it locked in the child.
+    ``timeout`` bounds how long a slow client can hold the loop.
+    """
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': metrics_registry, 'timeout': timeout})
+    server = HTTPServer((addr, port), handler)
+    server.timeout = 0
+    logger.info(f"Serving metrics on http://{addr}:{server.server_address[1]}/metrics")
+    return server
+
+class FileExporter:
+    """Rewrite a metrics file every ``interval`` seconds until stopped"""
+
+    def __init__(self, path: str, interval: float = 15.0, metrics_registry: MetricsRegistry = registry):
+        self.path = path
+        self.interval = interval
+        self.registry = metrics_registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-file', daemon=True)
+
+    def start(self) -> 'FileExporter':
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def export(self):
+        try:
+            self.registry.write(self.path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {self.path}: {str(e)}")
+
+    def stop(self):
+        """Stop the thread and write a final snapshot"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.export()
@@ -9,6 +9,10 @@ from sklearn.pipeline import Pipeline
 from sklearn.metrics import classification_report, f1_score
 from xgboost import XGBClassifier
 from deap import base, creator, tools, algorithms
+from hyperparameter_search import BudgetedSearch, SharedTrainingMatrix
+from tree_predictor import compile_ensemble, verify
+from ingestion import read_history
+from features import feature_engine, derived_feature_names
 import random
 import pickle
 import logging
@@ -26,9 +30,16 @@ DEFAULT_CLEANING_SLOTS = 5
 DEFAULT_DEPOT_BAYS = 10
 DEFAULT_MIN_REVENUE_TRAINS = 15
 
+_MISSING_CATEGORY = object()
+
+def _category_list(seen):
+    """Sorted one-hot categories, NaN last as OneHotEncoder requires"""
+    return sorted(seen - {_MISSING_CATEGORY}) + ([np.nan] if _MISSING_CATEGORY in seen else [])
+
 class EnhancedTrainInductionModel:
     def __init__(self):
         self.model = None
+        self.predictor = None
         self.scaler = None
         self.preprocessor = None
         self.feature_names = []
@@ -40,58 +51,13 @@ class EnhancedTrainInductionModel:
             'cleaning_slot', 'stabling_bay', 'mileage_balance_deviation'
         ]
         self.derived_features = []
+        self.cv_scores = None
         
     def create_derived_features(self, df):
         """Create advanced derived features for better model performance"""
-        df = df.copy()
-        
-        # Branding efficiency metrics
-        df['branding_efficiency'] = np.where(
-            df['branding_total'] > 0,
-            df['branding_hours'] / df['branding_total'],
-            0
-        )
-        df['branding_deficit'] = (df['branding_total'] - df['branding_hours']).clip(lower=0)
-        df['branding_urgency'] = df['branding_deficit'] / (df['branding_total'] + 1e-6)
-        
-        # Fitness composite score
-        df['fitness_score'] = (
-            df['rolling_stock_fitness'] + 
-            df['signalling_fitness'] + 
-            df['telecom_fitness']
-        ) / 3.0
-        
-        # Maintenance urgency indicators
-        df['mileage_utilization'] = df['mileage'] / (df['branding_total'] + 1e-6)
-        df['maintenance_urgency'] = (
-            (1 - df['fitness_score']) * 0.4 +
-            (df['mileage_balance_deviation'] / (df['mileage'] + 1e-6)) * 0.3 +
-            (df['branding_urgency']) * 0.3
-        )
-        
-        # Operational constraints
-        df['cleaning_priority'] = ((df['cleaning_slot'] == 0) & (df['is_serviceable'] == 1)).astype(int)
-        df['bay_efficiency'] = np.where(
-            df['stabling_bay'] > 0,
-            1 / (df['stabling_bay']),  # Lower bay numbers are more efficient
-            0
-        )
-        
-        # Time-based features (if date available)
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'])
-            df['day_of_week'] = df['date'].dt.dayofweek
-            df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
-        
-        self.derived_features = [
-            'branding_efficiency', 'branding_deficit', 'branding_urgency',
-            'fitness_score', 'mileage_utilization', 'maintenance_urgency',
-            'cleaning_priority', 'bay_efficiency'
-        ]
-        
-        if 'day_of_week' in df.columns:
-            self.derived_features.extend(['day_of_week', 'is_weekend'])
-            
+        # Shared with serving and the optimizer, memoized per frame
+        df = feature_engine.derive(df)
+        self.derived_features = derived_feature_names(df)
         return df
 
     def build_preprocessor(self):
@@ -140,62 +106,179 @@ class EnhancedTrainInductionModel:
             
         return X_processed
 
-    def train_model(self, X, y, model_type='xgboost', tune_hyperparams=True):
-        """Train with choice of model and hyperparameter tuning"""
+    def preprocess_streaming(self, chunks, out_path, target='induction_status', label_map=None):
+        """Streaming counterpart of ``preprocess_data(training=True)`` for large histories
+
+        ``chunks`` is a callable returning a fresh iterable of raw history
+        DataFrames; it is consumed twice. The first pass counts rows, collects
+        one-hot categories and labels, and fits the scaler with
+        ``partial_fit``. The second pass transforms chunk by chunk into a
+        memory-mapped ``.npy`` matrix at ``out_path``, so peak memory is one
+        chunk plus the labels. Returns ``(X, y)``; ``y`` is None without
+        ``target``, and ``label_map`` maps raw labels to codes.
+        """
+        from numpy.lib.format import open_memmap
+
+        scaler = StandardScaler()
+        categories = [set() for _ in self.categorical_features]
+        labels = []
+        n_rows = 0
+        first = None
+        for chunk in chunks():
+            if chunk.empty:
+                continue
+            frame = self._feature_frame(chunk)
+            scaler.partial_fit(frame[self.numerical_features])
+            for seen, feature in zip(categories, self.categorical_features):
+                seen.update(frame[feature].fillna(_MISSING_CATEGORY).unique())
+            if target is not None:
+                y_chunk = chunk[target]
+                if label_map is not None:
+                    y_chunk = y_chunk.astype(object).map(label_map)
+                if y_chunk.isna().any():
+                    raise ValueError(f"Unmapped '{target}' values in training history")
+                labels.append(y_chunk.to_numpy())
+            if first is None:
+                first = frame.head(1)
+            n_rows += len(chunk)
+        if first is None:
+            raise ValueError("Training history is empty")
+
+        # Fix the category lists up front, then swap in the streamed scaler statistics
+        self.preprocessor = ColumnTransformer(transformers=[
+            ('num', Pipeline(steps=[('scaler', StandardScaler())]), self.numerical_features),
+            ('cat', Pipeline(steps=[('onehot', OneHotEncoder(
+                categories=[_category_list(seen) for seen in categories],
+                handle_unknown='ignore', sparse_output=False
+            ))]), self.categorical_features)
+        ])
+        self.preprocessor.fit(first)
+        fitted_scaler = self.preprocessor.named_transformers_['num'].named_steps['scaler']
+        for attribute in ('mean_', 'var_', 'scale_', 'n_samples_seen_'):
+            setattr(fitted_scaler, attribute, getattr(scaler, attribute))
+
+        categorical_names = self.preprocessor.named_transformers_['cat'].named_steps['onehot'].get_feature_names_out(self.categorical_features)
+        self.feature_names = list(self.numerical_features) + list(categorical_names) + list(self.derived_features)
+
+        n_columns = len(self.numerical_features) + len(categorical_names)
+        X = open_memmap(out_path, mode='w+', dtype=np.float64, shape=(n_rows, n_columns))
+        row = 0
+        for chunk in chunks():
+            if chunk.empty:
+                continue
+            frame = self._feature_frame(chunk)
+            X[row:row + len(frame)] = self.preprocessor.transform(frame)
+            row += len(frame)
+        if row != n_rows:
+            raise ValueError(f"History changed between passes ({n_rows} rows, then {row})")
+        X.flush()
+        logging.info(f"Streamed {n_rows} rows into a {X.shape} training matrix at {out_path}")
+        y = np.concatenate(labels) if target is not None else None
+        return X, y
+
+    def _feature_frame(self, chunk):
+        """Model inputs of one history chunk, categories as plain strings"""
+        frame = self.create_derived_features(chunk)
+        for feature in self.numerical_features + self.categorical_features:
+            if feature not in frame.columns:
+                frame[feature] = 0  # Add missing features with default value
+        frame = frame[self.numerical_features + self.categorical_features]
+        for feature in self.categorical_features:
+            # Missing values stay NaN, their own category as in preprocess_data
+            values = frame[feature]
+            frame[feature] = values.astype(str).where(values.notna(), np.nan)
+        return frame
+
+    def train_model(self, X, y, model_type='xgboost', tune_hyperparams=True,
+                    search='grid', max_fits=None, time_budget=None):
+        """Train with choice of model and hyperparameter tuning
+
+        ``search='grid'`` runs the exhaustive GridSearchCV. ``search='halving'``
+        runs a budgeted successive-halving search bounded by ``max_fits``
+        and/or ``time_budget`` seconds. Either way the reported CV scores are
+        the ones the search already computed for the winner.
+        """
         
         if model_type == 'xgboost':
-            if tune_hyperparams:
-                param_grid = {
-                    'n_estimators': [100, 200, 300],
-                    'max_depth': [3, 6, 9],
-                    'learning_rate': [0.01, 0.1, 0.2],
-                    'subsample': [0.8, 0.9, 1.0]
-                }
-                model = XGBClassifier(random_state=42, eval_metric='logloss')
-                gs = GridSearchCV(model, param_grid, cv=5, scoring='f1_macro', n_jobs=-1, verbose=1)
-                gs.fit(X, y)
-                self.model = gs.best_estimator_
-                logging.info(f"XGBoost best params: {gs.best_params_}")
-            else:
-                self.model = XGBClassifier(
-                    n_estimators=200, max_depth=6, learning_rate=0.1,
-                    subsample=0.9, random_state=42, eval_metric='logloss'
-                )
-                self.model.fit(X, y)
-                
+            param_grid = {
+                'n_estimators': [100, 200, 300],
+                'max_depth': [3, 6, 9],
+                'learning_rate': [0.01, 0.1, 0.2],
+                'subsample': [0.8, 0.9, 1.0]
+            }
+            model = XGBClassifier(random_state=42, eval_metric='logloss')
+            default_model = XGBClassifier(
+                n_estimators=200, max_depth=6, learning_rate=0.1,
+                subsample=0.9, random_state=42, eval_metric='logloss'
+            )
         elif model_type == 'random_forest':
-            if tune_hyperparams:
-                param_grid = {
-                    'n_estimators': [100, 200, 300],
-                    'max_depth': [None, 10, 20],
-                    'min_samples_split': [2, 5, 10],
-                    'min_samples_leaf': [1, 2, 4]
-                }
-                model = RandomForestClassifier(random_state=42, class_weight='balanced')
+            param_grid = {
+                'n_estimators': [100, 200, 300],
+                'max_depth': [None, 10, 20],
+                'min_samples_split': [2, 5, 10],
+                'min_samples_leaf': [1, 2, 4]
+            }
+            model = RandomForestClassifier(random_state=42, class_weight='balanced')
+            default_model = RandomForestClassifier(
+                n_estimators=200, random_state=42, 
+                class_weight='balanced', max_depth=20
+            )
+        else:
+            raise ValueError(f"Unknown model_type '{model_type}'")
+
+        if not tune_hyperparams:
+            self.model = default_model
+            self.model.fit(X, y)
+            # Cross-validation score
+            cv_scores = cross_val_score(self.model, X, y, cv=5, scoring='f1_macro')
+        elif search == 'halving':
+            bs = BudgetedSearch(model, param_grid, cv=5, scoring='f1_macro',
+                                max_fits=max_fits, time_budget=time_budget, n_jobs=-1)
+            bs.fit(X, y)
+            self.model = bs.best_estimator_
+            cv_scores = bs.best_cv_scores_
+            logging.info(f"{model_type} best params: {bs.best_params_} "
+                         f"({bs.n_fits_} fits on up to {bs.best_n_resources_} rows)")
+        elif search == 'grid':
+            with SharedTrainingMatrix(X) as X_shared:
                 gs = GridSearchCV(model, param_grid, cv=5, scoring='f1_macro', n_jobs=-1, verbose=1)
-                gs.fit(X, y)
-                self.model = gs.best_estimator_
-                logging.info(f"Random Forest best params: {gs.best_params_}")
-            else:
-                self.model = RandomForestClassifier(
-                    n_estimators=200, random_state=42, 
-                    class_weight='balanced', max_depth=20
-                )
-                self.model.fit(X, y)
+                gs.fit(X_shared, y)
+            self.model = gs.best_estimator_
+            cv_scores = np.array([
+                gs.cv_results_[f'split{i}_test_score'][gs.best_index_] for i in range(gs.n_splits_)
+            ])
+            logging.info(f"{model_type} best params: {gs.best_params_}")
+        else:
+            raise ValueError(f"Unknown search '{search}', expected 'grid' or 'halving'")
         
-        # Cross-validation score
-        cv_scores = cross_val_score(self.model, X, y, cv=5, scoring='f1_macro')
+        self.cv_scores = cv_scores
         logging.info(f"Cross-validation F1 scores: {cv_scores}")
         logging.info(f"Mean CV F1: {cv_scores.mean():.3f} (+/- {cv_scores.std() * 2:.3f})")
         
         return self.model
 
+    def get_predictor(self):
+        """Compiled tree predictor for the current model, built and verified on first use"""
+        if getattr(self, 'predictor_source', None) is not self.model:
+            self.predictor, self.predictor_source = None, self.model
+            try:
+                predictor = compile_ensemble(self.model)
+                verify(predictor, self.model)
+                self.predictor = predictor
+            except (TypeError, ValueError) as e:
+                logging.warning(f"Predicting with uncompiled {type(self.model).__name__}: {e}")
+        return self.predictor
+
     def predict_with_confidence(self, X):
-        """Predict with confidence scores"""
+        """Predict with confidence scores in a single pass over the ensemble"""
+        predictor = self.get_predictor()
+        if predictor is not None:
+            return predictor.predict_with_confidence(X)
         if hasattr(self.model, 'predict_proba'):
             probabilities = self.model.predict_proba(X)
-            confidence = np.max(probabilities, axis=1)
-            predictions = self.model.predict(X)
+            best = np.argmax(probabilities, axis=1)
+            confidence = probabilities[np.arange(len(best)), best]
+            predictions = self.model.classes_.take(best)
             return predictions, confidence, probabilities
         else:
             predictions = self.model.predict(X)
@@ -327,18 +410,180 @@ def enhanced_evaluate_individual(individual, df_day, model, preprocessor, featur
         -total_penalty  # Minimize
     )
 
+class PopulationEvaluator:
+    """
+    Batched version of enhanced_evaluate_individual for one day's fleet.
+
+    Model inference does not depend on the individual, so predictions and the
+    per-train attributes are computed once per day. A population is then scored
+    as a 2-D status matrix (individuals x trains) with array reductions.
+    """
+
+    def __init__(self, df_day, model, preprocessor, feature_names,
+                 min_revenue_trains=DEFAULT_MIN_REVENUE_TRAINS,
+                 cleaning_slots=DEFAULT_CLEANING_SLOTS,
+                 depot_bays=DEFAULT_DEPOT_BAYS,
+                 weights=None, predictions=None):
+        if weights is None:
+            weights = {
+                'branding': 1.0, 'mileage': 1.0, 'shunting': 1.0,
+                'fitness': 1.0, 'efficiency': 1.0
+            }
+        self.min_revenue_trains = min_revenue_trains
+        self.cleaning_slots = cleaning_slots
+        self.depot_bays = depot_bays
+        self.weights = weights
+
+        # Predict every train of the day once
+        if predictions is None:
+            X_processed = preprocessor.transform(df_day[feature_names])
+            predictions, _, _ = model.predict_with_confidence(X_processed)
+        self.predictions = np.asarray(predictions)
+        self.num_trains = len(df_day)
+
+        def column(name, default):
+            if name in df_day.columns:
+                return df_day[name].to_numpy(dtype=float)
+            return np.full(len(df_day), default, dtype=float)
+
+        self.serviceable = column('is_serviceable', 0) != 0
+        self.mileage = column('mileage', 0.0)
+        self.branding_deficit = column('branding_deficit', 0.0)
+
+        # Per-train contributions when assigned to revenue or maintenance
+        self.sla_cost = (self.branding_deficit * (1 + column('branding_urgency', 0.0))
+                         * weights.get('branding', 1.0))
+        self.shunting_cost = (column('shunting_time_minutes', 0.0) * (2 - column('bay_efficiency', 1.0))
+                              * weights.get('shunting', 1.0))
+        self.fitness_gain = column('fitness_score', 0.0) * weights.get('fitness', 1.0)
+        self.efficiency_gain = column('branding_efficiency', 0.0) * weights.get('efficiency', 1.0)
+        self.maintenance_cost = column('maintenance_cost', 10.0) * (1 + column('maintenance_urgency', 0.0))
+
+        # One-hot resource tables, columns are bay / slot numbers 1..capacity
+        bays = np.nan_to_num(column('stabling_bay', 0)).astype(int)
+        slots = np.nan_to_num(column('cleaning_slot', 0)).astype(int)
+        self.bay_table = (bays[:, None] == np.arange(1, depot_bays + 1)[None, :]).astype(float)
+        self.cleaning_table = (slots[:, None] == np.arange(1, cleaning_slots + 1)[None, :]).astype(float)
+
+    def assignment_matrix(self, population):
+        """Map index-encoded individuals to a status matrix.
+
+        Position k of an individual receives the prediction of train
+        ``individual[k]`` and the attributes of row k, as in
+        enhanced_evaluate_individual.
+        """
+        population = np.asarray(population, dtype=int)
+        if population.ndim == 1:
+            population = population[None, :]
+        return self.predictions[population]
+
+    def evaluate_assignments(self, statuses):
+        """Score a (individuals x trains) status matrix, returns (n, 6) objectives"""
+        statuses = np.asarray(statuses)
+        if statuses.ndim == 1:
+            statuses = statuses[None, :]
+        length = statuses.shape[1]
+
+        # Hard constraint enforcement: unserviceable trains go to maintenance
+        statuses = np.where(self.serviceable[:length] | (statuses == 0), statuses, 0)
+        revenue = (statuses == 1).astype(float)
+        maintenance = (statuses == 0).astype(float)
+
+        # Row-wise sums rather than matrix products keep each individual's
+        # objectives independent of how the population is batched
+        revenue_count = revenue.sum(axis=1)
+        sla_penalty = (revenue * self.sla_cost[:length]).sum(axis=1)
+        shunting_time = (revenue * self.shunting_cost[:length]).sum(axis=1)
+        fitness_score = (revenue * self.fitness_gain[:length]).sum(axis=1)
+        efficiency_score = (revenue * self.efficiency_gain[:length]).sum(axis=1)
+        total_cost = (maintenance * self.maintenance_cost[:length]).sum(axis=1)
+
+        # Distinct bays and cleaning slots used by revenue trains
+        bays_used = ((revenue @ self.bay_table[:length]) > 0).sum(axis=1)
+        slots_used = ((revenue @ self.cleaning_table[:length]) > 0).sum(axis=1)
+
+        revenue_penalty = np.maximum(0, self.min_revenue_trains - revenue_count) ** 2 * 1000
+        bay_penalty = np.maximum(0, bays_used - self.depot_bays) * 500
+        cleaning_penalty = np.maximum(0, slots_used - self.cleaning_slots) * 300
+
+        # Masked mean/variance over the revenue trains of each individual
+        safe_count = np.maximum(revenue_count, 1)
+        mileage = self.mileage[:length]
+        mileage_mean = (revenue * mileage).sum(axis=1) / safe_count
+        mileage_var = (revenue * (mileage[None, :] - mileage_mean[:, None]) ** 2).sum(axis=1) / safe_count
+        deficit = self.branding_deficit[:length]
+        deficit_mean = (revenue * deficit).sum(axis=1) / safe_count
+        deficit_var = (revenue * (deficit[None, :] - deficit_mean[:, None]) ** 2).sum(axis=1) / safe_count
+
+        many_revenue = revenue_count > 1
+        mileage_variance = np.where(many_revenue, mileage_var * self.weights.get('mileage', 1.0), 0.0)
+        mileage_penalty = np.where(many_revenue, np.sqrt(mileage_var) / (mileage_mean + 1e-6) * 100, 1000)
+        branding_variance_penalty = np.where(revenue_count > 0, deficit_var * 10, 0)
+
+        total_penalty = (
+            revenue_penalty + bay_penalty + cleaning_penalty +
+            mileage_penalty + branding_variance_penalty
+        )
+
+        return np.column_stack([
+            revenue_count + fitness_score + efficiency_score,
+            -total_cost - total_penalty,
+            -sla_penalty,
+            -shunting_time,
+            -mileage_variance,
+            -total_penalty
+        ])
+
+    def evaluate_population(self, population):
+        """Evaluate index-encoded individuals, returns one objective tuple each"""
+        if len(population) == 0:
+            return []
+        lengths = {len(individual) for individual in population}
+        if len(lengths) == 1:
+            objectives = self.evaluate_assignments(self.assignment_matrix(population))
+            return [tuple(row) for row in objectives.tolist()]
+        # Ragged populations are grouped by individual length
+        results = [None] * len(population)
+        for length in lengths:
+            members = [i for i, individual in enumerate(population) if len(individual) == length]
+            objectives = self.evaluate_assignments(self.assignment_matrix([population[i] for i in members]))
+            for i, row in zip(members, objectives.tolist()):
+                results[i] = tuple(row)
+        return results
+
+    def __call__(self, individual):
+        """Evaluate a single individual, usable as a DEAP evaluate function"""
+        return self.evaluate_population([individual])[0]
+
+def enhanced_evaluate_population(population, df_day, model, preprocessor, feature_names,
+                                 min_revenue_trains=DEFAULT_MIN_REVENUE_TRAINS,
+                                 cleaning_slots=DEFAULT_CLEANING_SLOTS,
+                                 depot_bays=DEFAULT_DEPOT_BAYS,
+                                 weights=None):
+    """
+    Evaluate a whole population at once, same objectives as enhanced_evaluate_individual
+    """
+    evaluator = PopulationEvaluator(
+        df_day, model, preprocessor, feature_names,
+        min_revenue_trains=min_revenue_trains, cleaning_slots=cleaning_slots,
+        depot_bays=depot_bays, weights=weights
+    )
+    return evaluator.evaluate_population(population)
+
 def safe_create_deap_types():
     """Create DEAP creator types if not already created"""
+    # The evaluators already negate the objectives to minimize, so every
+    # objective is maximized here
     if "FitnessMulti" not in creator.__dict__:
-        creator.create("FitnessMulti", base.Fitness, weights=(1.0, -1.0, -1.0, -1.0, -1.0, -1.0))
+        creator.create("FitnessMulti", base.Fitness, weights=(1.0, 1.0, 1.0, 1.0, 1.0, 1.0))
     if "Individual" not in creator.__dict__:
         creator.create("Individual", list, fitness=creator.FitnessMulti)
 
-def load_dataset(file_path):
-    """Load dataset from CSV"""
+def load_dataset(file_path, use_cache=True):
+    """Load dataset from CSV with the typed schema, reusing its Parquet sidecar cache"""
     try:
-        df = pd.read_csv(file_path)
-        logging.info(f"Loaded dataset with {len(df)} rows from {file_path}")
+        df = read_history(file_path, use_cache=use_cache)
+        logging.info(f"Loaded dataset with {len(df)} rows from {getattr(file_path, 'name', file_path)}")
         return df
     except Exception as e:
         logging.error(f"Error loading dataset: {str(e)}")
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Versioned model bundle for the KMRL optimization engine
+One directory holds the estimator, scaler/preprocessor, label encoder, feature
+names and a schema hash. Arrays are stored as .npy files and memory-mapped on
+load, so several worker processes share one on-disk copy of the model.
+
+Layout (``induction_model.bundle`` is a symlink to the current version)::
+
+    induction_model.bundle -> .induction_model.bundle-v-<id>/
+        manifest.json        format version, model version, schema hash, checksums
+        estimator.joblib     fitted estimator (memory-mapped arrays where possible)
+        preprocessor.joblib  optional ColumnTransformer of EnhancedTrainInductionModel
+        arrays/*.npy         scaler statistics, label classes, compiled tree nodes
+                             and other large arrays
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from tree_predictor import NODE_ARRAYS, CompiledForest, compile_ensemble, verify
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+DEFAULT_BUNDLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'induction_model.bundle')
+# EnhancedTrainInductionModel behind the dashboard and planner
+DEFAULT_PLANNER_BUNDLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'planner_model.bundle')
+
+class BundleError(Exception):
+    """Raised when a bundle is missing, corrupt or incompatible"""
+
+def schema_hash(feature_names: List[str], scaled_features: Optional[List[str]] = None,
+                classes: Optional[List[str]] = None) -> str:
+    """Hash of the model input/output schema, stable across retrains"""
+    payload = json.dumps({
+        'feature_names': list(feature_names),
+        'scaled_features': list(scaled_features or []),
+        'classes': [str(c) for c in (classes or [])]
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+def _file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _version_dirs(parent: str, name: str) -> List[str]:
+    prefix = f'.{name}-v-'
+    return [os.path.join(parent, entry) for entry in os.listdir(parent)
+            if entry.startswith(prefix) and not os.path.islink(os.path.join(parent, entry))]
+
+def _publish(directory: str, path: str):
+    """Point the ``path`` symlink at ``directory`` with one atomic os.replace.
+
+    Returns the directory ``path`` held before, if any.
+    """
+    link = f'{directory}.link'
+    os.symlink(os.path.basename(directory), link)
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            # A bundle directory from before versioned publishing: move it to a
+            # version directory and put it back if the swap fails
+            legacy = tempfile.mkdtemp(prefix=f'.{os.path.basename(path)}-v-', dir=os.path.dirname(path))
+            os.rename(path, legacy)
+            try:
+                os.replace(link, path)
+            except OSError:
+                os.rename(legacy, path)
+                raise
+            previous = legacy
+        else:
+            os.replace(link, path)
+    finally:
+        if os.path.lexists(link):
+            os.unlink(link)
+    return previous
+
+def _prune_versions(path: str, keep: List[str]):
+    """Remove version directories other than ``keep``"""
+    for directory in _version_dirs(os.path.dirname(path), os.path.basename(path)):
+        if directory not in keep:
+            shutil.rmtree(directory, ignore_errors=True)
+
+def write_bundle(path: str, estimator, feature_names: List[str], scaler: StandardScaler = None,
+                 label_encoder: LabelEncoder = None, preprocessor=None,
+                 arrays: Optional[Dict[str, np.ndarray]] = None,
+                 metadata: Optional[Dict[str, Any]] = None) -> 'ModelBundle':
+    """Write a bundle atomically: build a new version directory next to ``path``,
+    then switch the ``path`` symlink to it with ``os.replace``.
+
+    Readers resolving ``path`` see either the old or the new bundle, never
+    neither. The previous version directory is kept for readers still
+    loading from it; older ones are removed.
+
+    Tree ensembles are also stored compiled (``forest.*`` arrays), after
+    checking that the compiled form reproduces the estimator's predictions.
+    """
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    base = os.path.basename(path)
+    staging = tempfile.mkdtemp(prefix=f'.{base}-staging-', dir=parent)
+
+    try:
+        os.makedirs(os.path.join(staging, 'arrays'))
+        arrays = dict(arrays or {})
+        scaled_features = []
+        classes = []
+
+        if scaler is not None:
+            scaled_features = [str(f) for f in getattr(scaler, 'feature_names_in_', [])]
+            for attr in ('mean_', 'var_', 'scale_'):
+                if getattr(scaler, attr, None) is not None:
+                    arrays[f'scaler.{attr}'] = np.asarray(getattr(scaler, attr))
+        if label_encoder is not None:
+            classes = [str(c) for c in label_encoder.classes_]
+            arrays['label_encoder.classes_'] = np.asarray(label_encoder.classes_).astype(str)
+
+        predictor = None
+        try:
+            compiled = compile_ensemble(estimator)
+            verify(compiled, estimator)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Storing {type(estimator).__name__} without a compiled predictor: {e}")
+        else:
+            predictor = compiled.config()
+            for name, array in compiled.to_arrays().items():
+                arrays[f'forest.{name}'] = array.astype(str) if array.dtype == object else array
+
+        files = {}
+        joblib.dump(estimator, os.path.join(staging, 'estimator.joblib'))
+        files['estimator.joblib'] = None
+        if preprocessor is not None:
+            joblib.dump(preprocessor, os.path.join(staging, 'preprocessor.joblib'))
+            files['preprocessor.joblib'] = None
+        for name, array in arrays.items():
+            relative = os.path.join('arrays', f'{name}.npy')
+            np.save(os.path.join(staging, relative), np.ascontiguousarray(array), allow_pickle=False)
+            files[relative] = None
+        for relative in files:
+            files[relative] = _file_checksum(os.path.join(staging, relative))
+
+        checksum = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()
+        created_at = datetime.now().isoformat(timespec='seconds')
+        manifest = {
+            'format_version': BUNDLE_FORMAT_VERSION,
+            'version': f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{checksum[:8]}",
+            'created_at': created_at,
+            'estimator_type': type(estimator).__name__,
+            'feature_names': [str(f) for f in feature_names],
+            'scaled_features': scaled_features,
+            'scaler': None if scaler is None else {
+                'with_mean': scaler.with_mean,
+                'with_std': scaler.with_std,
+                'n_samples_seen_': np.asarray(scaler.n_samples_seen_).tolist()
+            },
+            'classes': classes,
+            'predictor': predictor,
+            'schema_hash': schema_hash(feature_names, scaled_features, classes),
+            'arrays': sorted(arrays),
+            'files': files,
+            'metadata': metadata or {}
+        }
+        with open(os.path.join(staging, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        # Only finished bundles carry the version prefix
+        version_dir = os.path.join(parent, os.path.basename(staging).replace('-staging-', '-v-', 1))
+        os.rename(staging, version_dir)
+        staging = version_dir
+        previous = _publish(version_dir, path)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    _prune_versions(path, keep=[version_dir, previous])
+
+    logger.info(f"Model bundle {manifest['version']} written to {path}")
+    return ModelBundle(version_dir, manifest)
+
+class ModelBundle:
+    """
+    Lazily loaded view of a bundle directory.
+
+    Opening a bundle only reads its manifest. Components are deserialized on
+    first access, after their checksum has been verified, and arrays are
+    memory-mapped read-only.
+    """
+
+    def __init__(self, path: str, manifest: Dict[str, Any], verify: bool = True):
+        self.path = path
+        self.manifest = manifest
+        self.verify = verify
+        self._components: Dict[str, Any] = {}
+        self._verified = set()
+        self._lock = threading.RLock()
+
+    @classmethod
+    def open(cls, path: str = DEFAULT_BUNDLE_PATH, verify: bool = True) -> 'ModelBundle':
+        # Pin the version directory so a later publish cannot mix two bundles
+        path = os.path.realpath(path)
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            raise BundleError(f"No model bundle at {path}")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+            raise BundleError(f"Unsupported bundle format {manifest.get('format_version')}")
+        return cls(path, manifest, verify=verify)
+
+    @property
+    def version(self) -> str:
+        return self.manifest['version']
+
+    @property
+    def schema_hash(self) -> str:
+        return self.manifest['schema_hash']
+
+    @property
+    def feature_names(self) -> List[str]:
+        return self.manifest['feature_names']
+
+    def check_schema(self, feature_names: List[str], scaled_features: Optional[List[str]] = None):
+        """Raise BundleError if the bundle was built for a different input schema"""
+        expected = schema_hash(feature_names, scaled_features, self.manifest['classes'])
+        if expected != self.schema_hash:
+            raise BundleError(f"Bundle schema {self.schema_hash} does not match expected {expected}")
+
+    def _file(self, relative: str) -> str:
+        full_path = os.path.join(self.path, relative)
+        if relative not in self.manifest['files']:
+            raise BundleError(f"{relative} is not part of bundle {self.version}")
+        if self.verify and relative not in self._verified:
+            if _file_checksum(full_path) != self.manifest['files'][relative]:
+                raise BundleError(f"Checksum mismatch for {relative} in bundle {self.version}")
+            self._verified.add(relative)
+        return full_path
+
+    def _load(self, name: str, loader):
+        with self._lock:
+            if name not in self._components:
+                self._components[name] = loader()
+            return self._components[name]
+
+    def array(self, name: str) -> np.ndarray:
+        """A stored array, memory-mapped read-only"""
+        return self._load(f'array:{name}', lambda: np.load(
+            self._file(os.path.join('arrays', f'{name}.npy')), mmap_mode='r', allow_pickle=False
+        ))
+
+    def has_array(self, name: str) -> bool:
+        return name in self.manifest['arrays']
+
+    @property
+    def estimator(self):
+        return self._load('estimator', lambda: joblib.load(self._file('estimator.joblib'), mmap_mode='r'))
+
+    @property
+    def predictor(self) -> Optional[CompiledForest]:
+        """Compiled tree ensemble over memory-mapped node arrays, if stored"""
+        if not self.manifest.get('predictor'):
+            return None
+        return self._load('predictor', lambda: CompiledForest.from_arrays(
+            {name: self.array(f'forest.{name}') for name in NODE_ARRAYS}, self.manifest['predictor']
+        ))
+
+    @property
+    def preprocessor(self):
+        if 'preprocessor.joblib' not in self.manifest['files']:
+            return None
+        return self._load('preprocessor', lambda: joblib.load(self._file('preprocessor.joblib'), mmap_mode='r'))
+
+    @property
+    def scaler(self) -> Optional[StandardScaler]:
+        if self.manifest.get('scaler') is None:
+            return None
+
+        def build():
+            config = self.manifest['scaler']
+            scaler = StandardScaler(with_mean=config['with_mean'], with_std=config['with_std'])
+            scaler.feature_names_in_ = np.asarray(self.manifest['scaled_features'], dtype=object)
+            scaler.n_features_in_ = len(self.manifest['scaled_features'])
+            scaler.n_samples_seen_ = np.asarray(config['n_samples_seen_'])
+            for attr in ('mean_', 'var_', 'scale_'):
+                setattr(scaler, attr, self.array(f'scaler.{attr}') if self.has_array(f'scaler.{attr}') else None)
+            return scaler
+        return self._load('scaler', build)
+
+    @property
+    def label_encoder(self) -> Optional[LabelEncoder]:
+        if not self.has_array('label_encoder.classes_'):
+            return None
+
+        def build():
+            encoder = LabelEncoder()
+            encoder.classes_ = np.asarray(self.array('label_encoder.classes_')).astype(object)
+            return encoder
+        return self._load('label_encoder', build)
+
+def bundle_enhanced_model(enhanced_model, path: str, metadata=None) -> ModelBundle:
+    """Bundle a trained EnhancedTrainInductionModel"""
+    from planner import STATUS_LABELS
+
+    encoder = LabelEncoder()
+    encoder.classes_ = np.asarray(STATUS_LABELS, dtype=object)
+    return write_bundle(
+        path, enhanced_model.model,
+        feature_names=list(enhanced_model.preprocessor.feature_names_in_),
+        label_encoder=encoder,
+        preprocessor=enhanced_model.preprocessor,
+        metadata={
+            'kind': 'enhanced',
+            'numerical_features': enhanced_model.numerical_features,
+            'categorical_features': enhanced_model.categorical_features,
+            'derived_features': enhanced_model.derived_features,
+            'output_feature_names': list(enhanced_model.feature_names),
+            **(metadata or {})
+        }
+    )
+
+def load_enhanced_model_bundle(path: str):
+    """Rebuild an EnhancedTrainInductionModel from a bundle"""
+    from model import EnhancedTrainInductionModel
+
+    bundle = ModelBundle.open(path)
+    metadata = bundle.manifest['metadata']
+    if metadata.get('kind') != 'enhanced':
+        raise BundleError(f"Bundle {bundle.version} does not hold an EnhancedTrainInductionModel")
+    enhanced = EnhancedTrainInductionModel()
+    enhanced.model = bundle.estimator
+    enhanced.preprocessor = bundle.preprocessor
+    enhanced.numerical_features = metadata['numerical_features']
+    enhanced.categorical_features = metadata['categorical_features']
+    enhanced.derived_features = metadata['derived_features']
+    enhanced.feature_names = metadata['output_feature_names']
+    return enhanced
+
+def convert_legacy_pickles(directory: str, path: str = DEFAULT_BUNDLE_PATH) -> ModelBundle:
+    """Bundle the service's rf_model.pkl, scaler.pkl and le_status.pkl"""
+    from python_optimization_service import MODEL_FEATURES
+
+    loaded = {}
+    for name in ('rf_model', 'scaler', 'le_status'):
+        loaded[name] = joblib.load(os.path.join(directory, f'{name}.pkl'))
+    return write_bundle(path, loaded['rf_model'], feature_names=MODEL_FEATURES,
+                        scaler=loaded['scaler'], label_encoder=loaded['le_status'],
+                        metadata={'kind': 'service', 'source': 'legacy pickles'})
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    engine_dir = os.path.dirname(os.path.abspath(__file__))
+    target = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_BUNDLE_PATH
+    bundle = convert_legacy_pickles(engine_dir, target)
+    print(json.dumps({'path': bundle.path, 'version': bundle.version, 'schema_hash': bundle.schema_hash}))
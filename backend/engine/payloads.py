@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Fleet payload transports for the KMRL optimization service
+Reads a fleet from a file path or stdin instead of a command-line argument,
+so payload size is not bounded by the OS argument limit and never shows up
+in process listings. Supported formats:
+
+    json     a JSON array of train records
+    jsonl    one JSON record per line, parsed as it streams in
+    arrow    an Arrow IPC stream or file, mapped column-wise into a DataFrame
+    npy      a NumPy structured array, mapped column-wise into a DataFrame
+
+The columnar formats skip per-record dict construction entirely.
+"""
+
+import os
+import sys
+import json
+import logging
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:  # Arrow payloads are unavailable
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+Payload = Union[List[Dict[str, Any]], pd.DataFrame]
+
+FORMATS = ('json', 'jsonl', 'arrow', 'npy')
+EXTENSIONS = {
+    '.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl',
+    '.arrow': 'arrow', '.arrows': 'arrow', '.ipc': 'arrow', '.feather': 'arrow',
+    '.npy': 'npy'
+}
+ARROW_FILE_MAGIC = b'ARROW1'
+# Arrow IPC streams open with a continuation marker before the schema message
+ARROW_STREAM_MARKER = b'\xff\xff\xff\xff'
+NPY_MAGIC = b'\x93NUMPY'
+
+class PayloadError(ValueError):
+    """Raised when a payload cannot be read in the requested format"""
+
+def detect_format(head: bytes, path: Optional[str] = None) -> str:
+    """Format of a payload from its file extension, else its first bytes"""
+    if path and path != '-':
+        extension = os.path.splitext(path)[1].lower()
+        if extension in EXTENSIONS:
+            return EXTENSIONS[extension]
+    if head.startswith(NPY_MAGIC):
+        return 'npy'
+    if head.startswith(ARROW_FILE_MAGIC) or head.startswith(ARROW_STREAM_MARKER):
+        return 'arrow'
+    if head.lstrip()[:1] == b'{':
+        return 'jsonl'
+    return 'json'
+
+def _read_json(stream: BinaryIO) -> List[Dict[str, Any]]:
+    records = json.load(stream)
+    if not isinstance(records, list):
+        raise PayloadError("JSON payload must be an array of train records")
+    return records
+
+def _read_jsonl(stream: BinaryIO) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in stream if line.strip()]
+
+def _read_arrow(stream: BinaryIO) -> pd.DataFrame:
+    if not HAS_PYARROW:
+        raise PayloadError("Arrow payloads need pyarrow")
+    if stream.peek(len(ARROW_FILE_MAGIC)).startswith(ARROW_FILE_MAGIC):
+        # The file format keeps its footer at the end, so it needs random access
+        source = stream if stream.seekable() else pa.py_buffer(stream.read())
+        table = pa.ipc.open_file(source).read_all()
+    else:
+        table = pa.ipc.open_stream(stream).read_all()
+    return table.to_pandas()
+
+def _read_npy(stream: BinaryIO) -> pd.DataFrame:
+    # read_array rather than np.load, which seeks and so rejects pipes
+    array = np.lib.format.read_array(stream, allow_pickle=False)
+    if array.dtype.names is None:
+        raise PayloadError("NumPy payload must be a structured array with one field per column")
+    return pd.DataFrame(array)
+
+READERS = {'json': _read_json, 'jsonl': _read_jsonl, 'arrow': _read_arrow, 'npy': _read_npy}
+
+def read_stream(stream: BinaryIO, fmt: Optional[str] = None, path: Optional[str] = None) -> Payload:
+    """Read a payload from a buffered binary stream, detecting the format when not given"""
+    if fmt in (None, 'auto'):
+        fmt = detect_format(stream.peek(16)[:16], path)
+    if fmt not in READERS:
+        raise PayloadError(f"Unknown payload format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    try:
+        return READERS[fmt](stream)
+    except PayloadError:
+        raise
+    except Exception as e:
+        raise PayloadError(f"Could not read {fmt} payload: {str(e)}") from e
+
+def read_payload(source: str = '-', fmt: Optional[str] = None) -> Payload:
+    """
+    Read a fleet payload from ``source``, a file path or '-' for stdin.
+
+    JSON formats return a list of records; Arrow and NumPy payloads return
+    a DataFrame. Both are accepted by ``run_optimization``.
+    """
+    if source == '-':
+        payload = read_stream(sys.stdin.buffer, fmt)
+    else:
+        with open(source, 'rb') as f:
+            payload = read_stream(f, fmt, source)
+    logger.info(f"Read {len(payload)} records from {'stdin' if source == '-' else source}")
+    return payload
+
+def to_frame(payload: Payload) -> pd.DataFrame:
+    """A DataFrame that is safe to modify; columnar payloads are copied, not rebuilt row by row"""
+    if isinstance(payload, pd.DataFrame):
+        # Deep, so in-place edits never reach the caller's frame without copy-on-write
+        return payload.copy()
+    return pd.DataFrame(payload)
@@ -0,0 +1,661 @@
+#!/usr/bin/env python3
+"""
+NSGA-II induction planner for KMRL
+Evolves per-train status assignments (revenue/standby/maintenance) for one
+operational day and returns a ranked induction plan plus the Pareto front
+"""
+
+import os
+import copy
+import time
+import random
+import tempfile
+import logging
+import multiprocessing
+from functools import partial
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+import pandas as pd
+from deap import base, creator, tools
+
+from model import (
+    PopulationEvaluator, safe_create_deap_types,
+    DEFAULT_MIN_REVENUE_TRAINS, DEFAULT_CLEANING_SLOTS, DEFAULT_DEPOT_BAYS
+)
+from milp_solver import solve_induction_milp
+from cache import FitnessCache
+from features import feature_engine
+
+logger = logging.getLogger(__name__)
+
+# Encoded model labels, matching le_status.pkl
+STATUS_LABELS = ['maintenance', 'revenue', 'standby']
+STATUS_CODES = {label: code for code, label in enumerate(STATUS_LABELS)}
+MAINTENANCE, REVENUE, STANDBY = 0, 1, 2
+
+# Display names used by the dashboard
+ASSIGNED_STATUS_NAMES = {REVENUE: 'Service', STANDBY: 'Standby', MAINTENANCE: 'Maintenance'}
+
+SOLVERS = ('nsga2', 'milp')
+
+OBJECTIVE_NAMES = [
+    'readiness', 'cost_and_penalty', 'sla_penalty',
+    'shunting_time', 'mileage_variance', 'constraint_penalty'
+]
+
+# Evaluator installed in each pool worker by _init_worker
+_worker_evaluator = None
+
+def _init_worker(evaluator):
+    global _worker_evaluator
+    _worker_evaluator = evaluator
+
+def _evaluate_chunk(chunk):
+    """Evaluate a chunk of assignment individuals inside a pool worker"""
+    return _worker_evaluator.evaluate_assignments(np.asarray(chunk)).tolist()
+
+def _evaluate_chunk_with(evaluator, chunk):
+    return evaluator.evaluate_assignments(np.asarray(chunk)).tolist()
+
+def _individual(genes, values):
+    """Rebuild an individual sent between processes as (genes, fitness values)"""
+    individual = creator.Individual(genes)
+    individual.fitness.values = tuple(values)
+    return individual
+
+class Island:
+    """
+    One NSGA-II population with its own RNG stream.
+
+    DEAP's operators draw from the global ``random`` module, so the island
+    swaps its own generator state in and out around each ``run``; islands
+    sharing a process then evolve exactly as they would alone, and the
+    caller's ``random`` state is left as it was.
+    """
+
+    def __init__(self, settings, evaluator, seed_statuses, population_size, seed, cache_size):
+        # ``settings`` is a model-less, single-process planner; each island gets its own cache
+        self.planner = copy.copy(settings)
+        self.planner.fitness_cache = FitnessCache(cache_size)
+        self.scenario = FitnessCache.scenario_key(evaluator)
+        self.seed_statuses = seed_statuses
+        self.population_size = population_size
+        self.toolbox = self.planner.build_toolbox(len(seed_statuses), seed_statuses)
+        self.toolbox.register("evaluate", partial(_evaluate_chunk_with, evaluator))
+        self.rng_state = random.Random(seed).getstate()
+        self.population = None
+        self.evaluations = 0
+
+    def run(self, generations):
+        """Evolve ``generations`` more generations, creating the population on first use"""
+        outer_state = random.getstate()
+        random.setstate(self.rng_state)
+        try:
+            if self.population is None:
+                self.population, evaluations = self.planner.initial_population(
+                    self.toolbox, self.seed_statuses, self.population_size, self.scenario)
+                self.evaluations += evaluations
+            for _ in range(generations):
+                self.population, evaluations = self.planner.generation(self.toolbox, self.population, self.scenario)
+                self.evaluations += evaluations
+        finally:
+            self.rng_state = random.getstate()
+            random.setstate(outer_state)
+
+    def emigrants(self, count):
+        """The ``count`` best individuals by NSGA-II rank and crowding, as (genes, values)"""
+        return [(list(ind), ind.fitness.values) for ind in tools.selNSGA2(self.population, count)]
+
+    def immigrate(self, migrants):
+        """Admit migrants in place of the island's worst individuals, keeping its size"""
+        arrivals = [_individual(genes, values) for genes, values in migrants]
+        self.population = self.toolbox.select(self.population + arrivals, len(self.population))
+
+    def snapshot(self):
+        return [(list(ind), ind.fitness.values) for ind in self.population], self.evaluations
+
+class IslandGroup:
+    """The islands hosted by one process, stepped together"""
+
+    def __init__(self, settings, evaluator, seed_statuses, population_size, seeds, cache_size):
+        self.islands = [Island(settings, evaluator, seed_statuses, population_size, seed, cache_size)
+                        for seed in seeds]
+
+    def run(self, generations, migration_size):
+        for island in self.islands:
+            island.run(generations)
+        return [island.emigrants(migration_size) if migration_size else [] for island in self.islands]
+
+    def immigrate(self, arrivals):
+        for island, migrants in zip(self.islands, arrivals):
+            island.immigrate(migrants)
+
+    def finish(self):
+        return [island.snapshot() for island in self.islands]
+
+def _serve_islands(conn, *group_args):
+    """Island process loop: apply (method, args) calls to an IslandGroup until ``finish``"""
+    try:
+        safe_create_deap_types()
+        group = IslandGroup(*group_args)
+        while True:
+            name, args = conn.recv()
+            conn.send(getattr(group, name)(*args))
+            if name == 'finish':
+                return
+    except EOFError:
+        pass
+    except Exception as e:
+        # Re-raised by the parent's receive()
+        conn.send(e)
+    finally:
+        conn.close()
+
+class _IslandProcess:
+    """Parent-side handle calling an IslandGroup in a child process"""
+
+    def __init__(self, *group_args):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve_islands, args=(child,) + group_args, daemon=True)
+        self.process.start()
+        child.close()
+
+    def send(self, name, *args):
+        self.conn.send((name, args))
+
+    def receive(self):
+        reply = self.conn.recv()
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def close(self):
+        self.conn.close()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+class _LocalIslands:
+    """In-process stand-in for _IslandProcess, used with ``n_jobs=1``"""
+
+    def __init__(self, *group_args):
+        self.group = IslandGroup(*group_args)
+        self.reply = None
+
+    def send(self, name, *args):
+        self.reply = getattr(self.group, name)(*args)
+
+    def receive(self):
+        return self.reply
+
+    def close(self):
+        pass
+
+def prepare_day(enhanced_model, df_day: pd.DataFrame):
+    """Add derived features and return the frame plus the preprocessor input columns.
+
+    The model is only read: it may be a cached object shared by several
+    sessions, so its ``derived_features`` must not change under them.
+    """
+    feature_names = list(enhanced_model.preprocessor.feature_names_in_)
+
+    df_day = feature_engine.derive(df_day.reset_index(drop=True))
+    for feature in feature_names:
+        if feature not in df_day.columns:
+            df_day[feature] = 0
+    return df_day, feature_names
+
+class InductionPlanner:
+    """
+    Multi-objective induction planner built on DEAP's NSGA-II.
+
+    Each individual holds one status code per train. Objectives are the six
+    from enhanced_evaluate_individual, computed for whole batches through
+    PopulationEvaluator. With ``n_jobs`` other than 1 (``None`` for every
+    core) the batches are split across a process pool that backs
+    ``toolbox.map``. A ``seed`` seeds a generator private to the run, so
+    the caller's ``random`` state is untouched.
+
+    ``solver="milp"`` replaces the genetic search with the exact integer
+    program in milp_solver, which returns a single optimal plan.
+
+    Objectives are memoized in ``fitness_cache`` and looked up before any
+    evaluation, so duplicate individuals are only scored once.
+
+    With ``islands`` above 1 the population is split into that many
+    independently seeded sub-populations evolving in up to ``n_jobs``
+    processes. Every ``migration_interval`` generations each island sends
+    its ``migration_size`` best individuals to the next one in a ring, and
+    the final populations are merged into one global Pareto front.
+    """
+
+    def __init__(self, enhanced_model, population_size=100, generations=50,
+                 crossover_prob=0.7, mutation_prob=0.3, gene_mutation_prob=None,
+                 n_jobs=1, seed=None, solver='nsga2', milp_time_limit=None,
+                 fitness_cache=None, islands=1, migration_interval=10, migration_size=2):
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown solver '{solver}', expected one of {SOLVERS}")
+        self.enhanced_model = enhanced_model
+        self.solver = solver
+        self.milp_time_limit = milp_time_limit
+        # selTournamentDCD needs a population size divisible by four
+        self.population_size = max(4, int(np.ceil(population_size / 4)) * 4)
+        self.generations = generations
+        self.crossover_prob = crossover_prob
+        self.mutation_prob = mutation_prob
+        self.gene_mutation_prob = gene_mutation_prob
+        self.n_jobs = n_jobs if n_jobs is not None else (os.cpu_count() or 1)
+        self.seed = seed
+        # Shared across runs; pass FitnessCache(maxsize=0) to disable memoization
+        self.fitness_cache = fitness_cache if fitness_cache is not None else FitnessCache()
+        if islands < 1:
+            raise ValueError(f"islands must be at least 1, not {islands}")
+        self.islands = int(islands)
+        # 0 or None never migrates: fully independent islands
+        self.migration_interval = migration_interval or 0
+        self.migration_size = migration_size
+
+    def build_toolbox(self, num_trains, seed_statuses):
+        """Register the genetic operators for a fleet of ``num_trains``"""
+        safe_create_deap_types()
+        gene_mutation_prob = self.gene_mutation_prob or max(1.0 / num_trains, 0.02)
+        seed_statuses = [int(s) for s in seed_statuses]
+
+        def seeded_individual():
+            # Start from the model predictions with a few perturbed genes
+            genes = [s if random.random() > 0.2 else random.randint(0, 2) for s in seed_statuses]
+            return creator.Individual(genes)
+
+        toolbox = base.Toolbox()
+        toolbox.register("individual", seeded_individual)
+        toolbox.register("population", tools.initRepeat, list, toolbox.individual)
+        if num_trains >= 2:
+            toolbox.register("mate", tools.cxTwoPoint)
+        else:
+            toolbox.register("mate", tools.cxUniform, indpb=0.5)
+        toolbox.register("mutate", tools.mutUniformInt, low=0, up=2, indpb=gene_mutation_prob)
+        toolbox.register("select", tools.selNSGA2)
+        return toolbox
+
+    def _evaluate(self, toolbox, individuals, scenario):
+        """Evaluate individuals with invalid fitness, consulting the fitness cache first.
+
+        Cache misses are deduplicated and scored in chunks through
+        toolbox.map. Returns the number of individuals actually evaluated.
+        """
+        pending = {}
+        for ind in individuals:
+            if ind.fitness.valid:
+                continue
+            cached = self.fitness_cache.lookup(scenario, ind)
+            if cached is not None:
+                ind.fitness.values = cached
+            else:
+                pending.setdefault(FitnessCache.individual_key(ind), []).append(ind)
+        if not pending:
+            return 0
+
+        unique = [group[0] for group in pending.values()]
+        num_chunks = max(1, min(self.n_jobs, len(unique)))
+        chunks = [[list(ind) for ind in unique[i::num_chunks]] for i in range(num_chunks)]
+        for i, objectives in enumerate(toolbox.map(toolbox.evaluate, chunks)):
+            for ind, fitness in zip(unique[i::num_chunks], objectives):
+                fitness = tuple(fitness)
+                self.fitness_cache.store(scenario, ind, fitness)
+                for duplicate in pending[FitnessCache.individual_key(ind)]:
+                    duplicate.fitness.values = fitness
+        return len(unique)
+
+    def evolve(self, evaluator, seed_statuses):
+        """Run the NSGA-II loop and return the final population and the number of real evaluations"""
+        # DEAP's operators use the global ``random``; run on a private stream and restore it after
+        outer_state = random.getstate()
+        if self.seed is not None:
+            random.setstate(random.Random(self.seed).getstate())
+
+        toolbox = self.build_toolbox(len(seed_statuses), seed_statuses)
+        scenario = FitnessCache.scenario_key(evaluator)
+        pool = None
+        if self.n_jobs > 1:
+            pool = multiprocessing.Pool(self.n_jobs, initializer=_init_worker, initargs=(evaluator,))
+            toolbox.register("map", pool.map)
+            toolbox.register("evaluate", _evaluate_chunk)
+        else:
+            toolbox.register("evaluate", partial(_evaluate_chunk_with, evaluator))
+
+        try:
+            population, evaluations = self.initial_population(toolbox, seed_statuses, self.population_size, scenario)
+            for _ in range(self.generations):
+                population, count = self.generation(toolbox, population, scenario)
+                evaluations += count
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            random.setstate(outer_state)
+
+        return population, evaluations
+
+    def initial_population(self, toolbox, seed_statuses, size, scenario):
+        """Perturbed copies of the model predictions plus the predictions themselves, evaluated"""
+        population = toolbox.population(n=size - 1)
+        population.append(creator.Individual(int(s) for s in seed_statuses))
+        evaluations = self._evaluate(toolbox, population, scenario)
+        # Assigns crowding distances used by the tournament
+        return toolbox.select(population, len(population)), evaluations
+
+    def generation(self, toolbox, population, scenario):
+        """One NSGA-II generation: tournament, crossover, mutation and elitist selection"""
+        offspring = tools.selTournamentDCD(population, len(population))
+        offspring = [toolbox.clone(ind) for ind in offspring]
+
+        for child1, child2 in zip(offspring[::2], offspring[1::2]):
+            if random.random() <= self.crossover_prob:
+                toolbox.mate(child1, child2)
+                del child1.fitness.values, child2.fitness.values
+
+        for mutant in offspring:
+            if random.random() <= self.mutation_prob:
+                toolbox.mutate(mutant)
+                del mutant.fitness.values
+
+        evaluations = self._evaluate(toolbox, offspring, scenario)
+        return toolbox.select(population + offspring, len(population)), evaluations
+
+    def evolve_islands(self, evaluator, seed_statuses):
+        """Run the island model and return the merged final populations and the number of real evaluations.
+
+        Island seeds are spawned from ``seed``, and migration happens at
+        fixed generations, so a seeded run is the same whatever ``n_jobs``.
+        """
+        safe_create_deap_types()
+        # Split the population evenly; selTournamentDCD needs multiples of four
+        size = max(4, int(np.ceil(self.population_size / self.islands / 4)) * 4)
+        seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(self.seed).spawn(self.islands)]
+        # Islands are built where they run, from picklable settings
+        settings = copy.copy(self)
+        settings.enhanced_model = None
+        settings.fitness_cache = None
+        settings.n_jobs = 1
+        seed_statuses = [int(s) for s in seed_statuses]
+
+        interval = self.migration_interval or self.generations
+        epochs = [interval] * (self.generations // interval) if interval else []
+        if self.generations - sum(epochs) or not epochs:
+            epochs.append(self.generations - sum(epochs))
+        migrate = self.islands > 1 and self.migration_interval and self.migration_size
+
+        workers = 1 if self.n_jobs <= 1 else min(self.n_jobs, self.islands)
+        members = [list(range(self.islands))[w::workers] for w in range(workers)]
+        host = _LocalIslands if workers == 1 else _IslandProcess
+        hosts = []
+        try:
+            for indices in members:
+                hosts.append(host(settings, evaluator, seed_statuses, size,
+                                  [seeds[i] for i in indices], self.fitness_cache.maxsize))
+
+            for epoch, generations in enumerate(epochs):
+                last = epoch == len(epochs) - 1
+                for h in hosts:
+                    h.send('run', generations, 0 if last or not migrate else self.migration_size)
+                emigrants = [None] * self.islands
+                for indices, h in zip(members, hosts):
+                    for i, migrants in zip(indices, h.receive()):
+                        emigrants[i] = migrants
+                if migrate and not last:
+                    # Ring topology: island i sends to island i + 1
+                    for indices, h in zip(members, hosts):
+                        h.send('immigrate', [emigrants[i - 1] for i in indices])
+                        h.receive()
+
+            for h in hosts:
+                h.send('finish')
+            snapshots = [None] * self.islands
+            for indices, h in zip(members, hosts):
+                for i, snapshot in zip(indices, h.receive()):
+                    snapshots[i] = snapshot
+        finally:
+            for h in hosts:
+                h.close()
+
+        # Merge in island order so the front does not depend on the process layout
+        population = [_individual(genes, values) for individuals, _ in snapshots for genes, values in individuals]
+        evaluations = sum(count for _, count in snapshots)
+
+        logger.info(f"{self.islands} islands of {size} evolved {self.generations} generations "
+                    f"in {workers} processes, {evaluations} evaluations")
+        return population, evaluations
+
+    def plan(self, df_day: pd.DataFrame,
+             min_revenue_trains=DEFAULT_MIN_REVENUE_TRAINS,
+             cleaning_slots=DEFAULT_CLEANING_SLOTS,
+             depot_bays=DEFAULT_DEPOT_BAYS,
+             weights=None, predictions=None, solver=None, confidence=None) -> Dict[str, Any]:
+        """Plan inductions for one day's fleet.
+
+        ``predictions`` may carry precomputed model labels for the rows of
+        ``df_day`` (and ``confidence`` their probabilities) so callers
+        running many scenarios predict only once.
+        ``solver`` overrides the planner's default solver for this call.
+        """
+        start = time.time()
+        solver = solver or self.solver
+        try:
+            if solver not in SOLVERS:
+                return {'success': False, 'error': f"Unknown solver '{solver}', expected one of {SOLVERS}"}
+            if self.enhanced_model.model is None or self.enhanced_model.preprocessor is None:
+                return {'success': False, 'error': 'Model not trained. Please train the model first.'}
+            if len(df_day) == 0:
+                return {'success': False, 'error': 'No trains to plan'}
+
+            df_day, feature_names = prepare_day(self.enhanced_model, df_day)
+            X_processed = self.enhanced_model.preprocessor.transform(df_day[feature_names])
+            if predictions is None:
+                predictions, confidence, _ = self.enhanced_model.predict_with_confidence(X_processed)
+            elif confidence is None:
+                confidence = np.ones(len(df_day))
+
+            evaluator = PopulationEvaluator(
+                df_day, self.enhanced_model, self.enhanced_model.preprocessor, feature_names,
+                min_revenue_trains=min_revenue_trains, cleaning_slots=cleaning_slots,
+                depot_bays=depot_bays, weights=weights, predictions=predictions
+            )
+
+            if solver == 'milp':
+                return self._plan_milp(df_day, evaluator, confidence, start,
+                                       min_revenue_trains, cleaning_slots, depot_bays)
+
+            if self.islands > 1:
+                population, evaluations = self.evolve_islands(evaluator, evaluator.predictions)
+            else:
+                population, evaluations = self.evolve(evaluator, evaluator.predictions)
+            front = tools.sortNondominated(population, len(population), first_front_only=True)[0]
+
+            # Unserviceable trains are always sent to maintenance
+            serviceable = evaluator.serviceable
+            front_statuses = []
+            seen = set()
+            for ind in front:
+                statuses = tuple(int(s) if serviceable[i] or s == MAINTENANCE else MAINTENANCE
+                                 for i, s in enumerate(ind))
+                if statuses not in seen:
+                    seen.add(statuses)
+                    front_statuses.append((statuses, ind.fitness.values))
+
+            best_statuses, best_objectives = select_plan(front_statuses, min_revenue_trains)
+            plan = build_induction_list(df_day, np.array(best_statuses), confidence)
+
+            result = {
+                'success': True,
+                'solver': 'nsga2',
+                'plan': plan,
+                'objectives': dict(zip(OBJECTIVE_NAMES, best_objectives)),
+                'pareto_front': [front_entry(statuses, objectives) for statuses, objectives in front_statuses],
+                'generations': self.generations,
+                'population_size': self.population_size,
+                'evaluations': evaluations,
+                'fitness_cache': self.fitness_cache.stats(),
+                'elapsed_seconds': round(time.time() - start, 3)
+            }
+            if self.islands > 1:
+                result['population_size'] = len(population)
+                result['islands'] = {
+                    'count': self.islands,
+                    'migration_interval': self.migration_interval,
+                    'migration_size': self.migration_size
+                }
+            return result
+        except Exception as e:
+            logger.error(f"Error running induction planner: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def _plan_milp(self, df_day, evaluator, confidence, start,
+                   min_revenue_trains, cleaning_slots, depot_bays):
+        """Solve the day exactly and report it in the planner result format"""
+        # Cost terms are normalized by the solver, so it gets unit-weight arrays
+        unit_evaluator = PopulationEvaluator(
+            df_day, None, None, None, cleaning_slots=cleaning_slots,
+            depot_bays=depot_bays, predictions=evaluator.predictions
+        )
+        solution = solve_induction_milp(
+            df_day, unit_evaluator, predictions=evaluator.predictions, confidence=confidence,
+            min_revenue_trains=min_revenue_trains, cleaning_slots=cleaning_slots,
+            depot_bays=depot_bays, weights=evaluator.weights, time_limit=self.milp_time_limit
+        )
+        statuses = solution['statuses']
+        objectives = tuple(evaluator.evaluate_assignments(statuses[None, :])[0].tolist())
+
+        return {
+            'success': True,
+            'solver': 'milp',
+            'plan': build_induction_list(df_day, statuses, confidence),
+            'objectives': dict(zip(OBJECTIVE_NAMES, objectives)),
+            'pareto_front': [front_entry(tuple(int(s) for s in statuses), objectives)],
+            'optimal': solution['optimal'],
+            'min_revenue_met': solution['min_revenue_met'],
+            'revenue_shortfall': solution['revenue_shortfall'],
+            'solver_message': solution['message'],
+            'elapsed_seconds': round(time.time() - start, 3)
+        }
+
+def front_entry(statuses, objectives):
+    """Describe one Pareto-front assignment"""
+    return {
+        'objectives': dict(zip(OBJECTIVE_NAMES, objectives)),
+        'revenue_trains': statuses.count(REVENUE),
+        'standby_trains': statuses.count(STANDBY),
+        'maintenance_trains': statuses.count(MAINTENANCE),
+        'statuses': [STATUS_LABELS[s] for s in statuses]
+    }
+
+def select_plan(front, min_revenue_trains):
+    """Pick one plan from (statuses, objectives) pairs on the Pareto front.
+
+    Plans meeting the revenue requirement are preferred; among those the one
+    with the best sum of objectives normalized across the front wins.
+    """
+    candidates = [item for item in front if item[0].count(REVENUE) >= min_revenue_trains] or front
+    objectives = np.array([item[1] for item in candidates], dtype=float)
+    low, high = objectives.min(axis=0), objectives.max(axis=0)
+    span = np.where(high > low, high - low, 1.0)
+    normalized = ((objectives - low) / span).sum(axis=1)
+    return candidates[int(np.argmax(normalized))]
+
+def build_induction_list(df_day: pd.DataFrame, statuses, confidence) -> List[Dict[str, Any]]:
+    """Ranked induction list in the dashboard format, service trains first"""
+    def column(name, default):
+        if name in df_day.columns:
+            values = df_day[name]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype(object)
+            return values.fillna(default).to_numpy()
+        return np.full(len(df_day), default)
+
+    statuses = np.asarray(statuses)
+    fitness = column('fitness_score', 0.0).astype(float)
+    shunting = column('shunting_time_minutes', 0.0).astype(float)
+    bay_efficiency = column('bay_efficiency', 1.0).astype(float)
+    maintenance_cost = column('maintenance_cost', 0.0).astype(float)
+
+    table = pd.DataFrame({
+        'train_id': df_day['train_id'].to_numpy() if 'train_id' in df_day.columns else np.arange(len(df_day)),
+        'status_code': statuses,
+        'readiness': np.round(np.asarray(confidence, dtype=float), 3),
+        'sla_deficit': column('branding_deficit', 0.0).astype(float),
+        'mileage': column('mileage', 0.0).astype(float),
+        'shunting_time': shunting,
+        'turnout_penalty': np.where(statuses == REVENUE, shunting * (1 - bay_efficiency), 0.0),
+        'maintenance_cost': maintenance_cost,
+        'fitness_score': fitness,
+        'branding_efficiency': column('branding_efficiency', 0.0).astype(float),
+        'job_card_status': column('job_card_status', 'unknown').astype(str)
+    })
+    rank = table['status_code'].map({REVENUE: 0, STANDBY: 1, MAINTENANCE: 2})
+    table = table.assign(rank=rank).sort_values(
+        ['rank', 'fitness_score', 'readiness'], ascending=[True, False, False], kind='stable'
+    )
+
+    plan = []
+    for position, row in enumerate(table.itertuples(index=False), 1):
+        plan.append({
+            'rank': position,
+            'train_id': row.train_id.item() if hasattr(row.train_id, 'item') else row.train_id,
+            'assigned_status': ASSIGNED_STATUS_NAMES[int(row.status_code)],
+            'readiness': float(row.readiness),
+            'sla_deficit': float(row.sla_deficit),
+            'mileage': float(row.mileage),
+            'shunting_time': float(row.shunting_time),
+            'turnout_penalty': float(row.turnout_penalty),
+            'maintenance_cost': float(row.maintenance_cost),
+            'explainability': {
+                'fitness_score': float(row.fitness_score),
+                'branding_efficiency': float(row.branding_efficiency),
+                'job_card_status': row.job_card_status,
+                'fitness_ok': bool(row.fitness_score >= 1.0)
+            }
+        })
+    return plan
+
+def select_day(df: pd.DataFrame, date=None) -> pd.DataFrame:
+    """Rows of ``df`` for ``date``, or for the latest date when it is absent"""
+    if 'date' not in df.columns:
+        return df.reset_index(drop=True)
+    dates = pd.to_datetime(df['date'])
+    target = pd.Timestamp(date) if date is not None else dates.max()
+    if not (dates == target).any():
+        target = dates.max()
+    return df[dates == target].reset_index(drop=True)
+
+def train_planner_model(enhanced_model, history: pd.DataFrame, model_type='xgboost',
+                        tune_hyperparams=False):
+    """Fit ``enhanced_model`` on labelled history so it can drive the planner"""
+    if 'induction_status' not in history.columns:
+        raise ValueError("Training data needs an 'induction_status' column")
+    X = enhanced_model.preprocess_data(history, training=True)
+    y = history['induction_status'].map(STATUS_CODES)
+    if y.isna().any():
+        raise ValueError(f"Unknown induction_status values, expected one of {STATUS_LABELS}")
+    enhanced_model.train_model(X, y.to_numpy(dtype=int), model_type=model_type,
+                               tune_hyperparams=tune_hyperparams)
+    return enhanced_model
+
+def train_planner_model_streaming(enhanced_model, chunks, model_type='xgboost',
+                                  tune_hyperparams=False, directory: Optional[str] = None):
+    """Like ``train_planner_model``, for histories too large to load at once.
+
+    ``chunks`` is a callable returning a fresh iterable of history frames,
+    e.g. ``lambda: iter_history(path)`` or ``store.iter_chunks``. The
+    training matrix is built in a memory-mapped file under ``directory``
+    (default: the system temp dir) and removed after fitting.
+    """
+    with tempfile.TemporaryDirectory(prefix='kmrl-train-', dir=directory) as scratch:
+        X, y = enhanced_model.preprocess_streaming(
+            chunks, os.path.join(scratch, 'training_matrix.npy'),
+            target='induction_status', label_map=STATUS_CODES
+        )
+        enhanced_model.train_model(X, y.astype(int), model_type=model_type,
+                                   tune_hyperparams=tune_hyperparams)
+        del X
+    return enhanced_model
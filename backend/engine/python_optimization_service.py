@@ -6,36 +6,190 @@ This service provides an API to run optimization using the pre-trained model
 
 import sys
 import json
+import argparse
 import pandas as pd
 import numpy as np
 import pickle
 import logging
+import signal
+import time
+from contextlib import nullcontext
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, NamedTuple, Optional
 import os
 
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import the model functions
-from model import EnhancedTrainInductionModel, load_dataset, safe_create_deap_types
+from scoring import SCORING_INPUTS, compute_scores, build_results, summarize
+from model_bundle import ModelBundle, BundleError, DEFAULT_BUNDLE_PATH, MANIFEST_NAME
+from tree_predictor import compile_ensemble, verify
+from features import feature_engine
+from cache import ResultCache
+from instrumentation import PROFILE_DIR_ENV, RequestProfiler, StageTimer, stage
+import metrics
+from payloads import FORMATS, Payload, read_payload, to_frame
+from uploads import factor_sources, join_factors
+from ingestion import CATEGORY_COLUMNS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Align with exact training feature order from model2.preprocess_data
+MODEL_FEATURES = [
+    'rolling_stock_fitness', 'signalling_fitness', 'telecom_fitness',
+    'job_card_status', 'branding_hours', 'branding_total', 'mileage',
+    'cleaning_slot', 'stabling_bay', 'shunting_time_minutes',
+    'is_serviceable', 'branding_sla_met', 'mileage_balance_deviation'
+]
+SCALED_FEATURES = [
+    'branding_hours', 'branding_total', 'mileage',
+    'shunting_time_minutes', 'mileage_balance_deviation'
+]
+
+# Everything a response depends on, in a fixed order for result cache keys
+RESULT_INPUTS = sorted(set(MODEL_FEATURES) | set(SCORING_INPUTS))
+
+metrics.watch_cache('derived_features', feature_engine.cache)
+
+# Fixed job card codes shared by training and serving, in LabelEncoder order
+# of the schema categories; missing or unknown statuses count as open
+JOB_CARD_CODES = {status: code for code, status in enumerate(CATEGORY_COLUMNS['job_card_status'])}
+
+def encode_features(df: pd.DataFrame, scaler, timer: Optional[StageTimer] = None) -> pd.DataFrame:
+    """Build the model input matrix in training feature order"""
+    with stage(timer, 'encode'):
+        X = _encode_columns(df)
+    # Scale numerical features exactly as in training
+    with stage(timer, 'scale'):
+        X[SCALED_FEATURES] = scaler.transform(X[SCALED_FEATURES])
+    return X
+
+def _encode_columns(df: pd.DataFrame) -> pd.DataFrame:
+    all_features = MODEL_FEATURES
+    
+    # Ensure all features exist
+    for feature in all_features:
+        if feature not in df.columns:
+            df[feature] = 0
+    
+    X = df[all_features].copy()
+
+    # Encode job_card_status with the fixed training codes, independent of row order
+    # If numeric is provided (e.g., percentages), coerce to categories first.
+    if pd.api.types.is_numeric_dtype(X['job_card_status']):
+        X['job_card_status'] = np.where(X['job_card_status'] >= 50, 'closed', 'open')
+    codes = X['job_card_status'].astype(object).map(JOB_CARD_CODES)
+    X['job_card_status'] = codes.fillna(JOB_CARD_CODES['open']).astype(int)
+    return X
+
+class ServingModel(NamedTuple):
+    """Everything one request needs, replaced as a unit on reload"""
+    model: Any
+    scaler: Any
+    le_status: Any
+    version: Optional[str]
+    # mtime of the bundle manifest it came from, None for legacy pickles
+    manifest_mtime: Optional[int] = None
+
+def default_result_cache() -> ResultCache:
+    """Result cache configured from KMRL_RESULT_CACHE_SIZE, _TTL and _DIR"""
+    return ResultCache(maxsize=int(os.environ.get('KMRL_RESULT_CACHE_SIZE', 256)),
+                       ttl=float(os.environ.get('KMRL_RESULT_CACHE_TTL', 300)),
+                       directory=os.environ.get('KMRL_RESULT_CACHE_DIR') or None)
+
 class PythonOptimizationService:
-    def __init__(self):
-        self.model = None
-        self.scaler = None
-        self.le_status = None
+    def __init__(self, bundle_path: Optional[str] = None, result_cache: Optional[ResultCache] = None):
+        self.serving = ServingModel(None, None, None, None)
+        configured = bundle_path or os.environ.get('KMRL_MODEL_BUNDLE')
+        self.bundle_path = configured or DEFAULT_BUNDLE_PATH
+        # Only the default location may fall back to the legacy pickles
+        self.bundle_required = bool(configured)
         self.feature_names = []
         self.numerical_features = []
+        self._failed_mtime = None
+        # Pass ResultCache(maxsize=0) to disable
+        self.result_cache = result_cache if result_cache is not None else default_result_cache()
+        metrics.watch_cache('results', self.result_cache)
         self.load_model()
+
+    # Requests read one ServingModel snapshot, so a reload that rebinds
+    # self.serving never mixes old and new components mid-request
+    @property
+    def model(self):
+        return self.serving.model
+
+    @property
+    def scaler(self):
+        return self.serving.scaler
+
+    @property
+    def le_status(self):
+        return self.serving.le_status
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return self.serving.version
+
+    def _manifest_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.bundle_path, MANIFEST_NAME)).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload_if_changed(self) -> bool:
+        """Swap in the bundle if a new one was published since it was loaded"""
+        mtime = self._manifest_mtime()
+        if mtime is None or mtime in (self.serving.manifest_mtime, self._failed_mtime):
+            return False
+        self._failed_mtime = mtime  # cleared below; a broken bundle is tried once
+        previous = self.model_version
+        if not self.load_model():
+            return False
+        self._failed_mtime = None
+        if self.model_version != previous:
+            logger.info(f"Swapped model {previous} for {self.model_version}")
+            return True
+        return False
     
+    def load_bundle(self) -> bool:
+        """Load the model from the versioned bundle, verifying checksums and schema"""
+        bundle = ModelBundle.open(self.bundle_path)
+        manifest_mtime = os.stat(os.path.join(bundle.path, MANIFEST_NAME)).st_mtime_ns
+        bundle.check_schema(MODEL_FEATURES, SCALED_FEATURES)
+        # The compiled predictor serves without unpickling the estimator
+        model = bundle.predictor or bundle.estimator
+        scaler, le_status = bundle.scaler, bundle.label_encoder
+        if scaler is None or le_status is None:
+            raise BundleError(f"Bundle {bundle.version} has no scaler or label encoder")
+        self.serving = ServingModel(model, scaler, le_status, bundle.version, manifest_mtime)
+        logger.info(f"Successfully loaded model bundle {bundle.version}")
+        return True
+
     def load_model(self):
-        """Load the pre-trained model and related objects"""
+        """Load the pre-trained model and related objects.
+
+        A model bundle is preferred when one exists; otherwise the three
+        legacy pickles are read, unless a bundle path was configured
+        (``bundle_path`` or ``KMRL_MODEL_BUNDLE``), which must then exist.
+        The new objects are only swapped in once everything has loaded, so a
+        failed reload leaves the previously loaded model in place.
+        """
+        start = time.perf_counter()
+        success = self._load_model()
+        metrics.observe_model_load(time.perf_counter() - start, success, self.model_version)
+        if success:
+            # Even an unchanged version may be a different legacy pickle
+            self.result_cache.invalidate(self.model_version)
+        return success
+
+    def _load_model(self):
         try:
+            if os.path.isdir(self.bundle_path) or self.bundle_required:
+                return self.load_bundle()
+
             model_path = os.path.join(os.path.dirname(__file__), 'rf_model.pkl')
             scaler_path = os.path.join(os.path.dirname(__file__), 'scaler.pkl')
             le_status_path = os.path.join(os.path.dirname(__file__), 'le_status.pkl')
@@ -45,22 +199,36 @@ class PythonOptimizationService:
                 return False
             
             with open(model_path, 'rb') as f:
-                self.model = pickle.load(f)
+                model = pickle.load(f)
             with open(scaler_path, 'rb') as f:
-                self.scaler = pickle.load(f)
+                scaler = pickle.load(f)
             with open(le_status_path, 'rb') as f:
-                self.le_status = pickle.load(f)
+                le_status = pickle.load(f)
+
+            try:
+                compiled = compile_ensemble(model)
+                verify(compiled, model)
+                model = compiled
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Serving {type(model).__name__} uncompiled: {e}")
             
+            modified = datetime.fromtimestamp(os.path.getmtime(model_path)).strftime('%Y%m%d%H%M%S')
+            self.serving = ServingModel(model, scaler, le_status, f'legacy-pickles-{modified}')
             logger.info("Successfully loaded pre-trained model, scaler, and label encoder")
             return True
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}")
             return False
+
+    def is_ready(self, serving: Optional[ServingModel] = None) -> bool:
+        """Whether the model, scaler and label encoder are all loaded"""
+        serving = serving or self.serving
+        return serving.model is not None and serving.scaler is not None and serving.le_status is not None
     
-    def preprocess_uploaded_data(self, data: List[Dict[str, Any]]) -> Optional[pd.DataFrame]:
-        """Preprocess uploaded data to match model requirements"""
+    def preprocess_uploaded_data(self, data: Payload) -> Optional[pd.DataFrame]:
+        """Preprocess uploaded records, or a columnar DataFrame, to match model requirements"""
         try:
-            df = pd.DataFrame(data)
+            df = to_frame(data)
             
             # Required columns mapping from frontend to model
             column_mapping = {
@@ -122,19 +290,8 @@ class PythonOptimizationService:
             df['shunting_time_minutes'] = df['shunting_time_minutes'].fillna(30.0).astype(float)
             df['mileage_balance_deviation'] = df['mileage_balance_deviation'].fillna(0.0).astype(float)
             
-            # Calculate derived features
-            df['fitness_score'] = (df['rolling_stock_fitness'] + df['signalling_fitness'] + df['telecom_fitness']) / 3.0
-            df['branding_efficiency'] = np.where(df['branding_total'] > 0, df['branding_hours'] / df['branding_total'], 0)
-            df['branding_deficit'] = (df['branding_total'] - df['branding_hours']).clip(lower=0)
-            df['branding_urgency'] = df['branding_deficit'] / (df['branding_total'] + 1e-6)
-            df['mileage_utilization'] = df['mileage'] / (df['branding_total'] + 1e-6)
-            df['maintenance_urgency'] = (
-                (1 - df['fitness_score']) * 0.4 +
-                (df['mileage_balance_deviation'] / (df['mileage'] + 1e-6)) * 0.3 +
-                df['branding_urgency'] * 0.3
-            )
-            df['cleaning_priority'] = ((df['cleaning_slot'] == 0) & (df['is_serviceable'] == 1)).astype(int)
-            df['bay_efficiency'] = np.where(df['stabling_bay'] > 0, 1 / df['stabling_bay'], 0)
+            # Calculate derived features (shared with training, memoized per frame)
+            df = feature_engine.derive(df, include_date=False)
             
             # Add date column for consistency
             df['date'] = datetime.now().strftime('%Y-%m-%d')
@@ -146,154 +303,416 @@ class PythonOptimizationService:
             logger.error(f"Error preprocessing data: {str(e)}")
             return None
     
-    def run_optimization(self, data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Run optimization on the provided data"""
-        try:
-            if not self.model or not self.scaler or not self.le_status:
-                return {
-                    'success': False,
-                    'error': 'Model not loaded. Please train the model first.'
-                }
-            
-            # Preprocess the data
-            df = self.preprocess_uploaded_data(data)
-            if df is None:
-                return {
-                    'success': False,
-                    'error': 'Failed to preprocess data'
-                }
-            
-            # Align with exact training feature order from model2.preprocess_data
-            # features = ['rolling_stock_fitness', 'signalling_fitness', 'telecom_fitness',
-            #             'job_card_status', 'branding_hours', 'branding_total', 'mileage',
-            #             'cleaning_slot', 'stabling_bay', 'shunting_time_minutes',
-            #             'is_serviceable', 'branding_sla_met', 'mileage_balance_deviation']
-            all_features = [
-                'rolling_stock_fitness', 'signalling_fitness', 'telecom_fitness',
-                'job_card_status', 'branding_hours', 'branding_total', 'mileage',
-                'cleaning_slot', 'stabling_bay', 'shunting_time_minutes',
-                'is_serviceable', 'branding_sla_met', 'mileage_balance_deviation'
-            ]
-            numerical_features = [
-                'branding_hours', 'branding_total', 'mileage',
-                'shunting_time_minutes', 'mileage_balance_deviation'
-            ]
-            
-            # Ensure all features exist
-            for feature in all_features:
-                if feature not in df.columns:
-                    df[feature] = 0
-            
-            X = df[all_features].copy()
+    def encode_features(self, df: pd.DataFrame, scaler=None, timer: Optional[StageTimer] = None) -> pd.DataFrame:
+        """Build the model input matrix in training feature order"""
+        return encode_features(df, scaler if scaler is not None else self.scaler, timer)
+
+    def run_optimization(self, data: Payload, timings: bool = False, profile=None,
+                         timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+        """Run optimization on the provided data.
 
-            # Encode job_card_status similar to training (label encoding of strings)
-            # If numeric is provided (e.g., percentages), coerce to categories first.
-            if pd.api.types.is_numeric_dtype(X['job_card_status']):
-                X['job_card_status'] = np.where(X['job_card_status'] >= 50, 'closed', 'open')
-            X['job_card_status'] = X['job_card_status'].fillna('unknown').astype(str)
-            # Fallback encoding without the original encoder: stable factorize mapping
-            X['job_card_status'] = pd.factorize(X['job_card_status'])[0]
+        With ``timings`` the response carries a ``timings`` block of
+        per-stage milliseconds and peak memory; pass ``timer`` to include
+        stages the caller already timed, such as JSON parsing. ``profile``
+        (True, a directory or a file path) runs this request under cProfile
+        and tracemalloc and reports the written file as ``profile_path``.
+        """
+        timer = timer or StageTimer()
+        profiler = RequestProfiler(profile, label=f"run_optimization of {len(data)} records") if profile else None
+        with profiler or nullcontext():
+            result = self._optimize(data, timer)
+            if timings:
+                # Inside the profiler, so the traced memory peak is reported too
+                result['timings'] = timer.report()
+        if profiler is not None:
+            result['profile_path'] = profiler.path
+        metrics.observe_request(timer.stages, time.perf_counter() - timer.started, len(data),
+                                bool(result.get('success')))
+        return result
 
-            # Scale numerical features exactly as in training
-            X.loc[:, numerical_features] = self.scaler.transform(X[numerical_features])
+    def run_factor_uploads(self, sources, how: str = 'outer', timer: Optional[StageTimer] = None,
+                           **options) -> Dict[str, Any]:
+        """Join the per-factor upload files (paths or file objects) and optimize that fleet.
+
+        The response also carries the join's ``join_report`` of missing and
+        repeated train ids; ``options`` are passed to ``run_optimization``.
+        """
+        timer = timer or StageTimer()
+        with timer.stage('join'):
+            df, report = join_factors(sources, how)
+        result = self.run_optimization(df, timer=timer, **options)
+        result['join_report'] = report
+        return result
+
+    def _optimize(self, data: Payload, timer: StageTimer) -> Dict[str, Any]:
+        try:
+            serving = self.serving
+            if not self.is_ready(serving):
+                return self._not_ready()
+            prepared = self._prepare(data, serving, timer)
+            if isinstance(prepared, dict):
+                return prepared
+            df, X, keys = prepared
 
             # Predict induction status
-            predictions = self.model.predict(X)
-            
-            # Calculate scores and rankings
-            results = []
-            for idx, (_, row) in enumerate(df.iterrows()):
-                prediction = predictions[idx]
-                
-                # Calculate overall score based on factors
-                fitness_score = row['fitness_score'] * 100
-                job_card_score = 100 if row['job_card_status'] == 'closed' else 0
-                branding_score = min(100, (row['branding_hours'] / 8.0) * 100)  # 8 hours is SLA
-                mileage_score = max(0, 100 - (row['mileage_balance_deviation'] / 1000))
-                cleaning_score = 100 if row['cleaning_slot'] > 0 else 50
-                geometry_score = 100 if row['stabling_bay'] > 0 else 50
-                
-                # Weighted overall score
-                overall_score = (
-                    fitness_score * 0.25 +
-                    job_card_score * 0.20 +
-                    branding_score * 0.15 +
-                    mileage_score * 0.15 +
-                    cleaning_score * 0.10 +
-                    geometry_score * 0.15
-                )
-                
-                # Determine induction status based on prediction and score
-                if prediction == 1 and overall_score >= 70:
-                    induction_status = 'revenue'
-                elif prediction == 2 or (prediction == 1 and overall_score >= 50):
-                    induction_status = 'standby'
-                else:
-                    induction_status = 'maintenance'
-                
-                result = {
-                    'train_id': row['train_id'],
-                    'induction_status': induction_status,
-                    'overall_score': round(overall_score, 2),
-                    'fitness_score': round(fitness_score, 2),
-                    'job_card_score': round(job_card_score, 2),
-                    'branding_score': round(branding_score, 2),
-                    'mileage_score': round(mileage_score, 2),
-                    'cleaning_score': round(cleaning_score, 2),
-                    'geometry_score': round(geometry_score, 2),
-                    'cleaning_slot': int(row['cleaning_slot']),
-                    'stabling_bay': int(row['stabling_bay']),
-                    'explainability': f"Score: {overall_score:.1f} - Fitness: {fitness_score:.1f}, Job Card: {job_card_score:.1f}, Branding: {branding_score:.1f}, Mileage: {mileage_score:.1f}, Cleaning: {cleaning_score:.1f}, Geometry: {geometry_score:.1f}"
-                }
-                results.append(result)
-            
-            # Sort by overall score (descending)
-            results.sort(key=lambda x: x['overall_score'], reverse=True)
-            
-            # Calculate summary statistics
-            total_trains = len(results)
-            revenue_trains = len([r for r in results if r['induction_status'] == 'revenue'])
-            standby_trains = len([r for r in results if r['induction_status'] == 'standby'])
-            maintenance_trains = len([r for r in results if r['induction_status'] == 'maintenance'])
-            average_score = sum(r['overall_score'] for r in results) / total_trains if total_trains > 0 else 0
-            
-            return {
-                'success': True,
-                'results': results,
-                'summary': {
-                    'total_trains': total_trains,
-                    'revenue_trains': revenue_trains,
-                    'standby_trains': standby_trains,
-                    'maintenance_trains': maintenance_trains,
-                    'average_score': round(average_score, 2),
-                    'highest_score': max(r['overall_score'] for r in results) if results else 0,
-                    'lowest_score': min(r['overall_score'] for r in results) if results else 0
-                }
-            }
+            with timer.stage('predict'):
+                predictions = serving.model.predict(X)
+            return self._finish(df, predictions, timer, keys)
             
         except Exception as e:
-            logger.error(f"Error running optimization: {str(e)}")
+            return self._failure(e)
+
+    def run_batch(self, payloads: List[Payload], timers: Optional[List[StageTimer]] = None) -> List[Dict[str, Any]]:
+        """Optimize several requests with a single model prediction over all their rows.
+
+        Each request is preprocessed, scored and summarized on its own and
+        gets the same result ``run_optimization`` would return; only the
+        prediction is shared. A request that fails does not fail the others.
+        Every request's timer is charged the whole shared prediction, and
+        cached requests skip it.
+        """
+        timers = timers or [StageTimer() for _ in payloads]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(payloads)
+        prepared = []
+        serving = self.serving
+        for i, (data, timer) in enumerate(zip(payloads, timers)):
+            try:
+                outcome = self._prepare(data, serving, timer) if self.is_ready(serving) else self._not_ready()
+            except Exception as e:
+                outcome = self._failure(e)
+            if isinstance(outcome, dict):
+                results[i] = outcome
+            else:
+                prepared.append((i, *outcome))
+
+        if prepared:
+            start = time.perf_counter()
+            try:
+                X = pd.concat([p[2] for p in prepared], ignore_index=True) if len(prepared) > 1 else prepared[0][2]
+                predictions = serving.model.predict(X)
+                metrics.PREDICTION_BATCH.observe(len(prepared))
+            except Exception as e:
+                for i, *_ in prepared:
+                    results[i] = self._failure(e)
+                prepared = []
+            elapsed = time.perf_counter() - start
+
+            offset = 0
+            for i, df, X, keys in prepared:
+                timers[i].record('predict', elapsed)
+                try:
+                    results[i] = self._finish(df, predictions[offset:offset + len(X)], timers[i], keys)
+                except Exception as e:
+                    results[i] = self._failure(e)
+                offset += len(X)
+
+        for data, timer, result in zip(payloads, timers, results):
+            metrics.observe_request(timer.stages, time.perf_counter() - timer.started, len(data),
+                                    bool(result.get('success')))
+        return results
+
+    def _prepare(self, data: Payload, serving: ServingModel, timer: StageTimer):
+        """Preprocess and encode one request: ``(df, X, cache keys)``, or a cached or error response"""
+        cache = self.result_cache
+        # The raw payload's digest answers exact repeats without preprocessing;
+        # the preprocessed frame's also matches payloads that differ only in
+        # key order, aliases or defaulted columns
+        with timer.stage('cache'):
+            payload_key = cache.key(serving.version, cache.digest(data)) if cache.enabled else None
+            cached = cache.get(payload_key, count_miss=False)
+        if cached is not None:
+            return cached
+
+        with timer.stage('preprocess'):
+            df = self.preprocess_uploaded_data(data)
+        if df is None:
+            metrics.ERRORS.inc(type='preprocess_failed')
             return {
                 'success': False,
-                'error': str(e)
+                'error': 'Failed to preprocess data'
             }
 
+        with timer.stage('cache'):
+            frame_key = cache.key(serving.version, cache.digest(df[RESULT_INPUTS])) if cache.enabled else None
+            cached = cache.get(frame_key)
+        if cached is not None:
+            cache.put(payload_key, cached)
+            return cached
+        return df, self.encode_features(df, serving.scaler, timer), (payload_key, frame_key)
+
+    def _finish(self, df: pd.DataFrame, predictions, timer: StageTimer, keys=()) -> Dict[str, Any]:
+        # Score the whole fleet column-wise, then rank and summarize
+        with timer.stage('score'):
+            scores = compute_scores(df, predictions)
+        with timer.stage('sort'):
+            results = build_results(scores)
+        with timer.stage('summarize'):
+            summary = summarize(scores)
+        
+        response = {
+            'success': True,
+            'results': results,
+            'summary': summary
+        }
+        for key in keys:
+            self.result_cache.put(key, response)
+        return response
+
+    def _not_ready(self) -> Dict[str, Any]:
+        metrics.ERRORS.inc(type='model_not_loaded')
+        return {
+            'success': False,
+            'error': 'Model not loaded. Please train the model first.'
+        }
+
+    def _failure(self, e: Exception) -> Dict[str, Any]:
+        logger.error(f"Error running optimization: {str(e)}")
+        metrics.ERRORS.inc(type=type(e).__name__)
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+class OptimizationWorker:
+    """Long-lived worker serving optimization requests as JSON lines.
+
+    Each input line is a JSON object with a ``type`` and an optional ``id``
+    that is echoed back in the reply:
+
+    - ``{"type": "optimize", "data": [...]}`` runs ``run_optimization``;
+      ``"timings": true`` adds per-stage timings and ``"profile": true``
+      writes a cProfile/tracemalloc report for that request into the
+      worker's own ``profile`` directory. Fleets are only accepted inline:
+      the protocol never names files to read or write
+    - ``{"type": "health"}`` reports model state and request counters
+    - ``{"type": "reload"}`` reloads the model files from disk
+    - ``{"type": "metrics"}`` returns the Prometheus exposition as ``metrics``
+    - ``{"type": "shutdown"}`` stops the worker after replying
+
+    A ``{"type": "ready"}`` line is written once the model has been loaded.
+    Sending SIGHUP schedules a reload before the next request is handled;
+    a newly published bundle is also swapped in between requests.
+    """
+
+    def __init__(self, service: Optional[PythonOptimizationService] = None,
+                 instream=None, outstream=None, timings: bool = False, profile=None):
+        self.service = service or PythonOptimizationService()
+        # Defaults for requests that do not set "timings" or "profile"
+        self.timings = timings
+        self.profile = profile
+        self.instream = instream or sys.stdin
+        self.outstream = outstream or sys.stdout
+        self.started_at = time.time()
+        self.requests_served = 0
+        self.errors = 0
+        self.reload_requested = False
+        self.running = False
+
+    def send(self, message: Dict[str, Any]):
+        """Write a single protocol message"""
+        self.outstream.write(json.dumps(message) + "\n")
+        self.outstream.flush()
+
+    def health(self) -> Dict[str, Any]:
+        """Current worker status"""
+        return {
+            'status': 'ok' if self.service.is_ready() else 'model_not_loaded',
+            'model_loaded': self.service.is_ready(),
+            'model_version': self.service.model_version,
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - self.started_at, 3),
+            'requests_served': self.requests_served,
+            'errors': self.errors
+        }
+
+    def reload(self) -> bool:
+        """Reload the model, keeping the current one if loading fails"""
+        self.reload_requested = False
+        success = self.service.load_model()
+        logger.info(f"Worker model reload {'succeeded' if success else 'failed'}")
+        return success
+
+    def handle(self, message: Dict[str, Any], timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+        """Dispatch one request message and build its reply"""
+        message_type = message.get('type', 'optimize')
+        reply: Dict[str, Any] = {'id': message.get('id'), 'type': message_type}
+
+        if message_type == 'optimize':
+            rejected = self._rejected_fields(message)
+            if rejected:
+                self.errors += 1
+                metrics.ERRORS.inc(type='rejected_request')
+                reply['type'] = 'error'
+                reply['error'] = rejected
+                return reply
+            profile = message.get('profile')
+            options = {
+                'timings': bool(message.get('timings', self.timings)),
+                # The client only switches profiling on; the report location is the worker's
+                'profile': self.profile if profile is None else (self.profile or True) if profile else None,
+                'timer': timer
+            }
+            reply['result'] = self.service.run_optimization(message.get('data', []), **options)
+            self.requests_served += 1
+            if not reply['result'].get('success'):
+                self.errors += 1
+        elif message_type == 'health':
+            reply.update(self.health())
+        elif message_type == 'reload':
+            reply['success'] = self.reload()
+            reply['model_loaded'] = self.service.is_ready()
+            reply['model_version'] = self.service.model_version
+        elif message_type == 'metrics':
+            reply['metrics'] = metrics.registry.render()
+        elif message_type == 'shutdown':
+            reply['success'] = True
+            self.running = False
+        else:
+            self.errors += 1
+            metrics.ERRORS.inc(type='unknown_message_type')
+            reply['type'] = 'error'
+            reply['error'] = f"Unknown message type: {message_type}"
+        return reply
+
+    @staticmethod
+    def _rejected_fields(message: Dict[str, Any]) -> Optional[str]:
+        """Why an optimize request is refused, or None; clients may not name files"""
+        for field in ('input', 'factors'):
+            if field in message:
+                return f"'{field}' is not accepted by the worker; send the fleet inline as 'data'"
+        if not isinstance(message.get('profile', False), bool):
+            return "'profile' must be true or false; reports go to the worker's --profile directory"
+        return None
+
+    def _request_reload(self, signum, frame):
+        self.reload_requested = True
+
+    def serve(self):
+        """Serve requests until shutdown or end of input"""
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self._request_reload)
+
+        self.running = True
+        self.send({'type': 'ready', **self.health()})
+
+        while self.running:
+            line = self.instream.readline()
+            if not line:
+                break
+            line = line.strip()
+            if not line:
+                continue
+            if self.reload_requested:
+                self.reload()
+            else:
+                # Pick up bundles published by a retraining job
+                self.service.reload_if_changed()
+
+            timer = StageTimer()
+            try:
+                with timer.stage('parse'):
+                    message = json.loads(line)
+            except json.JSONDecodeError as e:
+                self.errors += 1
+                metrics.ERRORS.inc(type='invalid_json')
+                self.send({'id': None, 'type': 'error', 'error': f"Invalid JSON: {str(e)}"})
+                continue
+            if not isinstance(message, dict):
+                self.errors += 1
+                metrics.ERRORS.inc(type='invalid_request')
+                self.send({'id': None, 'type': 'error', 'error': 'Request must be a JSON object'})
+                continue
+
+            try:
+                self.send(self.handle(message, timer))
+            except Exception as e:
+                self.errors += 1
+                metrics.ERRORS.inc(type=type(e).__name__)
+                logger.error(f"Worker failed to handle request: {str(e)}")
+                self.send({'id': message.get('id'), 'type': 'error', 'error': str(e)})
+
+        logger.info(f"Worker exiting after {self.requests_served} requests")
+
 def main():
     """Main function for command line usage"""
-    if len(sys.argv) < 2:
-        print("Usage: python python_optimization_service.py <json_data>")
+    parser = argparse.ArgumentParser(description="KMRL induction optimization service")
+    parser.add_argument('data', nargs='?', help="JSON array of train records")
+    parser.add_argument('--input', metavar='PATH',
+                        help="read the fleet from a file instead, or '-' for stdin")
+    parser.add_argument('--format', choices=('auto',) + FORMATS, default='auto',
+                        help="payload format of --input (default: from the extension or content)")
+    parser.add_argument('--factors', nargs='+', metavar='PATH',
+                        help="join per-factor upload CSVs (or the sample_*.csv files in a directory) on trainId")
+    parser.add_argument('--worker', action='store_true', help="serve JSON-lines requests on stdin")
+    parser.add_argument('--timings', action='store_true', help="add per-stage timings to each response")
+    parser.add_argument('--profile', nargs='?', const=True, metavar='PATH',
+                        help=f"write a cProfile/tracemalloc report (default directory: ${PROFILE_DIR_ENV})")
+    parser.add_argument('--metrics-port', type=int, default=os.environ.get('KMRL_METRICS_PORT'),
+                        help="serve Prometheus metrics on this local port (worker mode)")
+    parser.add_argument('--metrics-file', default=os.environ.get('KMRL_METRICS_FILE'), metavar='PATH',
+                        help="write Prometheus metrics to this file")
+    parser.add_argument('--metrics-interval', type=float, default=15.0, metavar='SECONDS',
+                        help="how often --metrics-file is rewritten (default: 15)")
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('KMRL_WORKERS', 0)),
+                        help="worker mode: fork this many workers sharing the loaded model (default: serve in-process)")
+    parser.add_argument('--max-requests', type=int, default=int(os.environ.get('KMRL_WORKER_MAX_REQUESTS', 0)),
+                        help="replace a forked worker after this many requests (default: never)")
+    parser.add_argument('--max-rss-mb', type=float, default=os.environ.get('KMRL_WORKER_MAX_RSS_MB'),
+                        help="replace a forked worker once its resident memory reaches this many MB")
+    args = parser.parse_args()
+
+    if args.worker:
+        if args.workers > 0 and hasattr(os, 'fork'):
+            # The pool keeps forking, so it serves metrics from its own loop instead of threads
+            from worker_pool import WorkerPool
+            WorkerPool(workers=args.workers, max_requests=args.max_requests,
+                       max_rss_mb=float(args.max_rss_mb) if args.max_rss_mb else None,
+                       timings=args.timings, profile=args.profile,
+                       metrics_port=int(args.metrics_port) if args.metrics_port else None,
+                       metrics_file=args.metrics_file, metrics_interval=args.metrics_interval).serve()
+            return
+        server = metrics.start_http_server(int(args.metrics_port)) if args.metrics_port else None
+        exporter = metrics.FileExporter(args.metrics_file, args.metrics_interval).start() if args.metrics_file else None
+        try:
+            OptimizationWorker(timings=args.timings, profile=args.profile).serve()
+        finally:
+            if server is not None:
+                server.shutdown()
+            if exporter is not None:
+                exporter.stop()
+        return
+    if args.data is None and args.input is None and args.factors is None:
+        print("Usage: python python_optimization_service.py <json_data> [--timings] [--profile [PATH]]")
+        print("       python python_optimization_service.py --input <path|-> [--format FORMAT] [--timings]")
+        print("       python python_optimization_service.py --factors <dir | file.csv ...> [--timings]")
+        print("       python python_optimization_service.py --worker [--timings] [--profile [PATH]]")
         sys.exit(1)
     
     try:
         # Parse input data
-        input_data = json.loads(sys.argv[1])
+        timer = StageTimer()
+        with timer.stage('parse'):
+            if args.factors is not None:
+                factors = args.factors
+                if len(factors) == 1 and os.path.isdir(factors[0]):
+                    factors = factor_sources(factors[0])
+            elif args.input is not None:
+                input_data = read_payload(args.input, args.format)
+            else:
+                input_data = json.loads(args.data)
         
         # Create service and run optimization
-        service = PythonOptimizationService()
-        result = service.run_optimization(input_data)
+        with timer.stage('load_model'):
+            service = PythonOptimizationService()
+        if args.factors is not None:
+            result = service.run_factor_uploads(factors, timings=args.timings, profile=args.profile, timer=timer)
+        else:
+            result = service.run_optimization(input_data, timings=args.timings, profile=args.profile, timer=timer)
         
         # Output result as JSON
         print(json.dumps(result, indent=2))
+        if args.metrics_file:
+            metrics.registry.write(args.metrics_file)
         
     except Exception as e:
         error_result = {
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+What-if scenario sweeps for the KMRL induction planner
+Runs many (min revenue trains, cleaning slots, depot bays, weights)
+scenarios against one operational day. The model predicts the day once;
+the scenarios are then planned in parallel worker processes and each
+result is yielded as soon as its worker finishes.
+"""
+
+import os
+import time
+import logging
+import itertools
+import multiprocessing
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from model import DEFAULT_MIN_REVENUE_TRAINS, DEFAULT_CLEANING_SLOTS, DEFAULT_DEPOT_BAYS
+from planner import InductionPlanner, prepare_day
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEIGHTS = {'branding': 1.0, 'mileage': 1.0, 'shunting': 1.0, 'fitness': 1.0, 'efficiency': 1.0}
+
+# Day, predictions and planner settings installed in each worker by _init_worker
+_worker_state = None
+
+def scenario_grid(min_revenue_trains: Iterable[int] = (DEFAULT_MIN_REVENUE_TRAINS,),
+                  cleaning_slots: Iterable[int] = (DEFAULT_CLEANING_SLOTS,),
+                  depot_bays: Iterable[int] = (DEFAULT_DEPOT_BAYS,),
+                  weights: Iterable[Dict[str, float]] = (DEFAULT_WEIGHTS,)) -> List[Dict[str, Any]]:
+    """Every combination of the given settings, as scenario dicts"""
+    return [
+        {'min_revenue_trains': int(revenue), 'cleaning_slots': int(slots),
+         'depot_bays': int(bays), 'weights': {**DEFAULT_WEIGHTS, **w}}
+        for revenue, slots, bays, w in itertools.product(min_revenue_trains, cleaning_slots, depot_bays, weights)
+    ]
+
+def plan_kpis(plan: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Headline KPIs of an induction plan, as shown on the dashboard"""
+    df = pd.DataFrame(plan)
+    service = df[df['assigned_status'] == 'Service']
+    return {
+        'service': int(len(service)),
+        'standby': int((df['assigned_status'] == 'Standby').sum()),
+        'maintenance': int((df['assigned_status'] == 'Maintenance').sum()),
+        'sla_deficit': float(df['sla_deficit'].sum()),
+        'avg_service_mileage': float(service['mileage'].mean()) if len(service) else 0.0,
+        'shunting_time': float(df['shunting_time'].sum()),
+        'turnout_penalty': float(df['turnout_penalty'].sum()),
+        'maintenance_cost': float(df['maintenance_cost'].sum()),
+        'avg_service_fitness': float(np.mean([item['explainability']['fitness_score']
+                                              for item in plan if item['assigned_status'] == 'Service']
+                                             or [0.0]))
+    }
+
+def _run_scenario(state, index, scenario):
+    enhanced_model, df_day, predictions, confidence, planner_options = state
+    planner = InductionPlanner(enhanced_model, n_jobs=1, **planner_options)
+    result = planner.plan(
+        df_day,
+        min_revenue_trains=scenario['min_revenue_trains'],
+        cleaning_slots=scenario['cleaning_slots'],
+        depot_bays=scenario['depot_bays'],
+        weights=scenario['weights'],
+        predictions=predictions,
+        confidence=confidence
+    )
+    if result['success']:
+        result['kpis'] = plan_kpis(result['plan'])
+    result['scenario_index'] = index
+    result['scenario'] = scenario
+    return result
+
+def _init_worker(state):
+    global _worker_state
+    _worker_state = state
+
+def _run_indexed(item):
+    return _run_scenario(_worker_state, *item)
+
+class ScenarioEngine:
+    """
+    Parallel what-if sweeps over one operational day.
+
+    The day is prepared and predicted once in the constructor. ``run``
+    plans each scenario with its own single-process InductionPlanner; with
+    ``n_jobs`` other than 1 the scenarios are spread over a process pool
+    that receives the prepared day and predictions once per worker.
+    Results arrive in completion order, tagged with ``scenario_index``.
+    """
+
+    def __init__(self, enhanced_model, df_day: pd.DataFrame, n_jobs: Optional[int] = None,
+                 solver: str = 'nsga2', population_size: int = 100, generations: int = 50,
+                 seed: Optional[int] = None):
+        if enhanced_model.model is None or enhanced_model.preprocessor is None:
+            raise ValueError('Model not trained. Please train the model first.')
+        if len(df_day) == 0:
+            raise ValueError('No trains to plan')
+        self.enhanced_model = enhanced_model
+        self.n_jobs = n_jobs if n_jobs is not None else (os.cpu_count() or 1)
+        self.planner_options = {
+            'solver': solver, 'population_size': population_size,
+            'generations': generations, 'seed': seed
+        }
+
+        start = time.time()
+        self.df_day, feature_names = prepare_day(enhanced_model, df_day)
+        X_processed = enhanced_model.preprocessor.transform(self.df_day[feature_names])
+        self.predictions, self.confidence, _ = enhanced_model.predict_with_confidence(X_processed)
+        logger.info(f"Predicted {len(self.df_day)} trains for the sweep in {time.time() - start:.3f}s")
+
+    def _state(self):
+        return (self.enhanced_model, self.df_day, self.predictions, self.confidence, self.planner_options)
+
+    def run(self, scenarios: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield each scenario's planner result, plus ``kpis``, as it finishes.
+
+        Closing the iterator early terminates the remaining workers.
+        """
+        items = list(enumerate(scenarios))
+        workers = min(self.n_jobs, len(items))
+        if workers <= 1:
+            state = self._state()
+            for index, scenario in items:
+                yield _run_scenario(state, index, scenario)
+            return
+
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(self._state(),))
+        try:
+            for result in pool.imap_unordered(_run_indexed, items):
+                yield result
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def run_all(self, scenarios: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """All results, in scenario order"""
+        return sorted(self.run(scenarios), key=lambda result: result['scenario_index'])
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Columnar scoring engine for KMRL train induction
+Computes the six-factor scores, overall score and induction status for a whole
+fleet as array operations instead of a per-row loop
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any
+
+# Weights of the six factors in the overall score
+SCORE_WEIGHTS = {
+    'fitness_score': 0.25,
+    'job_card_score': 0.20,
+    'branding_score': 0.15,
+    'mileage_score': 0.15,
+    'cleaning_score': 0.10,
+    'geometry_score': 0.15
+}
+
+# Branding SLA hours that count as a full branding score
+BRANDING_SLA_HOURS = 8.0
+
+SCORE_COLUMNS = list(SCORE_WEIGHTS.keys())
+
+# Preprocessed columns compute_scores reads, besides the predictions
+SCORING_INPUTS = [
+    'train_id', 'fitness_score', 'job_card_status', 'branding_hours',
+    'mileage_balance_deviation', 'cleaning_slot', 'stabling_bay'
+]
+
+def compute_scores(df: pd.DataFrame, predictions) -> pd.DataFrame:
+    """Score every train in a preprocessed frame.
+
+    ``predictions`` holds the encoded model labels (0 maintenance, 1 revenue,
+    2 standby) aligned with the rows of ``df``. Returns a frame with one row per
+    train in input order, unrounded.
+    """
+    predictions = np.asarray(predictions)
+
+    scores = pd.DataFrame(index=df.index)
+    scores['train_id'] = df['train_id']
+    scores['fitness_score'] = df['fitness_score'].to_numpy(dtype=float) * 100
+    scores['job_card_score'] = np.where(df['job_card_status'] == 'closed', 100.0, 0.0)
+    scores['branding_score'] = np.minimum(100.0, df['branding_hours'].to_numpy(dtype=float) / BRANDING_SLA_HOURS * 100)
+    scores['mileage_score'] = np.maximum(0.0, 100 - df['mileage_balance_deviation'].to_numpy(dtype=float) / 1000)
+    scores['cleaning_score'] = np.where(df['cleaning_slot'].to_numpy() > 0, 100.0, 50.0)
+    scores['geometry_score'] = np.where(df['stabling_bay'].to_numpy() > 0, 100.0, 50.0)
+
+    overall = np.zeros(len(df))
+    for column, weight in SCORE_WEIGHTS.items():
+        overall += scores[column].to_numpy() * weight
+    scores['overall_score'] = overall
+
+    # Status thresholds use the unrounded overall score
+    revenue = (predictions == 1) & (overall >= 70)
+    standby = (predictions == 2) | ((predictions == 1) & (overall >= 50))
+    scores['induction_status'] = np.select([revenue, standby], ['revenue', 'standby'], 'maintenance')
+
+    scores['cleaning_slot'] = df['cleaning_slot'].to_numpy(dtype=int)
+    scores['stabling_bay'] = df['stabling_bay'].to_numpy(dtype=int)
+    return scores
+
+def _round(column: pd.Series) -> pd.Series:
+    """Round to 2 places with Python's round(), which can differ from NumPy's in the last digit"""
+    return column.map(lambda value: round(float(value), 2))
+
+def _explain(scores: pd.DataFrame) -> pd.Series:
+    """Build the explainability strings column-wise"""
+    def fmt(column):
+        return scores[column].map('{:.1f}'.format)
+
+    return (
+        "Score: " + fmt('overall_score') +
+        " - Fitness: " + fmt('fitness_score') +
+        ", Job Card: " + fmt('job_card_score') +
+        ", Branding: " + fmt('branding_score') +
+        ", Mileage: " + fmt('mileage_score') +
+        ", Cleaning: " + fmt('cleaning_score') +
+        ", Geometry: " + fmt('geometry_score')
+    )
+
+def build_results(scores: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Turn a score frame into result records sorted by overall score"""
+    if scores.empty:
+        return []
+
+    table = pd.DataFrame({
+        'train_id': scores['train_id'],
+        'induction_status': scores['induction_status'],
+        'overall_score': _round(scores['overall_score']),
+        **{column: _round(scores[column]) for column in SCORE_COLUMNS},
+        'cleaning_slot': scores['cleaning_slot'],
+        'stabling_bay': scores['stabling_bay'],
+        'explainability': _explain(scores)
+    })
+
+    # Stable descending sort keeps input order among equal scores
+    order = np.argsort(-table['overall_score'].to_numpy(), kind='stable')
+    return table.iloc[order].to_dict(orient='records')
+
+def summarize(scores: pd.DataFrame) -> Dict[str, Any]:
+    """Fleet summary statistics over the rounded overall scores"""
+    total_trains = len(scores)
+    status = scores['induction_status'].to_numpy()
+    overall = _round(scores['overall_score']).tolist()
+
+    return {
+        'total_trains': total_trains,
+        'revenue_trains': int(np.count_nonzero(status == 'revenue')),
+        'standby_trains': int(np.count_nonzero(status == 'standby')),
+        'maintenance_trains': int(np.count_nonzero(status == 'maintenance')),
+        'average_score': round(sum(overall) / total_trains, 2) if total_trains > 0 else 0,
+        'highest_score': max(overall) if total_trains > 0 else 0,
+        'lowest_score': min(overall) if total_trains > 0 else 0
+    }
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests for the benchmark suite and its synthetic fleet generator
+"""
+
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark import STAGES, benchmark_case, compare_to_baseline, generate_fleet
+from ingestion import read_history
+from test_model import DATASET_PATH
+
+def test_generated_fleet_follows_dataset_schema(tmp_path):
+    """Synthetic history has the dataset's columns and parses to the same dtypes"""
+    fleet = generate_fleet(num_trains=40, num_days=3, seed=1)
+    assert len(fleet) == 120
+    assert fleet.groupby('date')['train_id'].nunique().tolist() == [40, 40, 40]
+
+    path = tmp_path / 'fleet.csv'
+    fleet.to_csv(path, index=False)
+    generated = read_history(str(path), use_cache=False)
+    reference = read_history(DATASET_PATH, use_cache=False)
+    assert generated.columns.tolist() == reference.columns.tolist()
+    assert generated.dtypes.astype(str).tolist() == reference.dtypes.astype(str).tolist()
+    assert set(generated['induction_status']) == {'maintenance', 'revenue', 'standby'}
+    assert (generated.loc[generated['is_serviceable'] == 0, 'induction_status'] == 'maintenance').all()
+
+def test_case_times_every_stage_and_flags_regressions():
+    """A small case reports all stages; a slower rerun is flagged against it"""
+    case = benchmark_case(num_trains=25, num_days=2, repeat=1, individuals=1)
+    assert list(case['stages']) == STAGES
+    assert all(0 <= timing['min'] <= timing['median'] for timing in case['stages'].values())
+
+    baseline = {'cases': [case]}
+    slower = {'cases': [{**case, 'stages': {
+        name: {**timing, 'min': timing['min'] * 2 + 0.01} for name, timing in case['stages'].items()
+    }}]}
+    assert compare_to_baseline({'cases': [case]}, baseline)['regressions'] == []
+    comparison = compare_to_baseline(slower, baseline)
+    assert comparison['compared'] == len(STAGES)
+    assert len(comparison['regressions']) == len(STAGES)
+
+def test_skip_training_leaves_out_training_stages():
+    """--skip-training drops the training stages and still times everything else"""
+    case = benchmark_case(num_trains=25, num_days=3, repeat=1, skip_training=True, individuals=1)
+    assert list(case['stages']) == [s for s in STAGES if not s.startswith('training_')]
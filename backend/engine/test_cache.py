@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the engine's caches
+"""
+
+import sys
+import os
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cache import LRUCache, FitnessCache, ResultCache
+
+def test_lru_eviction_and_counters():
+    """The least recently used entry is evicted and lookups are counted"""
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'b' is now least recently used
+    cache.put('c', 3)
+
+    assert 'b' not in cache
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+    stats = cache.stats()
+    assert stats['size'] == 2
+    assert stats['hits'] == 2 and stats['misses'] == 1
+    assert stats['evictions'] == 1
+
+def test_fitness_cache_keys_on_individual_encoding():
+    """Equal gene sequences share an entry regardless of container type"""
+    cache = FitnessCache(maxsize=10)
+    cache.store('scenario', [1, 0, 2], (1.0, -2.0))
+
+    assert cache.lookup('scenario', (1, 0, 2)) == (1.0, -2.0)
+    assert cache.lookup('scenario', [1, 2, 0]) is None
+    assert cache.lookup('other', [1, 0, 2]) is None
+
+def test_result_cache_ttl_disk_tier_and_invalidation(tmp_path):
+    """Results expire, survive in the disk tier and are dropped for other model versions"""
+    response = {'success': True, 'results': [{'train_id': 'T001'}]}
+    cache = ResultCache(maxsize=4, ttl=60, directory=str(tmp_path))
+    key = cache.key('v1', cache.digest([{'trainId': 'T001'}]))
+    assert key == cache.key('v1', cache.digest([{'trainId': 'T001'}]))
+    assert key != cache.key('v2', cache.digest([{'trainId': 'T001'}]))
+
+    cache.put(key, response)
+    hit = cache.get(key)
+    hit['timings'] = {}
+    hit['results'][0]['train_id'] = 'T999'
+    assert cache.get(key) == response
+
+    # A second process (or a restart) reads the disk tier
+    assert ResultCache(directory=str(tmp_path)).get(key) == response
+    assert ResultCache(ttl=0, directory=str(tmp_path)).get(key) is None
+
+    cache.invalidate('v2')
+    assert cache.get(key) is None and os.listdir(tmp_path) == []
+
+    expiring = ResultCache(ttl=0.01)
+    expiring.put(key, response)
+    time.sleep(0.02)
+    assert expiring.get(key) is None
+    assert expiring.stats()['misses'] == 1
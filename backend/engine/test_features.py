@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared derived-feature engine
+"""
+
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from features import DERIVED_FEATURES, FeatureEngine, compute_derived_features
+from python_optimization_service import PythonOptimizationService
+
+def make_fleet():
+    return pd.DataFrame({
+        'train_id': [1, 2, 3],
+        'date': ['2024-03-01', '2024-03-02', '2024-03-03'],
+        'rolling_stock_fitness': [1, 0, 1],
+        'signalling_fitness': [1, 1, 0],
+        'telecom_fitness': [1, 1, 1],
+        'job_card_status': ['closed', 'open', 'closed'],
+        'branding_hours': [6.0, 8.0, 0.0],
+        'branding_total': [8.0, 8.0, 0.0],
+        'mileage': [30000.0, 42000.0, 0.0],
+        'cleaning_slot': [0, 2, 0],
+        'stabling_bay': [3, 0, 1],
+        'shunting_time_minutes': [30.0, 45.0, 20.0],
+        'is_serviceable': [1, 1, 0],
+        'mileage_balance_deviation': [1200.0, -300.0, 0.0]
+    })
+
+def test_derived_values_and_bool_flags():
+    """Formulas match the hand-computed values, whatever the flag dtype"""
+    df = make_fleet()
+    derived = compute_derived_features(df)
+
+    assert derived.columns.tolist() == df.columns.tolist() + DERIVED_FEATURES + ['day_of_week', 'is_weekend']
+    np.testing.assert_allclose(derived['fitness_score'], [1.0, 2 / 3, 2 / 3])
+    np.testing.assert_allclose(derived['branding_efficiency'], [0.75, 1.0, 0.0])
+    np.testing.assert_allclose(derived['branding_deficit'], [2.0, 0.0, 0.0])
+    np.testing.assert_allclose(derived['bay_efficiency'], [1 / 3, 0.0, 1.0])
+    assert derived['cleaning_priority'].tolist() == [1, 0, 0]
+    assert derived['day_of_week'].tolist() == [4, 5, 6]
+    assert derived['is_weekend'].tolist() == [0, 1, 1]
+
+    flags = ['rolling_stock_fitness', 'signalling_fitness', 'telecom_fitness', 'is_serviceable']
+    as_bool = compute_derived_features(df.astype({c: bool for c in flags}))
+    pd.testing.assert_frame_equal(as_bool[DERIVED_FEATURES], derived[DERIVED_FEATURES])
+
+def test_engine_memoizes_without_sharing_mutations():
+    """Equal frames hit the cache; callers cannot alter the cached result"""
+    engine = FeatureEngine(maxsize=4)
+    first = engine.derive(make_fleet())
+    first['fitness_score'] = 0.0
+    first['extra'] = 1
+    first.loc[0, 'bay_efficiency'] = -1.0
+
+    second = engine.derive(make_fleet())
+    assert engine.cache.stats()['hits'] == 1
+    assert 'extra' not in second.columns
+    assert second['fitness_score'].iloc[0] == 1.0
+    assert second['bay_efficiency'].iloc[0] != -1.0
+
+    changed = make_fleet()
+    changed.loc[0, 'mileage'] = 1.0
+    engine.derive(changed)
+    engine.derive(make_fleet(), include_date=False)
+    assert engine.cache.stats()['misses'] == 3
+
+def test_service_and_training_derive_identically():
+    """Serving-time preprocessing produces the training features"""
+    records = make_fleet().drop(columns=['date']).to_dict('records')
+    served = PythonOptimizationService.__new__(PythonOptimizationService).preprocess_uploaded_data(records)
+    trained = compute_derived_features(served.drop(columns=DERIVED_FEATURES + ['date']), include_date=False)
+
+    pd.testing.assert_frame_equal(served[DERIVED_FEATURES], trained[DERIVED_FEATURES], check_exact=True)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for the date-partitioned history store
+"""
+
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from history_store import HistoryStore
+
+def make_history(start='2024-01-29', days=6, trains=4):
+    dates = pd.date_range(start, periods=days)
+    df = pd.DataFrame(
+        [(train, day) for day in dates for train in range(1, trains + 1)],
+        columns=['train_id', 'date']
+    )
+    df['mileage'] = np.arange(len(df), dtype=float) * 100
+    df['job_card_status'] = np.where(df['train_id'] % 2, 'open', 'closed')
+    df['is_serviceable'] = df['train_id'] % 2 == 0
+    return df
+
+def test_append_partitions_by_month_and_reads_slices(tmp_path):
+    """Days land in month partitions; range reads honour dates, trains and columns"""
+    history = make_history()
+    store = HistoryStore(str(tmp_path / 'history'))
+    for _, day in history.groupby('date'):
+        store.append(day)
+
+    assert sorted(os.listdir(store.root)) == ['month=2024-01', 'month=2024-02']
+    assert len(store.files()) == 6
+    assert store.date_range() == (pd.Timestamp('2024-01-29').date(), pd.Timestamp('2024-02-03').date())
+
+    window = store.read('2024-01-31', '2024-02-01', train_ids=[2, 3], columns=['mileage'])
+    assert window.columns.tolist() == ['train_id', 'date', 'mileage']
+    assert window['train_id'].tolist() == [2, 3, 2, 3]
+    assert window['date'].dt.strftime('%m-%d').unique().tolist() == ['01-31', '02-01']
+    assert len(store.training_window(days=2)) == 8
+
+    store.compact()
+    assert len(store.files()) == 2
+    everything = store.read()
+    assert len(everything) == len(history)
+    assert everything['is_serviceable'].tolist() == history['is_serviceable'].astype(int).tolist()
+    assert isinstance(everything['job_card_status'].dtype, pd.CategoricalDtype)
+
+def test_append_refuses_stored_dates_unless_overwriting(tmp_path):
+    """A re-sent day is rejected, or replaces the stored rows when asked"""
+    history = make_history(days=3)
+    store = HistoryStore(str(tmp_path / 'history'))
+    store.append(history)
+
+    corrected = history[history['date'] == '2024-01-30'].assign(mileage=1.0)
+    with pytest.raises(ValueError):
+        store.append(corrected)
+    store.append(corrected, overwrite=True)
+
+    stored = store.read()
+    assert len(stored) == len(history)
+    assert (store.read('2024-01-30', '2024-01-30')['mileage'] == 1.0).all()
+    assert (stored.loc[stored['date'] != '2024-01-30', 'mileage'] > 1.0).any()
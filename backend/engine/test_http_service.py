@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for the asyncio HTTP server and request micro-batching
+"""
+
+import json
+import asyncio
+import threading
+import urllib.request
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import http_service
+import metrics
+from http_service import HttpOptimizationServer, MicroBatcher
+from python_optimization_service import PythonOptimizationService
+from test_model_bundle import SAMPLE_DATA, make_bundle
+
+def make_service(tmp_path):
+    make_bundle(tmp_path / 'model.bundle')
+    return PythonOptimizationService(bundle_path=str(tmp_path / 'model.bundle'))
+
+def test_concurrent_requests_share_one_prediction(tmp_path):
+    """Requests inside the wait window are predicted together and split back unchanged"""
+    service = make_service(tmp_path)
+    fleets = [SAMPLE_DATA[i:i + 4] for i in range(0, 20, 4)]
+    expected = [service.run_optimization(fleet) for fleet in fleets]
+    service.result_cache.clear()
+    batches = metrics.PREDICTION_BATCH.count()
+
+    async def run():
+        batcher = MicroBatcher(service, max_wait_ms=200)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(fleet) for fleet in fleets))
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(run()) == expected
+    assert metrics.PREDICTION_BATCH.count() == batches + 1
+
+def test_http_round_trip(tmp_path, monkeypatch):
+    """POST /optimize, GET /health and GET /metrics over a real socket"""
+    service = make_service(tmp_path)
+    parsed_on = []
+    parse = http_service.parse_optimize_body
+    monkeypatch.setattr(http_service, 'parse_optimize_body',
+                        lambda request: parsed_on.append(threading.current_thread().name) or parse(request))
+
+    def fetch(url, body=None):
+        request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, response.read()
+
+    async def run():
+        app = HttpOptimizationServer(service, max_wait_ms=1)
+        server = await app.start('127.0.0.1', 0)
+        base = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        loop = asyncio.get_running_loop()
+        try:
+            body = json.dumps({'data': SAMPLE_DATA, 'timings': True}).encode()
+            optimized = await loop.run_in_executor(None, fetch, f'{base}/optimize', body)
+            health = await loop.run_in_executor(None, fetch, f'{base}/health')
+            scraped = await loop.run_in_executor(None, fetch, f'{base}/metrics')
+        finally:
+            await app.stop()
+        return optimized, health, scraped
+
+    (status, body), (_, health), (_, scraped) = asyncio.run(run())
+    result = json.loads(body)
+    assert status == 200 and result['success']
+    assert len(result['results']) == len(SAMPLE_DATA)
+    assert {'parse', 'queue', 'predict'} <= set(result['timings']['stages_ms'])
+    assert json.loads(health)['model_loaded']
+    assert b'kmrl_prediction_batch_requests_count' in scraped
+    # Bodies are decoded on a parse thread, not on the event loop or the predict thread
+    assert len(parsed_on) == 1 and parsed_on[0].startswith('parse')
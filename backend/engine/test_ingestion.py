@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for typed history ingestion and its Parquet sidecar cache
+"""
+
+import sys
+import os
+
+import pandas as pd
+import pytest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import ingestion
+from ingestion import read_history, sidecar_path
+
+HISTORY_CSV = """train_id,date,rolling_stock_fitness,signalling_fitness,telecom_fitness,job_card_status,branding_hours,branding_total,mileage,cleaning_slot,stabling_bay,shunting_time_minutes,induction_status,is_serviceable,branding_sla_met
+1,2024-01-01,True,1,true,open,7.5,8.0,30245.8,,,55,standby,False,0
+2,2024-01-01,False,0,True,closed,8.0,8.0,29000.0,2,6.0,30,revenue,1,True
+"""
+
+def write_history(tmp_path, text=HISTORY_CSV):
+    path = tmp_path / 'history.csv'
+    path.write_text(text)
+    return str(path)
+
+def test_schema_normalizes_mixed_encodings(tmp_path):
+    """Boolean spellings, empty slots and statuses land in compact dtypes"""
+    df = read_history(write_history(tmp_path), use_cache=False)
+
+    assert df['rolling_stock_fitness'].tolist() == [1, 0]
+    assert df['signalling_fitness'].tolist() == [1, 0]
+    assert df['is_serviceable'].tolist() == [0, 1]
+    assert str(df['is_serviceable'].dtype) == 'int8'
+    assert df['cleaning_slot'].tolist() == [0, 2]
+    assert df['stabling_bay'].tolist() == [0, 6]
+    assert isinstance(df['job_card_status'].dtype, pd.CategoricalDtype)
+    assert list(df['induction_status'].cat.categories) == ['maintenance', 'revenue', 'standby']
+    assert pd.api.types.is_datetime64_dtype(df['date'])
+
+def test_sidecar_cache_follows_source_changes(tmp_path, monkeypatch):
+    """The sidecar is reused until the CSV's content changes"""
+    if not ingestion.HAS_PYARROW:
+        pytest.skip("Parquet cache needs pyarrow")
+    path = write_history(tmp_path)
+    first = read_history(path)
+    assert os.path.exists(sidecar_path(path))
+
+    parsed = []
+    original = ingestion.parse_csv
+    monkeypatch.setattr(ingestion, 'parse_csv', lambda source: parsed.append(source) or original(source))
+
+    pd.testing.assert_frame_equal(read_history(path), first)
+    os.utime(path, ns=(0, 0))  # touched but unchanged: the content hash still matches
+    pd.testing.assert_frame_equal(read_history(path), first)
+    assert parsed == []
+
+    # The match re-stamps the sidecar, so the next load does not hash the CSV again
+    hashed = []
+    digest = ingestion.file_digest
+    monkeypatch.setattr(ingestion, 'file_digest', lambda source: hashed.append(source) or digest(source))
+    pd.testing.assert_frame_equal(read_history(path), first)
+    assert hashed == []
+
+    write_history(tmp_path, HISTORY_CSV.replace('30245.8', '31000.0'))
+    assert read_history(path)['mileage'].iloc[0] == 31000.0
+    assert parsed == [path]
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for per-stage timings and request profiling in the optimization service
+"""
+
+import io
+import json
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cache import ResultCache
+from python_optimization_service import OptimizationWorker, PythonOptimizationService
+from test_model_bundle import SAMPLE_DATA, make_bundle
+
+SERVICE_STAGES = ['cache', 'preprocess', 'encode', 'scale', 'predict', 'score', 'sort', 'summarize']
+
+def make_service(tmp_path):
+    make_bundle(tmp_path / 'model.bundle')
+    # Uncached, so repeated requests run every stage
+    return PythonOptimizationService(bundle_path=str(tmp_path / 'model.bundle'), result_cache=ResultCache(maxsize=0))
+
+def test_timings_block_is_opt_in(tmp_path):
+    """Timings list every stage and are only added on request"""
+    service = make_service(tmp_path)
+    assert 'timings' not in service.run_optimization(SAMPLE_DATA)
+
+    timings = service.run_optimization(SAMPLE_DATA, timings=True)['timings']
+    assert list(timings['stages_ms']) == SERVICE_STAGES
+    assert all(ms >= 0 for ms in timings['stages_ms'].values())
+    assert timings['total_ms'] >= sum(timings['stages_ms'].values()) * 0.99
+    # Memory growth is measured per request; the peak is labelled as the process's
+    assert isinstance(timings['rss_delta_mb'], float)
+    assert timings['process_peak_rss_mb'] > 0 and 'max_rss_mb' not in timings
+
+def test_profile_report_for_one_request(tmp_path):
+    """A profiled request writes a cProfile/tracemalloc report and a traced peak"""
+    service = make_service(tmp_path)
+    result = service.run_optimization(SAMPLE_DATA, timings=True, profile=str(tmp_path))
+
+    assert result['success']
+    assert os.path.dirname(result['profile_path']) == str(tmp_path)
+    with open(result['profile_path']) as f:
+        report = f.read()
+    assert 'run_optimization' in report and 'Memory: peak' in report
+    assert result['timings']['peak_traced_mb'] > 0
+
+def test_worker_reports_parse_time(tmp_path):
+    """Worker replies carry timings, including JSON parsing, when asked"""
+    requests = [
+        {"id": 1, "type": "optimize", "data": SAMPLE_DATA, "timings": True},
+        {"id": 2, "type": "optimize", "data": SAMPLE_DATA}
+    ]
+    outstream = io.StringIO()
+    worker = OptimizationWorker(make_service(tmp_path),
+                                instream=io.StringIO("".join(json.dumps(r) + "\n" for r in requests)),
+                                outstream=outstream)
+    worker.serve()
+
+    replies = [json.loads(line) for line in outstream.getvalue().splitlines()]
+    assert list(replies[1]['result']['timings']['stages_ms']) == ['parse'] + SERVICE_STAGES
+    assert 'timings' not in replies[2]['result']
+
+def test_worker_clients_cannot_name_files(tmp_path):
+    """Profiles go to the worker's own directory; file inputs and report paths are refused"""
+    profiles = tmp_path / 'profiles'
+    profiles.mkdir()
+    requests = [
+        {"id": 1, "type": "optimize", "data": SAMPLE_DATA, "profile": True},
+        {"id": 2, "type": "optimize", "data": SAMPLE_DATA, "profile": str(tmp_path / 'elsewhere.txt')},
+        {"id": 3, "type": "optimize", "input": str(tmp_path / 'fleet.json')},
+        {"id": 4, "type": "optimize", "factors": [str(tmp_path / 'sample_fitness_certificate.csv')]}
+    ]
+    outstream = io.StringIO()
+    worker = OptimizationWorker(make_service(tmp_path), profile=str(profiles),
+                                instream=io.StringIO("".join(json.dumps(r) + "\n" for r in requests)),
+                                outstream=outstream)
+    worker.serve()
+
+    replies = {r['id']: r for r in map(json.loads, outstream.getvalue().splitlines()) if 'id' in r}
+    assert os.path.dirname(replies[1]['result']['profile_path']) == str(profiles)
+    assert [replies[i]['type'] for i in (2, 3, 4)] == ['error'] * 3
+    assert not (tmp_path / 'elsewhere.txt').exists()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus metrics of the optimization engine
+"""
+
+import io
+import json
+import sys
+import os
+import urllib.request
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+from python_optimization_service import OptimizationWorker, PythonOptimizationService
+from test_model_bundle import SAMPLE_DATA, make_bundle
+
+def test_exposition_format():
+    """Counters, gauges and histograms render in the Prometheus text format"""
+    registry = metrics.MetricsRegistry()
+    requests = registry.counter('test_requests_total', 'Requests', ['outcome'])
+    latency = registry.histogram('test_latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    requests.inc(outcome='success')
+    requests.inc(2, outcome='success')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    text = registry.render()
+    assert '# TYPE test_requests_total counter' in text
+    assert 'test_requests_total{outcome="success"} 3' in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count 3' in text
+    assert 'test_latency_seconds_sum 5.55' in text
+
+    server = metrics.start_http_server(0, metrics_registry=registry)
+    try:
+        url = f'http://127.0.0.1:{server.server_address[1]}/metrics'
+        with urllib.request.urlopen(url) as response:
+            assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            assert response.read().decode() == registry.render()
+    finally:
+        server.shutdown()
+
+def test_service_requests_are_recorded(tmp_path):
+    """Requests, stage latencies, errors, model loads and cache stats reach the registry"""
+    make_bundle(tmp_path / 'model.bundle')
+    service = PythonOptimizationService(bundle_path=str(tmp_path / 'model.bundle'))
+    before = metrics.REQUESTS.value(outcome='success')
+    predicts = metrics.STAGE_LATENCY.count(stage='predict')
+    service.run_optimization(SAMPLE_DATA)
+
+    assert metrics.REQUESTS.value(outcome='success') == before + 1
+    assert metrics.STAGE_LATENCY.count(stage='predict') == predicts + 1
+
+    outstream = io.StringIO()
+    worker = OptimizationWorker(service, io.StringIO('{"type": "metrics", "id": 1}\n'), outstream)
+    worker.serve()
+    reply = json.loads(outstream.getvalue().splitlines()[-1])
+    text = reply['metrics']
+    assert 'kmrl_model_loads_total{outcome="success"}' in text
+    assert f'kmrl_model_info{{version="{service.model_version}"}} 1' in text
+    assert 'kmrl_cache_hits_total{cache="derived_features"}' in text
+    assert 'kmrl_request_trains_bucket{le="5"}' in text
+
+    unloaded = PythonOptimizationService(bundle_path=str(tmp_path / 'missing.bundle'))
+    unloaded.serving = unloaded.serving._replace(model=None)
+    errors = metrics.ERRORS.value(type='model_not_loaded')
+    unloaded.run_optimization(SAMPLE_DATA)
+    assert metrics.ERRORS.value(type='model_not_loaded') == errors + 1
+
+    path = tmp_path / 'engine.prom'
+    exporter = metrics.FileExporter(str(path), interval=60).start()
+    exporter.stop()
+    assert 'kmrl_requests_total' in path.read_text()
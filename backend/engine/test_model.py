@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the enhanced induction model and its NSGA-II objectives
+"""
+
+import sys
+import os
+import random
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import model
+from hyperparameter_search import BudgetedSearch
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'train_induction_dataset.csv')
+STATUS_CODES = {'maintenance': 0, 'revenue': 1, 'standby': 2}
+
+def build_day(num_days=10):
+    """Fit a small model on the first days of history and return the last day"""
+    df = model.load_dataset(DATASET_PATH)
+    days = sorted(df['date'].unique())[:num_days]
+    history = df[df['date'].isin(days)].reset_index(drop=True)
+
+    enhanced = model.EnhancedTrainInductionModel()
+    X = enhanced.preprocess_data(history, training=True)
+    y = history['induction_status'].map(STATUS_CODES).to_numpy()
+    enhanced.model = RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0).fit(X, y)
+
+    df_day = enhanced.create_derived_features(df[df['date'] == days[-1]].reset_index(drop=True))
+    feature_names = enhanced.numerical_features + enhanced.categorical_features + enhanced.derived_features
+    return enhanced, df_day, feature_names
+
+def test_population_evaluator_matches_individual_evaluation():
+    """Batched objectives equal enhanced_evaluate_individual for every individual"""
+    enhanced, df_day, feature_names = build_day()
+    rng = random.Random(0)
+    num_trains = len(df_day)
+    population = [rng.sample(range(num_trains), num_trains) for _ in range(20)]
+    population += [rng.sample(range(num_trains), 12) for _ in range(5)]
+
+    weights = {'branding': 1.5, 'mileage': 0.5, 'shunting': 2.0, 'fitness': 1.0, 'efficiency': 0.8}
+    params = dict(min_revenue_trains=20, cleaning_slots=3, depot_bays=6, weights=weights)
+
+    expected = [
+        model.enhanced_evaluate_individual(ind, df_day, enhanced, enhanced.preprocessor, feature_names, **params)
+        for ind in population
+    ]
+    batched = model.enhanced_evaluate_population(
+        population, df_day, enhanced, enhanced.preprocessor, feature_names, **params
+    )
+
+    assert len(batched) == len(population)
+    assert np.allclose(np.array(expected, dtype=float), np.array(batched), rtol=1e-9, atol=1e-6)
+
+def test_budgeted_search_respects_fit_budget():
+    """Successive halving stays within max_fits and keeps the winner's CV scores"""
+    df = model.load_dataset(DATASET_PATH).head(1500)
+    enhanced = model.EnhancedTrainInductionModel()
+    X = enhanced.preprocess_data(df, training=True)
+    y = df['induction_status'].map(STATUS_CODES).to_numpy()
+
+    search = BudgetedSearch(
+        RandomForestClassifier(random_state=0),
+        {'n_estimators': [5, 10, 20], 'max_depth': [2, 4, 8], 'min_samples_leaf': [1, 4, 8]},
+        n_candidates=9, cv=3, max_fits=18, n_jobs=1
+    )
+    search.fit(X, y)
+
+    assert search.n_fits_ <= 18
+    assert search.stopped_early_
+    assert len(search.best_cv_scores_) == 3
+    assert abs(search.best_score_ - search.best_cv_scores_.mean()) < 1e-12
+    assert search.best_estimator_.get_params()['max_depth'] == search.best_params_['max_depth']
+
+def test_streaming_preprocess_matches_in_memory(tmp_path):
+    """Chunked preprocessing into a memmap reproduces preprocess_data and the labels"""
+    df = model.load_dataset(DATASET_PATH).head(2000)
+    df.loc[::7, 'job_card_status'] = None
+
+    in_memory = model.EnhancedTrainInductionModel()
+    expected = in_memory.preprocess_data(df, training=True)
+
+    streaming = model.EnhancedTrainInductionModel()
+    chunks = lambda: (df.iloc[start:start + 300] for start in range(0, len(df), 300))
+    X, y = streaming.preprocess_streaming(chunks, str(tmp_path / 'X.npy'), label_map=STATUS_CODES)
+
+    assert isinstance(X, np.memmap)
+    assert streaming.feature_names == in_memory.feature_names
+    assert np.allclose(X, expected, atol=1e-9)
+    assert np.array_equal(y, df['induction_status'].astype(object).map(STATUS_CODES).to_numpy())
+    assert np.allclose(streaming.preprocessor.transform(streaming._feature_frame(df.head(50))), expected[:50])
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests for the versioned model bundle
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from model_bundle import ModelBundle, BundleError, write_bundle
+from tree_predictor import CompiledForest
+from python_optimization_service import PythonOptimizationService, MODEL_FEATURES, SCALED_FEATURES
+
+SAMPLE_DATA = [
+    {
+        "trainId": f"T{i:03d}",
+        "fitnessCertificate": (i * 13) % 100,
+        "jobCardStatus": (i * 29) % 100,
+        "brandingPriority": i % 12,
+        "mileageBalancing": 1000 * i,
+        "cleaningDetailing": i % 6,
+        "stablingGeometry": i % 11
+    }
+    for i in range(20)
+]
+
+def make_bundle(path):
+    """Fit a small service model on synthetic rows and bundle it"""
+    rng = np.random.default_rng(0)
+    X = rng.random((120, len(MODEL_FEATURES)))
+    scaler = StandardScaler().fit(pd.DataFrame(X[:, :len(SCALED_FEATURES)] * 1000, columns=SCALED_FEATURES))
+    encoder = LabelEncoder().fit(['maintenance', 'revenue', 'standby'])
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(
+        pd.DataFrame(X, columns=MODEL_FEATURES), rng.integers(0, 3, 120)
+    )
+    return write_bundle(path, model, MODEL_FEATURES, scaler=scaler, label_encoder=encoder)
+
+def test_bundle_roundtrip(tmp_path):
+    """Opening a bundle is lazy and yields memory-mapped scaler statistics"""
+    written = make_bundle(tmp_path / 'model.bundle')
+    bundle = ModelBundle.open(str(tmp_path / 'model.bundle'))
+
+    assert bundle.version == written.version
+    assert bundle._components == {}
+    assert isinstance(bundle.scaler.mean_, np.memmap)
+    assert list(bundle.label_encoder.classes_) == ['maintenance', 'revenue', 'standby']
+    bundle.check_schema(MODEL_FEATURES, SCALED_FEATURES)
+    with pytest.raises(BundleError):
+        bundle.check_schema(MODEL_FEATURES[:-1], SCALED_FEATURES)
+
+def test_service_loads_bundle(tmp_path):
+    """The service serves the compiled forest from a bundle and reports its version"""
+    bundle = make_bundle(tmp_path / 'model.bundle')
+    service = PythonOptimizationService(bundle_path=str(tmp_path / 'model.bundle'))
+
+    assert service.is_ready()
+    assert service.model_version == bundle.version
+    assert isinstance(service.model, CompiledForest)
+    assert isinstance(service.model.threshold.base, np.memmap)  # no copy of the node arrays
+    result = service.run_optimization(SAMPLE_DATA)
+    assert result['success']
+    assert len(result['results']) == len(SAMPLE_DATA)
+
+def test_tampered_bundle_is_rejected(tmp_path):
+    """A checksum mismatch fails the load and keeps the previous model"""
+    path = tmp_path / 'model.bundle'
+    make_bundle(path)
+    service = PythonOptimizationService(bundle_path=str(path))
+    previous = service.model_version
+
+    with open(path / 'arrays' / 'scaler.mean_.npy', 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b'\x01')
+
+    with pytest.raises(BundleError):
+        ModelBundle.open(str(path)).scaler
+    assert service.load_model() is False
+    assert service.model_version == previous
+
+def test_publishing_swaps_a_symlink_between_versions(tmp_path):
+    """Each write gets its own version directory; the path is switched atomically"""
+    path = tmp_path / 'model.bundle'
+    # A bundle directory written before versioned publishing is migrated
+    (path / 'arrays').mkdir(parents=True)
+    (path / 'manifest.json').write_text('{}')
+    first = make_bundle(path)
+    assert path.is_symlink() and os.path.realpath(path) == first.path
+    second = make_bundle(path)
+    third = make_bundle(path)
+
+    assert os.path.realpath(path) == third.path == ModelBundle.open(str(path)).path
+    # The previous version is kept for readers still loading it, older ones pruned
+    versions = sorted(p for p in os.listdir(tmp_path) if p.startswith('.model.bundle-'))
+    assert versions == sorted(os.path.basename(b.path) for b in (second, third))
+
+    # A configured bundle path never falls back to the legacy pickles
+    missing = PythonOptimizationService(bundle_path=str(tmp_path / 'missing.bundle'))
+    assert not missing.is_ready() and missing.model_version is None
+
+def test_repeated_requests_hit_the_result_cache(tmp_path):
+    """Repeats, including reordered keys, are served from cache until the bundle changes"""
+    path = tmp_path / 'model.bundle'
+    make_bundle(path)
+    service = PythonOptimizationService(bundle_path=str(path))
+    first = service.run_optimization(SAMPLE_DATA)
+
+    reordered = [dict(reversed(list(record.items()))) for record in SAMPLE_DATA]
+    repeat = service.run_optimization(reordered, timings=True)
+    assert repeat['results'] == first['results']
+    assert 'predict' not in repeat['timings']['stages_ms']
+    assert service.result_cache.stats()['hits'] == 1
+
+    # Loading a newly published bundle invalidates the cached results
+    time.sleep(0.01)
+    make_bundle(path)
+    service.reload_if_changed()
+    rerun = service.run_optimization(SAMPLE_DATA, timings=True)
+    assert 'predict' in rerun['timings']['stages_ms']
@@ -3,6 +3,7 @@
 Test script for the Python optimization service
 """
 
+import io
 import json
 import sys
 import os
@@ -10,7 +11,7 @@ import os
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from python_optimization_service import PythonOptimizationService
+from python_optimization_service import PythonOptimizationService, OptimizationWorker
 
 def test_optimization():
     """Test the optimization service with sample data"""
@@ -92,6 +93,28 @@ def test_optimization():
         print(f"❌ Optimization failed: {result['error']}")
         return False
 
+def test_worker_protocol():
+    """Test the JSON-lines worker handshake and control messages"""
+    requests = [
+        {"id": 1, "type": "health"},
+        {"id": 2, "type": "unknown"},
+        {"id": 3, "type": "shutdown"},
+        {"id": 4, "type": "health"}
+    ]
+    instream = io.StringIO("".join(json.dumps(r) + "\n" for r in requests) + "not json\n")
+    outstream = io.StringIO()
+
+    worker = OptimizationWorker(instream=instream, outstream=outstream)
+    worker.serve()
+
+    replies = [json.loads(line) for line in outstream.getvalue().splitlines()]
+    assert replies[0]['type'] == 'ready'
+    assert replies[1]['id'] == 1 and replies[1]['model_loaded'] == worker.service.is_ready()
+    assert replies[2]['type'] == 'error'
+    assert replies[3] == {'id': 3, 'type': 'shutdown', 'success': True}
+    # Nothing is served after shutdown
+    assert len(replies) == 4
+
 if __name__ == "__main__":
     success = test_optimization()
     sys.exit(0 if success else 1)
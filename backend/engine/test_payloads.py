@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for file, stdin and columnar fleet payloads
+"""
+
+import io
+import json
+import subprocess
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from payloads import PayloadError, read_payload, read_stream, to_frame
+from python_optimization_service import PythonOptimizationService
+from test_model_bundle import SAMPLE_DATA, make_bundle
+
+ENGINE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def encode(fmt):
+    """SAMPLE_DATA serialized in ``fmt``"""
+    frame = pd.DataFrame(SAMPLE_DATA)
+    if fmt == 'json':
+        return json.dumps(SAMPLE_DATA).encode()
+    if fmt == 'jsonl':
+        return ''.join(json.dumps(r) + '\n' for r in SAMPLE_DATA).encode()
+    sink = io.BytesIO()
+    if fmt == 'npy':
+        np.save(sink, frame.to_records(index=False, column_dtypes={'trainId': 'U8'}))
+        return sink.getvalue()
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    writer = pa.ipc.new_file if fmt == 'arrow_file' else pa.ipc.new_stream
+    with writer(sink, table.schema) as w:
+        w.write_table(table)
+    return sink.getvalue()
+
+def test_formats_give_the_same_plan(tmp_path):
+    """Every transport, detected from content alone, yields the same optimization"""
+    make_bundle(tmp_path / 'model.bundle')
+    service = PythonOptimizationService(bundle_path=str(tmp_path / 'model.bundle'))
+    expected = service.run_optimization(SAMPLE_DATA)['results']
+
+    for fmt in ['json', 'jsonl', 'npy', 'arrow_stream', 'arrow_file']:
+        # A BufferedReader over BytesIO behaves like a pipe that can peek
+        payload = read_stream(io.BufferedReader(io.BytesIO(encode(fmt))))
+        if fmt in ('json', 'jsonl'):
+            assert payload == SAMPLE_DATA
+        else:
+            assert isinstance(payload, pd.DataFrame), fmt
+        result = service.run_optimization(payload)
+        assert result['results'] == expected, fmt
+
+    path = tmp_path / 'fleet.arrow'
+    path.write_bytes(encode('arrow_file'))
+    assert len(read_payload(str(path))) == len(SAMPLE_DATA)
+    (tmp_path / 'fleet.json').write_text('{"trainId": "T001"}')
+    try:
+        read_payload(str(tmp_path / 'fleet.json'))
+        assert False, "a JSON object is not a fleet"
+    except PayloadError:
+        pass
+
+    # Preprocessing edits its own copy, never the caller's columnar payload
+    frame = pd.DataFrame(SAMPLE_DATA)
+    copy = to_frame(frame)
+    copy.loc[0, 'mileageBalancing'] = -1
+    assert copy.loc[0, 'mileageBalancing'] == -1
+    assert frame.loc[0, 'mileageBalancing'] == 0
+
+def test_cli_reads_stdin(tmp_path):
+    """``--input -`` takes the fleet from stdin instead of argv"""
+    make_bundle(tmp_path / 'model.bundle')
+    completed = subprocess.run(
+        [sys.executable, os.path.join(ENGINE_DIR, 'python_optimization_service.py'), '--input', '-'],
+        input=encode('arrow_stream'), capture_output=True, cwd=ENGINE_DIR,
+        env={**os.environ, 'KMRL_MODEL_BUNDLE': str(tmp_path / 'model.bundle')}, timeout=120
+    )
+    assert completed.returncode == 0, completed.stderr.decode()
+    result = json.loads(completed.stdout)
+    assert result['success'] and len(result['results']) == len(SAMPLE_DATA)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tests for the NSGA-II induction planner
+"""
+
+import random
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from deap import tools
+
+from model import PopulationEvaluator
+from planner import IslandGroup, InductionPlanner, prepare_day
+from test_model import build_day
+
+def test_plan_respects_serviceability_and_ranks_service_first():
+    """Unserviceable trains end up in maintenance and service trains lead the plan"""
+    enhanced, df_day, _ = build_day()
+    derived_features = enhanced.derived_features
+    result = InductionPlanner(enhanced, population_size=40, generations=10, n_jobs=1, seed=7).plan(
+        df_day, min_revenue_trains=10
+    )
+    # The model may be shared between sessions, so planning never writes to it
+    assert enhanced.derived_features is derived_features
+
+    assert result['success'], result.get('error')
+    plan = result['plan']
+    assert len(plan) == len(df_day)
+    assert [item['rank'] for item in plan] == list(range(1, len(plan) + 1))
+
+    unserviceable = set(df_day.loc[df_day['is_serviceable'] == 0, 'train_id'])
+    for item in plan:
+        if item['train_id'] in unserviceable:
+            assert item['assigned_status'] == 'Maintenance'
+
+    order = {'Service': 0, 'Standby': 1, 'Maintenance': 2}
+    ranks = [order[item['assigned_status']] for item in plan]
+    assert ranks == sorted(ranks)
+    assert result['pareto_front']
+
+def test_parallel_planner_is_reproducible():
+    """A seeded run gives the same plan in-process and on a process pool, leaving global random alone"""
+    enhanced, df_day, _ = build_day()
+    assert InductionPlanner(enhanced).n_jobs == 1
+    state = random.getstate()
+    serial = InductionPlanner(enhanced, population_size=40, generations=5, n_jobs=1, seed=3).plan(df_day)
+    parallel = InductionPlanner(enhanced, population_size=40, generations=5, n_jobs=2, seed=3).plan(df_day)
+
+    assert random.getstate() == state
+    assert serial['success'] and parallel['success']
+    assert serial['plan'] == parallel['plan']
+    assert serial['evaluations'] == parallel['evaluations']
+
+def test_island_planner_is_reproducible_and_merges_fronts():
+    """Seeded islands give the same plan in-process and across processes, from one merged front"""
+    enhanced, df_day, _ = build_day()
+    options = dict(population_size=48, generations=6, seed=5, islands=3, migration_interval=2)
+    serial = InductionPlanner(enhanced, n_jobs=1, **options).plan(df_day)
+    parallel = InductionPlanner(enhanced, n_jobs=2, **options).plan(df_day)
+
+    assert serial['success'] and parallel['success']
+    assert serial['plan'] == parallel['plan']
+    assert serial['pareto_front'] == parallel['pareto_front']
+    assert serial['evaluations'] == parallel['evaluations']
+    assert serial['islands'] == {'count': 3, 'migration_interval': 2, 'migration_size': 2}
+    assert serial['population_size'] == 48
+
+    # No plan on the merged front dominates another
+    objectives = [tuple(entry['objectives'].values()) for entry in serial['pareto_front']]
+    for a in objectives:
+        assert not any(all(x >= y for x, y in zip(b, a)) and b != a for b in objectives)
+
+def test_migrants_replace_the_worst_individuals():
+    """An island admits a dominating migrant in place of its worst individual"""
+    enhanced, df_day, _ = build_day()
+    day, feature_names = prepare_day(enhanced, df_day)
+    evaluator = PopulationEvaluator(day, enhanced, enhanced.preprocessor, feature_names)
+    # Islands take a model-less, single-process planner as their settings
+    settings = InductionPlanner(None, n_jobs=1)
+    group = IslandGroup(settings, evaluator, evaluator.predictions.tolist(), 8, [1, 2], 1000)
+    emigrants = group.run(2, 1)
+    assert [len(migrants) for migrants in emigrants] == [1, 1]
+
+    island = group.islands[1]
+    genes = emigrants[0][0][0]
+    best = tuple(max(ind.fitness.values[i] for ind in island.population) + 1 for i in range(6))
+    island.immigrate([(genes, best)])
+    assert len(island.population) == 8
+    front = tools.sortNondominated(island.population, 8, first_front_only=True)[0]
+    assert [ind.fitness.values for ind in front] == [best]
+
+def test_milp_solver_enforces_hard_constraints():
+    """The MILP plan meets the revenue floor and cleaning/bay capacities"""
+    enhanced, df_day, _ = build_day()
+    result = InductionPlanner(enhanced, solver='milp').plan(
+        df_day, min_revenue_trains=12, cleaning_slots=2, depot_bays=6
+    )
+
+    assert result['success'], result.get('error')
+    assert result['solver'] == 'milp' and result['optimal'] and result['min_revenue_met']
+
+    status = {item['train_id']: item['assigned_status'] for item in result['plan']}
+    revenue = df_day[df_day['train_id'].map(status) == 'Service']
+    assert len(revenue) >= 12
+    assert (revenue['cleaning_slot'] > 0).sum() <= 2
+    assert (revenue['stabling_bay'] > 0).sum() <= 6
+    assert (revenue['is_serviceable'] == 1).all()
+
+def test_milp_solver_reports_unreachable_revenue_floor():
+    """An unreachable revenue floor is reported instead of failing"""
+    enhanced, df_day, _ = build_day()
+    result = InductionPlanner(enhanced, solver='milp').plan(df_day, min_revenue_trains=len(df_day) + 5)
+
+    assert result['success']
+    assert not result['min_revenue_met']
+    assert result['revenue_shortfall'] >= 5
+
+def test_fitness_cache_skips_repeated_evaluations():
+    """Rerunning a seeded plan is served entirely from the fitness cache"""
+    enhanced, df_day, _ = build_day()
+    planner = InductionPlanner(enhanced, population_size=40, generations=5, n_jobs=1, seed=11)
+    first = planner.plan(df_day)
+    second = planner.plan(df_day)
+
+    assert first['evaluations'] > 0
+    assert second['evaluations'] == 0
+    assert second['plan'] == first['plan']
+
+    # A different scenario cannot reuse those objectives
+    third = planner.plan(df_day, depot_bays=4)
+    assert third['evaluations'] > 0
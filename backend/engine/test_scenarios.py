@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Tests for parallel what-if scenario sweeps
+"""
+
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from scenarios import ScenarioEngine, scenario_grid
+from test_model import build_day
+
+def test_grid_expands_every_combination():
+    """Each setting list multiplies the grid; weights keep their defaults"""
+    grid = scenario_grid(min_revenue_trains=[10, 15], cleaning_slots=[2, 5], weights=[{}, {'branding': 2.0}])
+
+    assert len(grid) == 8
+    assert grid[1]['weights']['branding'] == 2.0 and grid[1]['weights']['shunting'] == 1.0
+    assert {s['depot_bays'] for s in grid} == {10}
+
+def test_sweep_predicts_once_and_matches_serial(monkeypatch):
+    """Parallel results equal serial ones, and the model predicts the day once"""
+    enhanced, df_day, _ = build_day()
+    calls = []
+    original = enhanced.predict_with_confidence
+    monkeypatch.setattr(enhanced, 'predict_with_confidence', lambda X: calls.append(len(X)) or original(X))
+
+    grid = scenario_grid(min_revenue_trains=[8, 12], cleaning_slots=[1, 4])
+    options = dict(population_size=20, generations=3, seed=5)
+    serial = ScenarioEngine(enhanced, df_day, n_jobs=1, **options).run_all(grid)
+    assert calls == [len(df_day)]
+
+    streamed = list(ScenarioEngine(enhanced, df_day, n_jobs=2, **options).run(grid))
+    assert sorted(r['scenario_index'] for r in streamed) == [0, 1, 2, 3]
+    for result in streamed:
+        expected = serial[result['scenario_index']]
+        assert result['success'], result.get('error')
+        assert result['plan'] == expected['plan']
+        assert result['kpis'] == expected['kpis']
+        assert result['scenario'] == grid[result['scenario_index']]
+        assert result['kpis']['service'] + result['kpis']['standby'] + result['kpis']['maintenance'] == len(df_day)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for the columnar scoring engine
+"""
+
+import sys
+import os
+
+import pandas as pd
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from scoring import compute_scores, build_results, summarize
+
+def make_fleet():
+    return pd.DataFrame({
+        'train_id': ['T001', 'T002', 'T003', 'T004'],
+        'fitness_score': [1.0, 1.0, 2 / 3, 0.0],
+        'job_card_status': ['closed', 'open', 'open', 'open'],
+        'branding_hours': [8.0, 4.0, 10.0, 0.0],
+        'mileage_balance_deviation': [0.0, 20000.0, 5000.0, 250000.0],
+        'cleaning_slot': [1, 0, 2, 0],
+        'stabling_bay': [3, 0, 0, 1]
+    })
+
+def test_compute_scores_matches_row_formula():
+    """Each row follows the weighted six-factor formula and status thresholds"""
+    scores = compute_scores(make_fleet(), [1, 1, 2, 1])
+
+    first = scores.iloc[0]
+    assert first['overall_score'] == 100.0
+    assert first['induction_status'] == 'revenue'
+
+    second = scores.iloc[1]
+    expected = 100 * 0.25 + 0 * 0.20 + 50 * 0.15 + 80 * 0.15 + 50 * 0.10 + 50 * 0.15
+    assert abs(second['overall_score'] - expected) < 1e-9
+    # Revenue prediction below 70 falls back to standby
+    assert second['induction_status'] == 'standby'
+
+    assert scores.iloc[2]['induction_status'] == 'standby'
+    assert scores.iloc[3]['mileage_score'] == 0.0
+    assert scores.iloc[3]['induction_status'] == 'maintenance'
+
+def test_results_sorted_and_summarized():
+    """Results are ranked by overall score and the summary counts statuses"""
+    scores = compute_scores(make_fleet(), [1, 1, 2, 0])
+    results = build_results(scores)
+
+    overall = [r['overall_score'] for r in results]
+    assert overall == sorted(overall, reverse=True)
+    assert results[0]['train_id'] == 'T001'
+    assert results[0]['explainability'].startswith('Score: 100.0 - Fitness: 100.0')
+
+    summary = summarize(scores)
+    assert summary['total_trains'] == 4
+    assert summary['revenue_trains'] + summary['standby_trains'] + summary['maintenance_trains'] == 4
+    assert summary['highest_score'] == overall[0]
+    assert summary['lowest_score'] == overall[-1]
+
+def test_empty_fleet():
+    """An empty fleet yields no results and a zeroed summary"""
+    scores = compute_scores(make_fleet().iloc[0:0], [])
+    assert build_results(scores) == []
+    assert summarize(scores)['average_score'] == 0
+
+def score_rows(df, predictions):
+    """The per-row loop run_optimization used before scoring was vectorized"""
+    results = []
+    for idx, (_, row) in enumerate(df.iterrows()):
+        prediction = predictions[idx]
+        fitness_score = row['fitness_score'] * 100
+        job_card_score = 100 if row['job_card_status'] == 'closed' else 0
+        branding_score = min(100, (row['branding_hours'] / 8.0) * 100)
+        mileage_score = max(0, 100 - (row['mileage_balance_deviation'] / 1000))
+        cleaning_score = 100 if row['cleaning_slot'] > 0 else 50
+        geometry_score = 100 if row['stabling_bay'] > 0 else 50
+        overall_score = (
+            fitness_score * 0.25 +
+            job_card_score * 0.20 +
+            branding_score * 0.15 +
+            mileage_score * 0.15 +
+            cleaning_score * 0.10 +
+            geometry_score * 0.15
+        )
+        if prediction == 1 and overall_score >= 70:
+            induction_status = 'revenue'
+        elif prediction == 2 or (prediction == 1 and overall_score >= 50):
+            induction_status = 'standby'
+        else:
+            induction_status = 'maintenance'
+        results.append({
+            'train_id': row['train_id'],
+            'induction_status': induction_status,
+            'overall_score': round(overall_score, 2),
+            'fitness_score': round(fitness_score, 2),
+            'job_card_score': round(job_card_score, 2),
+            'branding_score': round(branding_score, 2),
+            'mileage_score': round(mileage_score, 2),
+            'cleaning_score': round(cleaning_score, 2),
+            'geometry_score': round(geometry_score, 2),
+            'cleaning_slot': int(row['cleaning_slot']),
+            'stabling_bay': int(row['stabling_bay']),
+            'explainability': f"Score: {overall_score:.1f} - Fitness: {fitness_score:.1f}, Job Card: {job_card_score:.1f}, Branding: {branding_score:.1f}, Mileage: {mileage_score:.1f}, Cleaning: {cleaning_score:.1f}, Geometry: {geometry_score:.1f}"
+        })
+    results.sort(key=lambda x: x['overall_score'], reverse=True)
+    overall = [r['overall_score'] for r in results]
+    summary = {
+        'total_trains': len(results),
+        'revenue_trains': len([r for r in results if r['induction_status'] == 'revenue']),
+        'standby_trains': len([r for r in results if r['induction_status'] == 'standby']),
+        'maintenance_trains': len([r for r in results if r['induction_status'] == 'maintenance']),
+        'average_score': round(sum(overall) / len(overall), 2),
+        'highest_score': max(overall),
+        'lowest_score': min(overall)
+    }
+    return results, summary
+
+def test_vectorized_scoring_matches_the_row_loop():
+    """Rounding, ranking and summary on sam.csv are exactly those of the original loop"""
+    history = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sam.csv'))
+    df = pd.DataFrame({
+        'train_id': history['train_id'],
+        'fitness_score': history[['rolling_stock_fitness', 'signalling_fitness', 'telecom_fitness']].mean(axis=1),
+        'job_card_status': history['job_card_status'],
+        'branding_hours': history['branding_hours'],
+        'mileage_balance_deviation': (history['mileage'] - history['mileage'].mean()).abs(),
+        'cleaning_slot': history['cleaning_slot'],
+        'stabling_bay': history['stabling_bay']
+    })
+    predictions = history['induction_status'].map({'maintenance': 0, 'revenue': 1, 'standby': 2}).to_numpy()
+
+    scores = compute_scores(df, predictions)
+    expected_results, expected_summary = score_rows(df, predictions)
+    assert build_results(scores) == expected_results
+    assert summarize(scores) == expected_summary
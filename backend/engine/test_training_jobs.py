@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for background retraining jobs and the service's model hot swap
+"""
+
+import subprocess
+import sys
+import os
+
+import pandas as pd
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import model
+from model_bundle import load_enhanced_model_bundle
+from python_optimization_service import PythonOptimizationService
+from training_jobs import CANCELLED, FAILED, QUEUED, SUCCEEDED, TrainingJobRunner, _process_started, _write_status
+from test_model import DATASET_PATH
+from test_model_bundle import SAMPLE_DATA, make_bundle
+
+def write_history(tmp_path, days=5):
+    df = model.load_dataset(DATASET_PATH)
+    recent = sorted(df['date'].unique())[:days]
+    path = tmp_path / 'history.csv'
+    df[df['date'].isin(recent)].to_csv(path, index=False)
+    return str(path)
+
+def make_runner(tmp_path):
+    return TrainingJobRunner(str(tmp_path / 'jobs'),
+                             service_bundle_path=str(tmp_path / 'service.bundle'),
+                             planner_bundle_path=str(tmp_path / 'planner.bundle'))
+
+def test_job_publishes_bundles_and_service_swaps(tmp_path):
+    """A finished job's bundles replace the served model; a running request keeps the old one"""
+    make_bundle(tmp_path / 'service.bundle')
+    service = PythonOptimizationService(bundle_path=str(tmp_path / 'service.bundle'))
+    old_version = service.model_version
+    in_flight = service.serving
+
+    runner = make_runner(tmp_path)
+    job_id = runner.submit(write_history(tmp_path), model_type='random_forest')
+    status = runner.wait(job_id, timeout=300)
+    assert status['state'] == SUCCEEDED, status.get('error')
+    assert status['progress'] == 1.0
+
+    assert service.reload_if_changed()
+    assert service.model_version == status['service_version'] != old_version
+    assert not service.reload_if_changed()
+    assert in_flight.version == old_version
+    assert len(in_flight.model.predict(service.encode_features(
+        service.preprocess_uploaded_data(SAMPLE_DATA), in_flight.scaler))) == len(SAMPLE_DATA)
+    assert service.run_optimization(SAMPLE_DATA)['success']
+
+    enhanced = load_enhanced_model_bundle(str(tmp_path / 'planner.bundle'))
+    assert enhanced.model is not None
+    # Status is persisted, so a fresh runner sees the finished job
+    assert make_runner(tmp_path).jobs()[0]['state'] == SUCCEEDED
+
+def test_cancelled_job_publishes_nothing(tmp_path):
+    """Cancelling a running job records it as cancelled and leaves no bundle"""
+    runner = make_runner(tmp_path)
+    job_id = runner.submit(write_history(tmp_path), model_type='random_forest')
+
+    status = runner.cancel(job_id)
+    assert status['state'] == CANCELLED
+    assert runner.active() is None
+    assert not os.path.exists(tmp_path / 'service.bundle')
+    assert not os.path.exists(tmp_path / 'planner.bundle')
+
+def test_queued_job_of_a_dead_launcher_fails(tmp_path):
+    """A job left queued by a process that died before starting it is marked failed"""
+    runner = make_runner(tmp_path)
+    launcher = subprocess.Popen([sys.executable, '-c', 'pass'])
+    launcher.wait()
+    for job_id, pid in (('orphan', launcher.pid), ('pending', os.getpid())):
+        _write_status(runner._path(job_id), {
+            'job_id': job_id, 'state': QUEUED, 'stage': None, 'progress': 0.0, 'pid': None,
+            'error': None, 'launcher_pid': pid, 'launcher_started': _process_started(pid)
+        })
+
+    orphan = runner.status('orphan')
+    assert orphan['state'] == FAILED and 'before the job started' in orphan['error']
+    # A live launcher may still be about to start its job
+    assert runner.status('pending')['state'] == QUEUED
+    assert runner.active()['job_id'] == 'pending'
+
+def test_job_card_codes_do_not_depend_on_row_order():
+    """Training and serving encode job card status with the same fixed codes"""
+    from python_optimization_service import JOB_CARD_CODES, _encode_columns
+
+    open_first = _encode_columns(pd.DataFrame({'job_card_status': ['open', 'closed', None]}))
+    closed_first = _encode_columns(pd.DataFrame({'job_card_status': ['closed', 'open', 'unknown']}))
+    assert open_first['job_card_status'].tolist() == [JOB_CARD_CODES['open'], JOB_CARD_CODES['closed'],
+                                                     JOB_CARD_CODES['open']]
+    assert closed_first['job_card_status'].tolist() == [JOB_CARD_CODES['closed'], JOB_CARD_CODES['open'],
+                                                       JOB_CARD_CODES['open']]
+    history = pd.DataFrame({'job_card_status': pd.Categorical(['open', 'closed'], categories=['closed', 'open'])})
+    assert _encode_columns(history)['job_card_status'].tolist() == [JOB_CARD_CODES['open'], JOB_CARD_CODES['closed']]
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled tree-ensemble predictor
+"""
+
+import sys
+import os
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from xgboost import XGBClassifier
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tree_predictor import CompiledForest, compile_ensemble, probe_inputs, verify
+
+def make_data(n_samples=600, missing=False):
+    rng = np.random.default_rng(7)
+    X = rng.normal(size=(n_samples, 6)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] > 0).astype(int) + (X[:, 2] > 0.8)
+    if missing:
+        X[rng.random(X.shape) < 0.05] = np.nan
+    return X, y
+
+@pytest.mark.parametrize('missing', [False, True])
+def test_random_forest_matches_exactly(missing):
+    """Compiled forest probabilities are bit-identical to scikit-learn's"""
+    X, y = make_data(missing=missing)
+    model = RandomForestClassifier(n_estimators=25, random_state=0, class_weight='balanced').fit(X, y)
+    forest = compile_ensemble(model)
+
+    labels, confidence, probabilities = forest.predict_with_confidence(X)
+    expected = model.predict_proba(X)
+    assert np.array_equal(probabilities, expected)
+    assert np.array_equal(labels, model.predict(X))
+    assert np.array_equal(confidence, expected.max(axis=1))
+    verify(forest, model)
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_xgboost_matches(binary):
+    """Boosted margins reproduce XGBoost's labels and probabilities"""
+    X, y = make_data(missing=True)
+    y = (y > 0).astype(int) if binary else y
+    model = XGBClassifier(n_estimators=30, max_depth=4, eval_metric='logloss').fit(X, y)
+    forest = compile_ensemble(model)
+
+    assert np.allclose(forest.predict_proba(X), model.predict_proba(X), atol=1e-6)
+    assert np.array_equal(forest.predict(X), model.predict(X))
+    verify(forest, model)
+
+def test_array_roundtrip_and_unsupported_models():
+    """Node arrays and config rebuild the same predictor; non-tree models are refused"""
+    X, y = make_data()
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    forest = compile_ensemble(model)
+    rebuilt = CompiledForest.from_arrays(forest.to_arrays(), forest.config())
+
+    probe = probe_inputs(forest)
+    assert np.array_equal(rebuilt.predict_proba(probe), forest.predict_proba(probe))
+    with pytest.raises(TypeError):
+        compile_ensemble(LogisticRegression().fit(X, y))
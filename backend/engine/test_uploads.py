@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for joining the per-factor upload files
+"""
+
+import io
+import json
+import subprocess
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from python_optimization_service import PythonOptimizationService
+from test_model_bundle import SAMPLE_DATA, make_bundle
+from uploads import FACTOR_FILES, FACTORS, UploadError, factor_sources, join_factors
+
+ENGINE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def write_factor_files(directory, records):
+    """Split ``records`` into one CSV per factor, as the upload flow does"""
+    frame = pd.DataFrame(records)
+    for factor, name in FACTOR_FILES.items():
+        frame[['trainId', factor]].to_csv(os.path.join(directory, name), index=False)
+
+def test_join_matches_the_combined_records(tmp_path):
+    """Joining the split files gives back the fleet, and the same plan"""
+    write_factor_files(tmp_path, SAMPLE_DATA)
+    df, report = join_factors(factor_sources(str(tmp_path)))
+    assert report == {'trains': len(SAMPLE_DATA), 'factors': FACTORS, 'absent_factors': [],
+                      'missing': {}, 'duplicates': {}}
+    assert df['trainId'].tolist() == [r['trainId'] for r in SAMPLE_DATA]
+    for factor in FACTORS:
+        assert np.allclose(df[factor].astype(float), [r[factor] for r in SAMPLE_DATA]), factor
+
+    make_bundle(tmp_path / 'model.bundle')
+    service = PythonOptimizationService(bundle_path=str(tmp_path / 'model.bundle'))
+    expected = service.run_optimization(SAMPLE_DATA)['results']
+    result = service.run_factor_uploads(factor_sources(str(tmp_path)))
+    assert result['success'] and result['results'] == expected
+    assert result['join_report']['trains'] == len(SAMPLE_DATA)
+
+def test_missing_and_duplicate_ids_are_reported():
+    """Gaps are reported per factor; outer keeps every train, inner only complete ones"""
+    fitness = io.StringIO("trainId,fitnessCertificate\nT1,80\nT2,90\n T3 ,70\n")
+    jobs = io.StringIO("trainId,jobCardStatus\nT2,60\nT3,65\nT2,75\nT4,50\n")
+    df, report = join_factors([fitness, jobs])
+    assert df['trainId'].tolist() == ['T1', 'T2', 'T3', 'T4']
+    assert report['missing'] == {'fitnessCertificate': ['T4'], 'jobCardStatus': ['T1']}
+    assert report['duplicates'] == {'jobCardStatus': ['T2']}
+    assert report['absent_factors'] == FACTORS[2:]
+    # The last row of a repeated id wins; missing factors are NaN
+    assert df.set_index('trainId')['jobCardStatus'].loc['T2'] == 75
+    assert np.isnan(df.set_index('trainId')['fitnessCertificate'].loc['T4'])
+
+    fitness.seek(0)
+    jobs.seek(0)
+    inner, report = join_factors([fitness, jobs], how='inner')
+    assert inner['trainId'].tolist() == ['T2', 'T3'] and report['trains'] == 2
+
+    for sources in ([], [io.StringIO("id,fitnessCertificate\nT1,80\n")]):
+        try:
+            join_factors(sources)
+            assert False, "expected an UploadError"
+        except UploadError:
+            pass
+
+def test_cli_joins_a_directory(tmp_path):
+    """``--factors DIR`` joins the sample files found there"""
+    make_bundle(tmp_path / 'model.bundle')
+    write_factor_files(tmp_path, SAMPLE_DATA[:5])
+    completed = subprocess.run(
+        [sys.executable, os.path.join(ENGINE_DIR, 'python_optimization_service.py'), '--factors', str(tmp_path)],
+        capture_output=True, cwd=ENGINE_DIR,
+        env={**os.environ, 'KMRL_MODEL_BUNDLE': str(tmp_path / 'model.bundle')}, timeout=120
+    )
+    assert completed.returncode == 0, completed.stderr.decode()
+    result = json.loads(completed.stdout)
+    assert result['success'] and len(result['results']) == 5
+    assert result['join_report']['missing'] == {}
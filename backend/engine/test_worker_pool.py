@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for the pre-forked worker pool
+"""
+
+import io
+import json
+import sys
+import os
+import threading
+import time
+import urllib.request
+
+import pytest
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+from python_optimization_service import PythonOptimizationService
+from test_model_bundle import SAMPLE_DATA, make_bundle
+from worker_pool import WorkerPool
+
+def serve(pool_options, messages):
+    """Run a pool over ``messages`` and return its replies by type"""
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(write_fd, 'w') as f:
+        f.write(''.join(json.dumps(m) + '\n' for m in messages))
+    outstream = io.StringIO()
+    with os.fdopen(read_fd, 'rb') as instream:
+        WorkerPool(instream=instream, outstream=outstream, **pool_options).serve()
+    return [json.loads(line) for line in outstream.getvalue().splitlines()]
+
+def test_pool_serves_and_recycles_workers(tmp_path):
+    """Requests are spread over forked workers, which are replaced after max_requests"""
+    make_bundle(tmp_path / 'model.bundle')
+    service = PythonOptimizationService(bundle_path=str(tmp_path / 'model.bundle'))
+    expected = service.run_optimization(SAMPLE_DATA)
+    restarts = metrics.WORKER_RESTARTS.value(reason='max_requests')
+    served = metrics.REQUESTS.value(outcome='success')
+
+    messages = [{'id': i, 'type': 'optimize', 'data': SAMPLE_DATA} for i in range(6)]
+    replies = serve({'service': service, 'workers': 2, 'max_requests': 2},
+                    messages + [{'id': 'bad', 'type': 'nope'}])
+
+    assert replies[0]['type'] == 'ready' and len(replies[0]['workers']) == 2
+    optimized = {r['id']: r['result'] for r in replies if r['type'] == 'optimize'}
+    assert sorted(optimized) == list(range(6))
+    assert all(result == expected for result in optimized.values())
+    assert [r['id'] for r in replies if r['type'] == 'error'] == ['bad']
+    # Six requests at two per worker retire three workers while input remains
+    assert metrics.WORKER_RESTARTS.value(reason='max_requests') >= restarts + 2
+    assert metrics.REQUESTS.value(outcome='success') == served + 6
+
+def test_pool_answers_control_messages(tmp_path):
+    """health and metrics are answered by the supervisor; shutdown stops reading"""
+    make_bundle(tmp_path / 'model.bundle')
+    service = PythonOptimizationService(bundle_path=str(tmp_path / 'model.bundle'))
+    replies = serve({'service': service, 'workers': 1}, [
+        {'id': 1, 'type': 'health'},
+        {'id': 2, 'type': 'metrics'},
+        {'id': 3, 'type': 'shutdown'},
+        {'id': 4, 'type': 'optimize', 'data': SAMPLE_DATA}
+    ])
+
+    assert [r['id'] for r in replies[1:]] == [1, 2, 3]
+    assert replies[1]['workers'][0]['pid'] != os.getpid()
+    assert 'kmrl_pool_workers' in replies[2]['metrics']
+
+def test_pool_serves_metrics_from_its_loop(tmp_path):
+    """The supervisor answers /metrics and writes the metrics file without threads"""
+    make_bundle(tmp_path / 'model.bundle')
+    service = PythonOptimizationService(bundle_path=str(tmp_path / 'model.bundle'))
+    metrics_file = tmp_path / 'engine.prom'
+    read_fd, write_fd = os.pipe()
+    outstream = io.StringIO()
+    pool = WorkerPool(service=service, workers=1, instream=os.fdopen(read_fd, 'rb'), outstream=outstream,
+                      metrics_port=0, metrics_file=str(metrics_file), metrics_interval=0.05)
+    scraped = {}
+
+    def scrape():
+        while pool.metrics_server is None:
+            time.sleep(0.01)
+        port = pool.metrics_server.server_address[1]
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=10) as response:
+            scraped['body'] = response.read().decode()
+        with os.fdopen(write_fd, 'w') as f:
+            f.write(json.dumps({'id': 1, 'type': 'shutdown'}) + '\n')
+
+    # The scraping thread lives in the test, not in the forking supervisor
+    client = threading.Thread(target=scrape)
+    client.start()
+    pool.serve()
+    client.join()
+
+    assert 'kmrl_pool_workers{state="idle"} 1' in scraped['body']
+    assert 'kmrl_pool_workers' in metrics_file.read_text()
+
+def test_pool_stops_busy_workers_on_error(tmp_path):
+    """An exception with a request in flight terminates the busy worker instead of hanging"""
+    make_bundle(tmp_path / 'model.bundle')
+    service = PythonOptimizationService(bundle_path=str(tmp_path / 'model.bundle'))
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(write_fd, 'w') as f:
+        f.write(json.dumps({'id': 1, 'type': 'optimize', 'data': SAMPLE_DATA}) + '\n')
+    outstream = io.StringIO()
+    pool = WorkerPool(service=service, workers=1, instream=os.fdopen(read_fd, 'rb'), outstream=outstream)
+
+    def fail_once_busy():
+        if any(c.request is not None for c in pool.children):
+            raise RuntimeError('supervisor failure')
+    pool._update_gauges = fail_once_busy
+
+    started = time.perf_counter()
+    with pytest.raises(RuntimeError):
+        pool.serve()
+    assert time.perf_counter() - started < 30
+    assert pool.children == []
+    assert json.loads(outstream.getvalue().splitlines()[-1])['id'] == 1
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Background retraining jobs for the KMRL optimization engine
+A job retrains both models from a history dataset in a separate process
+and publishes them as bundles:
+
+    planner bundle   EnhancedTrainInductionModel used by the dashboard and planner
+    service bundle   forest, scaler and label encoder used by the optimization service
+
+Job status is persisted as one JSON file per job, so progress survives a
+dashboard restart. Bundles are published by atomic rename; services pick
+them up with ``reload_if_changed`` while requests already running finish
+on the model they started with.
+"""
+
+import os
+import json
+import time
+import uuid
+import signal
+import logging
+import multiprocessing
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+logger = logging.getLogger(__name__)
+
+ENGINE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_JOBS_DIR = os.path.join(ENGINE_DIR, 'training_jobs')
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+# Stage name and the progress reported when it starts
+STAGES = [
+    ('loading', 0.05),
+    ('training_planner_model', 0.2),
+    ('training_service_model', 0.6),
+    ('publishing', 0.9)
+]
+
+class JobCancelled(Exception):
+    """Raised inside a job process when it is asked to stop"""
+
+def _write_status(path: str, status: Dict[str, Any]):
+    staging = f'{path}.{os.getpid()}.tmp'
+    with open(staging, 'w') as f:
+        json.dump(status, f, indent=2)
+    os.replace(staging, path)
+
+def _read_status(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _process_started(pid: Optional[int]) -> Optional[str]:
+    """Start time of ``pid`` in clock ticks since boot, to tell a reused pid apart; None without /proc"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # The command name may hold spaces, so count fields after its closing parenthesis
+            return f.read().rsplit(')', 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+def _launcher_alive(status: Dict[str, Any]) -> bool:
+    """Whether the process that submitted a queued job still runs"""
+    pid = status.get('launcher_pid')
+    if not _pid_alive(pid):
+        return False
+    started = status.get('launcher_started')
+    return started is None or _process_started(pid) in (None, started)
+
+def train_service_model(history: pd.DataFrame, n_estimators: int = 50, max_depth: int = 8,
+                        random_state: int = 0):
+    """Fit the optimization service's forest, scaler and label encoder on history"""
+    from python_optimization_service import SCALED_FEATURES, encode_features
+
+    if 'induction_status' not in history.columns:
+        raise ValueError("Training data needs an 'induction_status' column")
+    scaler = StandardScaler().fit(history[SCALED_FEATURES])
+    X = encode_features(history.copy(), scaler)
+    encoder = LabelEncoder()
+    y = encoder.fit_transform(history['induction_status'].astype(str))
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth,
+                                   random_state=random_state, n_jobs=-1).fit(X, y)
+    return model, scaler, encoder
+
+def _run_job(status_path: str, spec: Dict[str, Any]):
+    """Job process entry point: train, publish and record the outcome"""
+    from ingestion import read_history
+    from model import EnhancedTrainInductionModel
+    from model_bundle import bundle_enhanced_model, write_bundle
+    from planner import train_planner_model
+    from python_optimization_service import MODEL_FEATURES
+
+    def cancel(signum, frame):
+        raise JobCancelled()
+
+    status = _read_status(status_path)
+    if status['state'] in FINISHED_STATES:
+        # Cancelled, or given up for lost, before this process started
+        return
+    status.update(state=RUNNING, pid=os.getpid(), started_at=datetime.now().isoformat())
+    signal.signal(signal.SIGTERM, cancel)
+
+    def stage(name):
+        status.update(stage=name, progress=dict(STAGES)[name])
+        _write_status(status_path, status)
+        logger.info(f"Training job {status['job_id']}: {name}")
+
+    try:
+        stage('loading')
+        history = read_history(spec['history_path'])
+        metadata = {'source': spec['history_path'], 'job_id': status['job_id'], 'rows': len(history)}
+
+        stage('training_planner_model')
+        enhanced = train_planner_model(EnhancedTrainInductionModel(), history,
+                                       model_type=spec['model_type'],
+                                       tune_hyperparams=spec['tune_hyperparams'])
+
+        stage('training_service_model')
+        model, scaler, encoder = train_service_model(history)
+
+        # Cancelling now could publish one bundle without the other, so finish first
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        stage('publishing')
+        planner_bundle = bundle_enhanced_model(enhanced, spec['planner_bundle_path'], metadata=metadata)
+        service_bundle = write_bundle(
+            spec['service_bundle_path'], model, MODEL_FEATURES, scaler=scaler, label_encoder=encoder,
+            metadata={'kind': 'service', **metadata}
+        )
+        status.update(state=SUCCEEDED, progress=1.0,
+                      planner_version=planner_bundle.version, service_version=service_bundle.version)
+    except JobCancelled:
+        status.update(state=CANCELLED)
+    except Exception as e:
+        logger.error(f"Training job {status['job_id']} failed: {str(e)}")
+        status.update(state=FAILED, error=str(e))
+    status['finished_at'] = datetime.now().isoformat()
+    _write_status(status_path, status)
+
+class TrainingJobRunner:
+    """
+    Starts retraining jobs in worker processes and tracks them on disk.
+
+    One job runs at a time. ``status`` reads the job's JSON file, so any
+    process (or a restarted dashboard) can follow a job started elsewhere;
+    a job whose process died without finishing is reported as failed, and
+    so is a queued job whose submitting process died before starting it.
+    """
+
+    def __init__(self, jobs_dir: str = DEFAULT_JOBS_DIR, service_bundle_path: Optional[str] = None,
+                 planner_bundle_path: Optional[str] = None):
+        from model_bundle import DEFAULT_BUNDLE_PATH, DEFAULT_PLANNER_BUNDLE_PATH
+
+        self.jobs_dir = jobs_dir
+        self.service_bundle_path = service_bundle_path or DEFAULT_BUNDLE_PATH
+        self.planner_bundle_path = planner_bundle_path or DEFAULT_PLANNER_BUNDLE_PATH
+        # spawn keeps the job clear of the parent's threads and open sockets
+        self._context = multiprocessing.get_context('spawn')
+        self._processes: Dict[str, Any] = {}
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f'{job_id}.json')
+
+    def submit(self, history_path: str, model_type: str = 'xgboost', tune_hyperparams: bool = False) -> str:
+        """Start retraining on ``history_path`` and return the job id"""
+        active = self.active()
+        if active is not None:
+            raise RuntimeError(f"Training job {active['job_id']} is still {active['state']}")
+
+        job_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        spec = {
+            'history_path': os.path.abspath(history_path),
+            'model_type': model_type,
+            'tune_hyperparams': tune_hyperparams,
+            'service_bundle_path': self.service_bundle_path,
+            'planner_bundle_path': self.planner_bundle_path
+        }
+        _write_status(self._path(job_id), {
+            'job_id': job_id, 'state': QUEUED, 'stage': None, 'progress': 0.0,
+            'submitted_at': datetime.now().isoformat(), 'pid': None, 'error': None,
+            # Lets other processes spot a job whose launcher died before starting it
+            'launcher_pid': os.getpid(), 'launcher_started': _process_started(os.getpid()), **spec
+        })
+        # Not a daemon: the fits start worker processes of their own
+        process = self._context.Process(target=_run_job, args=(self._path(job_id), spec),
+                                        name=f'training-{job_id}')
+        process.start()
+        self._processes[job_id] = process
+        logger.info(f"Started training job {job_id} on {history_path}")
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job's persisted status, or None for an unknown job"""
+        status = _read_status(self._path(job_id))
+        if status is None or status['state'] in FINISHED_STATES:
+            return status
+        process = self._processes.get(job_id)
+        if process is not None:
+            lost = not process.is_alive() and 'Training process exited unexpectedly'
+        elif status['pid']:
+            lost = not _pid_alive(status['pid']) and 'Training process exited unexpectedly'
+        else:
+            lost = not _launcher_alive(status) and 'Launching process exited before the job started'
+        if lost:
+            # Re-read: the job may have started or finished after the first read
+            status = _read_status(self._path(job_id))
+            if status['state'] == QUEUED or (status['state'] == RUNNING and status['pid'] is not None
+                                             and not _pid_alive(status['pid'])):
+                status.update(state=FAILED, error=lost, finished_at=datetime.now().isoformat())
+                _write_status(self._path(job_id), status)
+        return status
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """Status of every recorded job, newest first"""
+        names = sorted((n for n in os.listdir(self.jobs_dir) if n.endswith('.json')), reverse=True)
+        return [s for s in (self.status(n[:-len('.json')]) for n in names) if s is not None]
+
+    def active(self) -> Optional[Dict[str, Any]]:
+        """The queued or running job, if any"""
+        for status in self.jobs():
+            if status['state'] not in FINISHED_STATES:
+                return status
+        return None
+
+    def cancel(self, job_id: str, timeout: float = 10.0) -> Dict[str, Any]:
+        """Stop a job. A job already publishing its bundles is left to finish."""
+        status = self.status(job_id)
+        if status is None:
+            raise KeyError(job_id)
+        if status['state'] in FINISHED_STATES:
+            return status
+
+        process = self._processes.get(job_id)
+        if process is not None:
+            process.terminate()
+            process.join(timeout)
+        elif status.get('pid'):
+            os.kill(status['pid'], signal.SIGTERM)
+            deadline = time.time() + timeout
+            while _pid_alive(status['pid']) and time.time() < deadline:
+                time.sleep(0.1)
+
+        status = _read_status(self._path(job_id))
+        if status['state'] not in FINISHED_STATES and status.get('stage') != 'publishing':
+            if process is not None and process.is_alive():
+                process.kill()
+            status.update(state=CANCELLED, finished_at=datetime.now().isoformat())
+            _write_status(self._path(job_id), status)
+        return status
+
+    def wait(self, job_id: str, timeout: Optional[float] = None, poll: float = 0.2) -> Dict[str, Any]:
+        """Block until the job finishes (or ``timeout`` passes) and return its status"""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            status = self.status(job_id)
+            if status['state'] in FINISHED_STATES or (deadline is not None and time.time() >= deadline):
+                return status
+            time.sleep(poll)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Compiled tree-ensemble predictor for the KMRL optimization engine
+Flattens a fitted RandomForest or XGBoost classifier into NumPy node arrays and
+evaluates every tree of a batch with vectorized traversal, returning labels
+and confidences in one pass. Only NumPy is needed at prediction time.
+"""
+
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FOREST, SOFTPROB, LOGISTIC = 'forest', 'softprob', 'logistic'
+
+# Node arrays stored in a model bundle under ``forest.<name>``
+NODE_ARRAYS = ('feature', 'threshold', 'left', 'right', 'default_left', 'value', 'roots', 'classes')
+
+class CompiledForest:
+    """
+    Tree ensemble as flat node arrays.
+
+    All trees share one set of arrays, ``roots`` holds each tree's first node.
+    A sample goes left when ``x <= threshold`` (NaN follows ``default_left``).
+    Leaves point at themselves with an infinite threshold, so a batch can be
+    walked ``max_depth`` steps without tracking which rows have finished.
+    ``value`` holds each leaf's per-class contribution: class fractions for a
+    random forest, margins for XGBoost.
+    """
+
+    def __init__(self, feature, threshold, left, right, default_left, value, roots,
+                 classes, kind: str = FOREST, base_margin=None, max_depth: Optional[int] = None,
+                 n_features: Optional[int] = None):
+        self.feature = np.asarray(feature)
+        self.threshold = np.asarray(threshold)
+        self.left = np.asarray(left)
+        self.right = np.asarray(right)
+        self.default_left = np.asarray(default_left)
+        self.value = np.asarray(value)
+        self.roots = np.asarray(roots)
+        self.classes_ = np.asarray(classes)
+        self.kind = kind
+        self.base_margin = None if base_margin is None else np.asarray(base_margin, dtype=np.float64)
+        self.max_depth = max_depth if max_depth is not None else self._depth()
+        self.n_features_in_ = n_features if n_features is not None else int(self.feature.max()) + 1
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def _depth(self) -> int:
+        """Longest root-to-leaf path, found by walking every tree in lockstep"""
+        nodes = self.roots.copy()
+        depth = 0
+        while True:
+            internal = self.left[nodes] != nodes
+            if not internal.any():
+                return depth
+            # Follow both children by expanding the frontier
+            nodes = np.unique(np.concatenate([self.left[nodes[internal]], self.right[nodes[internal]]]))
+            depth += 1
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf index reached in every tree, shape (n_samples, n_trees)"""
+        X = _as_matrix(X)
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+        # Flat offsets of each row, so feature lookups are a single take()
+        row_offsets = (np.arange(X.shape[0]) * X.shape[1])[:, None]
+        flat = X.ravel()
+        has_missing = np.isnan(X).any()
+        for _ in range(self.max_depth):
+            x = flat.take(row_offsets + self.feature.take(nodes))
+            go_left = x <= self.threshold.take(nodes)
+            if has_missing:
+                go_left = np.where(np.isnan(x), self.default_left.take(nodes), go_left)
+            nodes = np.where(go_left, self.left.take(nodes), self.right.take(nodes))
+        return nodes
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        if self.kind == FOREST:
+            # Accumulate tree by tree, in the same order as scikit-learn, so
+            # averaged probabilities (and argmax ties) match bit for bit
+            total = np.zeros((leaves.shape[0], self.value.shape[1]))
+            for tree in range(self.n_trees):
+                total += self.value[leaves[:, tree]]
+            return total / self.n_trees
+
+        margin = self.value[leaves].sum(axis=1) + self.base_margin
+        if self.kind == LOGISTIC:
+            positive = 1.0 / (1.0 + np.exp(-margin[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        margin -= margin.max(axis=1, keepdims=True)
+        expd = np.exp(margin)
+        return expd / expd.sum(axis=1, keepdims=True)
+
+    def predict_with_confidence(self, X) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Labels, top-class probability and class probabilities from one traversal"""
+        probabilities = self.predict_proba(X)
+        best = np.argmax(probabilities, axis=1)
+        return self.classes_.take(best), probabilities[np.arange(len(best)), best], probabilities
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, 'classes_' if name == 'classes' else name) for name in NODE_ARRAYS}
+
+    def config(self) -> Dict[str, Any]:
+        """JSON-serializable settings that go with ``to_arrays``"""
+        return {
+            'kind': self.kind,
+            'base_margin': None if self.base_margin is None else self.base_margin.tolist(),
+            'max_depth': int(self.max_depth),
+            'n_features': int(self.n_features_in_)
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], config: Dict[str, Any]) -> 'CompiledForest':
+        return cls(*(arrays[name] for name in NODE_ARRAYS), **config)
+
+def _as_matrix(X) -> np.ndarray:
+    """Dense float64 matrix holding float32 values, as both libraries compare"""
+    if hasattr(X, 'toarray'):
+        X = X.toarray()
+    X = np.asarray(X, dtype=np.float32)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    return X.astype(np.float64)
+
+def _stack_trees(trees, n_columns: int):
+    """Concatenate per-tree node arrays, offsetting child indices"""
+    parts = {name: [] for name in ('feature', 'threshold', 'left', 'right', 'default_left', 'value')}
+    roots = []
+    offset = 0
+    for tree in trees:
+        count = len(tree['feature'])
+        leaf = tree['left'] < 0
+        own = np.arange(offset, offset + count)
+        roots.append(offset)
+        parts['feature'].append(np.where(leaf, 0, tree['feature']))
+        parts['threshold'].append(np.where(leaf, np.inf, tree['threshold']))
+        parts['left'].append(np.where(leaf, own, tree['left'] + offset))
+        parts['right'].append(np.where(leaf, own, tree['right'] + offset))
+        parts['default_left'].append(tree['default_left'].astype(bool))
+        value = np.zeros((count, n_columns))
+        value[leaf] = tree['value'][leaf]
+        parts['value'].append(value)
+        offset += count
+
+    return {
+        'feature': np.concatenate(parts['feature']).astype(np.int32),
+        'threshold': np.concatenate(parts['threshold']).astype(np.float64),
+        'left': np.concatenate(parts['left']).astype(np.int32),
+        'right': np.concatenate(parts['right']).astype(np.int32),
+        'default_left': np.concatenate(parts['default_left']),
+        'value': np.concatenate(parts['value']),
+        'roots': np.asarray(roots, dtype=np.int32)
+    }
+
+def _compile_sklearn_forest(model) -> CompiledForest:
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise TypeError("Only single-output forests can be compiled")
+    n_classes = len(model.classes_)
+    trees = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        missing_left = getattr(tree, 'missing_go_to_left', None)
+        trees.append({
+            'feature': tree.feature,
+            'threshold': tree.threshold,
+            'left': tree.children_left,
+            'right': tree.children_right,
+            'default_left': np.zeros(tree.node_count, dtype=bool) if missing_left is None else missing_left,
+            # Leaf values are class fractions, as DecisionTreeClassifier.predict_proba returns them
+            'value': tree.value[:, 0, :n_classes]
+        })
+    return CompiledForest(classes=model.classes_, kind=FOREST, n_features=model.n_features_in_,
+                          **_stack_trees(trees, n_classes))
+
+def _compile_xgboost(model) -> CompiledForest:
+    booster = model.get_booster()
+    dump = json.loads(booster.save_raw(raw_format='json'))['learner']
+    objective = dump['objective']['name']
+    if objective == 'multi:softprob':
+        kind, n_columns = SOFTPROB, int(dump['learner_model_param']['num_class'])
+    elif objective == 'binary:logistic':
+        kind, n_columns = LOGISTIC, 1
+    else:
+        raise TypeError(f"Unsupported XGBoost objective {objective}")
+
+    gbtree = dump['gradient_booster']
+    if gbtree.get('name') != 'gbtree':
+        raise TypeError(f"Unsupported XGBoost booster {gbtree.get('name')}")
+    # With early stopping XGBoost only predicts with the rounds up to the best one
+    attributes = booster.attributes()
+    n_rounds = int(attributes['best_iteration']) + 1 if 'best_iteration' in attributes else None
+    model_trees = gbtree['model']['trees']
+    tree_info = gbtree['model']['tree_info']
+    if n_rounds is not None:
+        model_trees = model_trees[:gbtree['model']['iteration_indptr'][n_rounds]]
+
+    trees = []
+    for tree, column in zip(model_trees, tree_info):
+        if any(tree.get('split_type', [])):
+            raise TypeError("Categorical XGBoost splits cannot be compiled")
+        left = np.asarray(tree['left_children'])
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        value = np.zeros((len(left), n_columns))
+        value[:, column if kind == SOFTPROB else 0] = conditions
+        trees.append({
+            'feature': np.asarray(tree['split_indices']),
+            # XGBoost goes left on x < c; for float32 inputs that is x <= the float below c
+            'threshold': np.nextafter(conditions, np.float32(-np.inf)).astype(np.float64),
+            'left': left,
+            'right': np.asarray(tree['right_children']),
+            'default_left': np.asarray(tree['default_left'], dtype=bool),
+            'value': value
+        })
+
+    stacked = _stack_trees(trees, n_columns)
+    n_features = int(dump['learner_model_param']['num_feature'])
+    forest = CompiledForest(classes=model.classes_, kind=kind, base_margin=np.zeros(n_columns),
+                            n_features=n_features, **stacked)
+
+    # The intercept's encoding in the model JSON differs across XGBoost
+    # versions, so take it from the booster's own margin for one probe row
+    import xgboost
+    probe = np.zeros((1, n_features), dtype=np.float32)
+    margin = np.asarray(booster.predict(xgboost.DMatrix(probe), output_margin=True,
+                                        iteration_range=(0, n_rounds or 0)), dtype=np.float64).reshape(1, -1)
+    leaves = forest.apply(probe)
+    forest.base_margin = (margin - forest.value[leaves].sum(axis=1))[0]
+    return forest
+
+def compile_ensemble(model) -> CompiledForest:
+    """Compile a fitted RandomForest/ExtraTrees or XGBoost classifier.
+
+    Raises TypeError for models that cannot be compiled.
+    """
+    if isinstance(model, CompiledForest):
+        return model
+    if hasattr(model, 'get_booster'):
+        return _compile_xgboost(model)
+    if hasattr(model, 'estimators_') and all(hasattr(e, 'tree_') for e in getattr(model, 'estimators_', [])) \
+            and hasattr(model, 'classes_') and hasattr(model, 'predict_proba'):
+        return _compile_sklearn_forest(model)
+    raise TypeError(f"Cannot compile {type(model).__name__}")
+
+def probe_inputs(forest: CompiledForest, n_samples: int = 512, seed: int = 0) -> np.ndarray:
+    """Inputs that land on both sides of the ensemble's split thresholds"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_samples, forest.n_features_in_))
+    internal = forest.left != np.arange(len(forest.left))
+    features = forest.feature[internal]
+    thresholds = forest.threshold[internal]
+    for column in range(forest.n_features_in_):
+        cuts = thresholds[(features == column) & np.isfinite(thresholds)]
+        if len(cuts):
+            picks = rng.choice(cuts, size=n_samples)
+            X[:, column] = picks + rng.choice([-1.0, 0.0, 1.0], size=n_samples) * np.maximum(np.abs(picks), 1.0) * 1e-3
+    return X.astype(np.float32)
+
+def verify(forest: CompiledForest, model, X=None, rtol: float = 1e-5, atol: float = 1e-6):
+    """Raise ValueError unless the compiled forest reproduces ``model`` on ``X``"""
+    X = probe_inputs(forest) if X is None else X
+    if hasattr(X, 'toarray'):
+        X = X.toarray()
+    X = np.asarray(X, dtype=np.float32)
+    labels, _, probabilities = forest.predict_with_confidence(X)
+    expected = model.predict_proba(X)
+    if not np.allclose(probabilities, expected, rtol=rtol, atol=atol):
+        raise ValueError(f"Compiled {type(model).__name__} probabilities differ by up to "
+                         f"{np.abs(probabilities - expected).max():.3g}")
+    if not np.array_equal(labels, model.predict(X)):
+        raise ValueError(f"Compiled {type(model).__name__} labels differ from the original model")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Per-factor upload ingestion for the KMRL optimization service
+The upload flow produces one CSV per scoring factor, each keyed by
+``trainId`` (see the sample_*.csv files). ``join_factors`` hash-joins them
+column-wise into the single frame ``run_optimization`` takes, and reports
+train ids that are missing from a factor or repeated within one.
+"""
+
+import os
+import logging
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ingestion import parse_csv
+
+logger = logging.getLogger(__name__)
+
+KEY = 'trainId'
+# Factor column and the file the upload flow writes it to
+FACTOR_FILES = {
+    'fitnessCertificate': 'sample_fitness_certificate.csv',
+    'jobCardStatus': 'sample_job_card_status.csv',
+    'brandingPriority': 'sample_branding_priority.csv',
+    'mileageBalancing': 'sample_mileage_balancing.csv',
+    'cleaningDetailing': 'sample_cleaning_detailing.csv',
+    'stablingGeometry': 'sample_stabling_geometry.csv'
+}
+FACTORS = list(FACTOR_FILES)
+
+Source = Union[str, Any]
+
+class UploadError(ValueError):
+    """Raised when a per-factor file cannot be joined"""
+
+def factor_sources(directory: str) -> List[str]:
+    """The per-factor files present in ``directory``, in factor order"""
+    paths = [os.path.join(directory, name) for name in FACTOR_FILES.values()]
+    return [path for path in paths if os.path.exists(path)]
+
+def _read(source: Source) -> pd.DataFrame:
+    df = parse_csv(source)
+    key = next((c for c in df.columns if c.strip() in (KEY, 'train_id')), None)
+    if key is None:
+        raise UploadError(f"{getattr(source, 'name', source)} has no {KEY} column")
+    if len(df.columns) < 2:
+        raise UploadError(f"{getattr(source, 'name', source)} has no factor column")
+    df = df.rename(columns={key: KEY})
+    df.columns = [c.strip() for c in df.columns]
+    return df
+
+def join_factors(sources: Iterable[Source], how: str = 'outer') -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Join per-factor files (paths or file objects) on ``trainId``.
+
+    Each file contributes its non-key columns. Train ids are normalized to
+    stripped strings; within a file the last row of a repeated id wins.
+    ``how='outer'`` keeps every train seen in any file, with NaN for factors
+    it is missing (preprocessing fills those with defaults); ``'inner'``
+    keeps only trains present in every file.
+
+    Returns the joined frame, in first-seen train order, and a report of
+    ``trains``, ``factors``, ``missing`` and ``duplicates`` per factor.
+    """
+    if how not in ('outer', 'inner'):
+        raise ValueError(f"how must be 'outer' or 'inner', not {how!r}")
+
+    frames = [_read(source) for source in sources]
+    if not frames:
+        raise UploadError("No per-factor files to join")
+
+    # Hash every train id once; the join itself is then integer indexing
+    keys = [df[KEY].astype(str).str.strip() for df in frames]
+    codes, trains = pd.factorize(pd.concat(keys, ignore_index=True))
+    trains = np.asarray(trains, dtype=object)
+    bounds = np.cumsum([0] + [len(k) for k in keys])
+
+    joined, missing, duplicates = {KEY: trains}, {}, {}
+    present = np.ones(len(trains), dtype=bool)
+    for df, start, stop in zip(frames, bounds[:-1], bounds[1:]):
+        file_codes = codes[start:stop]
+        # Row of each train in this file (the last one for repeated ids), -1 when absent
+        rows = np.full(len(trains), -1, dtype=np.int64)
+        np.maximum.at(rows, file_codes, np.arange(len(file_codes)))
+        found = rows >= 0
+        present &= found
+        repeated = trains[np.bincount(file_codes, minlength=len(trains)) > 1]
+        for name in (c for c in df.columns if c != KEY):
+            if name in joined:
+                raise UploadError(f"Column {name} appears in more than one file")
+            values = df[name].to_numpy()
+            if len(repeated):
+                duplicates[name] = sorted(repeated)
+            if not found.all():
+                missing[name] = trains[~found].tolist()
+                # float or object columns take NaN for the missing trains
+                values = values.astype(float) if values.dtype.kind in 'biuf' else values.astype(object)
+                column = np.full(len(trains), np.nan, dtype=values.dtype)
+                column[found] = values[rows[found]]
+            else:
+                column = values[rows]
+            joined[name] = column
+
+    df = pd.DataFrame(joined)
+    if how == 'inner' and not present.all():
+        df = df[present].reset_index(drop=True)
+
+    factors = [name for name in joined if name != KEY]
+    absent = [f for f in FACTORS if f not in factors]
+    report = {
+        'trains': len(df),
+        'factors': factors,
+        'absent_factors': absent,
+        'missing': missing,
+        'duplicates': duplicates
+    }
+    if missing or duplicates or absent:
+        logger.warning(f"Joined {len(df)} trains with gaps: {len(missing)} factors missing trains, "
+                       f"{len(duplicates)} with repeated ids, absent factors {absent}")
+    else:
+        logger.info(f"Joined {len(df)} trains across {len(factors)} factor columns")
+    return df, report
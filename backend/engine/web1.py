@@ -8,11 +8,17 @@ import pickle
 import logging
 from datetime import datetime
 import model as model
+import planner
+import scenarios
 import os
 import io
 import altair as alt
 import json
+import hashlib
 from plotly.subplots import make_subplots
+from python_optimization_service import PythonOptimizationService
+from training_jobs import TrainingJobRunner, SUCCEEDED, FAILED, CANCELLED
+from model_bundle import BundleError, ModelBundle, load_enhanced_model_bundle
 # Chatbot removed; no import needed
 
 # ----------------------------
@@ -48,6 +54,137 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# ----------------------------
+# Cached Models and Data
+# ----------------------------
+# Every widget change reruns this script, so parsing, preprocessing and
+# training are cached by upload content. Entry limits bound memory use;
+# the least recently used entry is evicted first.
+UPLOAD_CACHE_ENTRIES = 8
+MODEL_CACHE_ENTRIES = 4
+
+def file_digest(uploaded_file):
+    """Content hash of an uploaded file, used as the cache key"""
+    return hashlib.blake2b(uploaded_file.getbuffer(), digest_size=16).hexdigest()
+
+@st.cache_resource(show_spinner="Loading optimization service...")
+def get_optimization_service():
+    return PythonOptimizationService()
+
+@st.cache_resource
+def get_training_runner():
+    return TrainingJobRunner()
+
+@st.cache_data(max_entries=UPLOAD_CACHE_ENTRIES, show_spinner="Parsing upload...")
+def parse_upload(digest, _uploaded_file):
+    _uploaded_file.seek(0)
+    return model.load_dataset(_uploaded_file, use_cache=False)
+
+@st.cache_data(max_entries=UPLOAD_CACHE_ENTRIES, show_spinner="Preprocessing history...")
+def preprocess_upload(digest, _history):
+    """Training matrix and labels plus the model holding the fitted preprocessor"""
+    prepared = model.EnhancedTrainInductionModel()
+    X = prepared.preprocess_data(_history, training=True)
+    y = _history['induction_status'].map(planner.STATUS_CODES)
+    if y.isna().any():
+        raise ValueError(f"Unknown induction_status values, expected one of {planner.STATUS_LABELS}")
+    return prepared, X, y.to_numpy(dtype=int)
+
+@st.cache_resource(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def train_upload_model(digest, model_type, _history):
+    """Model trained on an upload; shared by reruns and sessions with the same file"""
+    if 'induction_status' not in _history.columns:
+        raise ValueError("Training data needs an 'induction_status' column")
+    enhanced_model, X, y = preprocess_upload(digest, _history)
+    enhanced_model.train_model(X, y, model_type=model_type, tune_hyperparams=False)
+    return enhanced_model
+
+@st.cache_resource(max_entries=MODEL_CACHE_ENTRIES, show_spinner="Loading model...")
+def load_uploaded_model(digest, _uploaded_model):
+    path = f"temp_model_{digest}.pkl"
+    try:
+        with open(path, "wb") as f:
+            f.write(_uploaded_model.getbuffer())
+        return model.load_enhanced_model(path)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+# ----------------------------
+# Background Retraining
+# ----------------------------
+@st.cache_resource(max_entries=MODEL_CACHE_ENTRIES, show_spinner="Loading retrained model...")
+def load_published_model(version):
+    """The published planner model, loaded once per version and shared by all sessions"""
+    return load_enhanced_model_bundle(get_training_runner().planner_bundle_path)
+
+def published_planner_version():
+    try:
+        return ModelBundle.open(get_training_runner().planner_bundle_path, verify=False).version
+    except BundleError:
+        return None
+
+def sync_published_model():
+    """Adopt a newly published retrained model, whichever session started the job"""
+    version = published_planner_version()
+    if version is None or version == st.session_state.get('planner_version'):
+        return
+    # Plans already running keep the model they hold
+    st.session_state.enhanced_model = load_published_model(version)
+    st.session_state.planner_version = version
+    get_optimization_service().reload_if_changed()
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+def auto_refresh(func):
+    """Rerun just this panel every few seconds where Streamlit has fragments"""
+    fragment = getattr(st, 'fragment', None)
+    return fragment(run_every=2)(func) if fragment else func
+
+def show_retraining_panel(uploaded_file, model_type):
+    runner = get_training_runner()
+    active = runner.active()
+    if st.button("🔄 Retrain Model", use_container_width=True,
+                 disabled=active is not None or uploaded_file is None,
+                 help="Retrain on the uploaded dataset in the background"):
+        history_path = os.path.join(runner.jobs_dir, f"history_{file_digest(uploaded_file)}.csv")
+        with open(history_path, "wb") as f:
+            f.write(uploaded_file.getbuffer())
+        try:
+            st.session_state.training_job = runner.submit(history_path, model_type=model_type)
+        except RuntimeError as e:
+            st.warning(str(e))
+
+    job_id = st.session_state.get('training_job') or (active['job_id'] if active else None)
+    status = runner.status(job_id) if job_id else None
+    if status is None:
+        return
+    if status['state'] in FINISHED_STATES:
+        show_training_result(status)
+    else:
+        show_training_progress(job_id)
+
+def show_training_result(status):
+    if status['state'] == SUCCEEDED:
+        sync_published_model()
+        st.success(f"Retrained model {status['planner_version']} is live")
+    elif status['state'] == FAILED:
+        st.error(f"Retraining failed: {status['error']}")
+    else:
+        st.info("Retraining cancelled")
+
+@auto_refresh
+def show_training_progress(job_id):
+    runner = get_training_runner()
+    status = runner.status(job_id)
+    if status is None or status['state'] in FINISHED_STATES:
+        # Rerun the whole app, which shows the result without this refreshing panel
+        st.rerun()
+        return
+    st.progress(status['progress'], text=f"Retraining: {status['stage'] or 'starting'}")
+    if st.button("⏹️ Cancel Retraining", use_container_width=True):
+        runner.cancel(job_id)
+
 # ----------------------------
 # Enhanced KPI Display
 # ----------------------------
@@ -399,15 +536,99 @@ def show_what_if_simulator(enhanced_model, sample_data=None):
         )
     
     if run_simulation and sample_data is not None:
+        if enhanced_model is None or enhanced_model.model is None:
+            st.warning("Run the enhanced optimization on the Dashboard tab first to train the model")
+            return
+        
         st.info("Running enhanced optimization with new parameters...")
         
-        # Placeholder for enhanced optimization call
         with st.spinner("Optimizing induction plan..."):
-            # Simulate processing time
-            import time
-            time.sleep(2)
-            
-            st.success("Simulation completed successfully!")
+            df_day = planner.select_day(sample_data, st.session_state.get('selected_date'))
+            result = planner.InductionPlanner(
+                enhanced_model, solver=st.session_state.get('solver', 'nsga2')
+            ).plan(
+                df_day,
+                min_revenue_trains=min_revenue,
+                cleaning_slots=cleaning_slots,
+                depot_bays=depot_bays,
+                weights={'branding': w_branding, 'mileage': w_mileage,
+                         'shunting': w_shunting, 'fitness': w_fitness, 'efficiency': 1.0}
+            )
+        
+        if result['success']:
+            st.success(f"Simulation completed in {result['elapsed_seconds']:.1f}s "
+                       f"({len(result['pareto_front'])} Pareto-optimal plans)")
+            show_enhanced_kpis(result['plan'])
+            show_enhanced_induction_table(result['plan'])
+        else:
+            st.error(f"Simulation failed: {result['error']}")
+
+    show_scenario_sweep(
+        enhanced_model, sample_data,
+        {'branding': w_branding, 'mileage': w_mileage, 'shunting': w_shunting,
+         'fitness': w_fitness, 'efficiency': 1.0}
+    )
+
+def show_scenario_sweep(enhanced_model, sample_data, weights):
+    st.markdown("#### 🧮 Scenario Sweep")
+    sweep_col1, sweep_col2, sweep_col3 = st.columns(3)
+    with sweep_col1:
+        revenue_options = st.multiselect("Minimum Revenue Trains", list(range(10, 31)), default=[12, 15, 18])
+    with sweep_col2:
+        slot_options = st.multiselect("Cleaning Slots", list(range(0, 16)), default=[3, 5])
+    with sweep_col3:
+        bay_options = st.multiselect("Depot Bays", list(range(5, 26)), default=[10])
+
+    grid = scenarios.scenario_grid(revenue_options, slot_options, bay_options, [weights])
+    run_sweep = st.button(f"🧮 Run {len(grid)} Scenarios", use_container_width=True,
+                          disabled=not grid or sample_data is None)
+
+    if run_sweep:
+        if enhanced_model is None or enhanced_model.model is None:
+            st.warning("Run the enhanced optimization on the Dashboard tab first to train the model")
+            return
+        df_day = planner.select_day(sample_data, st.session_state.get('selected_date'))
+        engine = scenarios.ScenarioEngine(
+            enhanced_model, df_day, solver=st.session_state.get('solver', 'nsga2')
+        )
+
+        progress = st.progress(0.0, text="Running scenarios...")
+        table = st.empty()
+        results = []
+        # Rows appear as each worker finishes
+        for result in engine.run(grid):
+            results.append(result)
+            progress.progress(len(results) / len(grid), text=f"{len(results)}/{len(grid)} scenarios")
+            table.dataframe(scenario_table(results), use_container_width=True)
+        st.session_state.sweep_results = sorted(results, key=lambda r: r['scenario_index'])
+
+    results = st.session_state.get('sweep_results')
+    if results:
+        succeeded = [r for r in results if r['success']]
+        if len(succeeded) < len(results):
+            st.warning(f"{len(results) - len(succeeded)} scenario(s) failed")
+        if succeeded:
+            labels = {scenario_label(r['scenario']): r for r in succeeded}
+            chosen = st.selectbox("Scenario plan", list(labels))
+            show_enhanced_kpis(labels[chosen]['plan'])
+            show_enhanced_induction_table(labels[chosen]['plan'])
+
+def scenario_label(scenario):
+    return (f"revenue ≥ {scenario['min_revenue_trains']}, {scenario['cleaning_slots']} cleaning slots, "
+            f"{scenario['depot_bays']} bays")
+
+def scenario_table(results):
+    rows = []
+    for result in sorted(results, key=lambda r: r['scenario_index']):
+        row = {'scenario': scenario_label(result['scenario'])}
+        if result['success']:
+            row.update(result['kpis'])
+            row['pareto_plans'] = len(result['pareto_front'])
+            row['seconds'] = result['elapsed_seconds']
+        else:
+            row['error'] = result['error']
+        rows.append(row)
+    return pd.DataFrame(rows)
 
 # ----------------------------
 # Explainability Dashboard (without SHAP)
@@ -425,7 +646,7 @@ def show_explainability_dashboard(induction_list, enhanced_model, sample_data):
         st.markdown("#### 📊 Feature Importance")
         
         # Get feature importance from the model
-        if enhanced_model.model is not None:
+        if enhanced_model is not None and enhanced_model.model is not None:
             importance_df = enhanced_model.get_feature_importance()
             if importance_df is not None:
                 top_features = importance_df.head(15)
@@ -478,9 +699,6 @@ def main():
     st.markdown('<h1 class="main-header">🚇 KMRL AI-Powered Induction Optimizer</h1>', 
                 unsafe_allow_html=True)
     
-    # Initialize enhanced model
-    enhanced_model = model.EnhancedTrainInductionModel()
-    
     # Main tabs
     tab1, tab2, tab3, tab4 = st.tabs([
         "📊 Dashboard", 
@@ -494,6 +712,9 @@ def main():
         st.session_state.induction_list = None
     if 'sample_data' not in st.session_state:
         st.session_state.sample_data = None
+    if 'enhanced_model' not in st.session_state:
+        st.session_state.enhanced_model = None
+    sync_published_model()
     # Chatbot removed; no chat session state maintained
     
     with tab1:
@@ -524,6 +745,12 @@ def main():
                     ["xgboost", "random_forest"],
                     help="Select machine learning model"
                 )
+                solver = st.selectbox(
+                    "Planner",
+                    ["nsga2", "milp"],
+                    help="NSGA-II explores trade-offs; MILP returns one provably optimal plan fast"
+                )
+                st.session_state.solver = solver
             with q_col2:
                 optimize_button = st.button(
                     "🎯 Run Enhanced Optimization",
@@ -533,41 +760,26 @@ def main():
         
         if uploaded_file is not None:
             try:
-                sample_data = pd.read_csv(uploaded_file)
+                upload_key = file_digest(uploaded_file)
+                sample_data = parse_upload(upload_key, uploaded_file)
                 st.session_state.sample_data = sample_data
                 
                 st.success(f"✅ Loaded {len(sample_data)} train records")
                 
                 if optimize_button:
                     with st.spinner("Training enhanced model and optimizing..."):
-                        # Preprocess data
-                        X_processed = enhanced_model.preprocess_data(sample_data, training=True)
+                        enhanced_model = train_upload_model(upload_key, model_type, sample_data)
+                        st.session_state.enhanced_model = enhanced_model
+                        st.session_state.selected_date = selected_date
                         
-                        # For demo purposes, create sample results
-                        # In real implementation, you would train the model and run optimization
-                        st.session_state.induction_list = [
-                            {
-                                'train_id': f"TRN_{i:03d}",
-                                'assigned_status': np.random.choice(["Service", "Maintenance", "Standby"], p=[0.6, 0.3, 0.1]),
-                                'readiness': np.random.uniform(0.7, 1.0),
-                                'sla_deficit': np.random.uniform(0, 20),
-                                'mileage': np.random.uniform(100, 500),
-                                'shunting_time': np.random.uniform(5, 60),
-                                'turnout_penalty': np.random.uniform(0, 100),
-                                'maintenance_cost': np.random.uniform(1000, 5000),
-                                'explainability': {
-                                    'fitness_score': np.random.uniform(0.6, 1.0),
-                                    'branding_efficiency': np.random.uniform(0.5, 1.0),
-                                    'job_card_status': np.random.choice(["Open", "Closed", "Pending"]),
-                                    'fitness_ok': np.random.choice([True, False])
-                                }
-                            }
-                            for i in range(min(20, len(sample_data)))
-                        ]
+                        df_day = planner.select_day(sample_data, selected_date)
+                        result = planner.InductionPlanner(enhanced_model, solver=solver).plan(df_day)
                         
-                        st.success("✅ Enhanced optimization completed!")
-                        if st.session_state.induction_list:
-                            pass
+                        if result['success']:
+                            st.session_state.induction_list = result['plan']
+                            st.success(f"✅ Enhanced optimization completed in {result['elapsed_seconds']:.1f}s!")
+                        else:
+                            st.error(f"Optimization failed: {result['error']}")
                 
                 # Display results if available
                 if st.session_state.induction_list:
@@ -581,12 +793,12 @@ def main():
             st.info("📁 Please upload a CSV file to get started")
     
     with tab2:
-        show_what_if_simulator(enhanced_model, st.session_state.sample_data)
+        show_what_if_simulator(st.session_state.enhanced_model, st.session_state.sample_data)
     
     with tab3:
         show_explainability_dashboard(
             st.session_state.induction_list, 
-            enhanced_model, 
+            st.session_state.enhanced_model, 
             st.session_state.sample_data
         )
     
@@ -597,6 +809,8 @@ def main():
         
         with col1:
             st.markdown("#### Model Information")
+            service = get_optimization_service()
+            st.caption(f"Serving model: {service.model_version or 'not loaded'}")
             st.info("""
             **Enhanced Model Features:**
             - XGBoost with hyperparameter tuning
@@ -609,12 +823,11 @@ def main():
         with col2:
             st.markdown("#### Model Operations")
             
-            if st.button("🔄 Retrain Model", use_container_width=True):
-                st.info("Model retraining initiated...")
-                # Placeholder for retraining logic
+            show_retraining_panel(uploaded_file, model_type)
             
-            if st.button("💾 Save Model", use_container_width=True):
-                model.save_enhanced_model(enhanced_model)
+            if st.button("💾 Save Model", use_container_width=True,
+                         disabled=st.session_state.enhanced_model is None):
+                model.save_enhanced_model(st.session_state.enhanced_model)
                 st.success("Model saved successfully!")
             
             uploaded_model = st.file_uploader(
@@ -625,11 +838,7 @@ def main():
             
             if uploaded_model:
                 try:
-                    # Save uploaded file temporarily
-                    with open("temp_model.pkl", "wb") as f:
-                        f.write(uploaded_model.getbuffer())
-                    enhanced_model = model.load_enhanced_model("temp_model.pkl")
-                    os.remove("temp_model.pkl")
+                    st.session_state.enhanced_model = load_uploaded_model(file_digest(uploaded_model), uploaded_model)
                     st.success("Model loaded successfully!")
                 except Exception as e:
                     st.error(f"Error loading model: {str(e)}")
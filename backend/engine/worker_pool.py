@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Pre-forked worker pool for the KMRL optimization service
+The supervisor imports the engine and loads the model once, then forks
+worker processes that inherit both copy-on-write. It speaks the same
+JSON-lines protocol as ``OptimizationWorker`` on stdin/stdout, so clients
+need no changes; replies may arrive out of order and are matched by ``id``.
+
+Optimization requests go to the idle worker that has waited longest.
+``health``, ``reload``, ``metrics`` and ``shutdown`` are answered by the
+supervisor itself. A worker retires after ``max_requests`` requests or
+once its resident memory reaches ``max_rss_mb``, and is replaced by a fresh
+fork; a reload (or a newly published bundle) replaces every worker.
+
+The supervisor forks for as long as it runs, so it starts no threads: the
+``/metrics`` port and the metrics file are served from its selector loop.
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import logging
+import selectors
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import metrics
+from instrumentation import StageTimer, rss_mb
+from python_optimization_service import OptimizationWorker, PythonOptimizationService
+
+logger = logging.getLogger(__name__)
+
+HAS_FORK = hasattr(os, 'fork')
+# Worker-to-supervisor lines starting with this byte are control messages
+CONTROL = b'@'
+READ_SIZE = 1 << 20
+
+class _Child:
+    def __init__(self, pid: int, sock: socket.socket):
+        self.pid = pid
+        self.sock = sock
+        self.buffer = b''
+        # (request id, dispatch time) while busy
+        self.request: Optional[Tuple[Any, float]] = None
+        self.idle_since = time.perf_counter()
+        self.served = 0
+        self.retiring: Optional[str] = None
+
+def _lines(buffer: bytes, chunk: bytes) -> Tuple[List[bytes], bytes]:
+    """Complete lines of ``buffer + chunk`` and the unfinished remainder"""
+    *lines, rest = (buffer + chunk).split(b'\n')
+    return [line.strip() for line in lines if line.strip()], rest
+
+class WorkerPool:
+    """Supervisor of pre-forked optimization workers (Unix only)"""
+
+    def __init__(self, service: Optional[PythonOptimizationService] = None, workers: Optional[int] = None,
+                 max_requests: int = 0, max_rss_mb: Optional[float] = None,
+                 instream=None, outstream=None, timings: bool = False, profile=None,
+                 metrics_port: Optional[int] = None, metrics_file: Optional[str] = None,
+                 metrics_interval: float = 15.0):
+        if not HAS_FORK:
+            raise RuntimeError("The worker pool needs os.fork")
+        self.service = service or PythonOptimizationService()
+        self.size = workers or os.cpu_count() or 1
+        self.max_requests = max_requests
+        self.max_rss_mb = max_rss_mb
+        self.timings = timings
+        self.profile = profile
+        self.instream = instream or sys.stdin
+        self.outstream = outstream or sys.stdout
+        self.children: List[_Child] = []
+        self.queue: Deque[Tuple[Any, bytes]] = deque()
+        # poll rather than epoll, which refuses stdin redirected from a regular file
+        self.selector = getattr(selectors, 'PollSelector', selectors.SelectSelector)()
+        self.started_at = time.time()
+        self.requests_served = 0
+        self.errors = 0
+        self.reload_requested = False
+        self.running = False
+        self._input = b''
+        self.metrics_port = metrics_port
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+        self.metrics_server = None
+        self._next_export = None
+
+    def send(self, message: Dict[str, Any]):
+        """Write a single protocol message"""
+        self.outstream.write(json.dumps(message) + "\n")
+        self.outstream.flush()
+
+    def health(self) -> Dict[str, Any]:
+        """Pool status, including every worker"""
+        return {
+            'status': 'ok' if self.service.is_ready() else 'model_not_loaded',
+            'model_loaded': self.service.is_ready(),
+            'model_version': self.service.model_version,
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - self.started_at, 3),
+            'requests_served': self.requests_served,
+            'errors': self.errors,
+            'queued': len(self.queue),
+            'workers': [{'pid': c.pid, 'busy': c.request is not None, 'served': c.served} for c in self.children]
+        }
+
+    def reload(self) -> bool:
+        """Reload the model in the supervisor and replace every worker with a fresh fork"""
+        self.reload_requested = False
+        success = self.service.load_model()
+        logger.info(f"Pool model reload {'succeeded' if success else 'failed'}")
+        if success:
+            # Share the new model with the replacement forks as well
+            gc.freeze()
+            self._retire_all('reload')
+        return success
+
+    def _request_reload(self, signum, frame):
+        self.reload_requested = True
+
+    # -- workers --------------------------------------------------------------
+
+    def _spawn(self):
+        parent_sock, child_sock = socket.socketpair()
+        self.outstream.flush()
+        pid = os.fork()
+        if pid == 0:
+            parent_sock.close()
+            code = 0
+            try:
+                self._child_main(child_sock)
+            except BaseException as e:
+                logger.error(f"Pool worker {os.getpid()} failed: {str(e)}")
+                code = 1
+            finally:
+                os._exit(code)
+        child_sock.close()
+        child = _Child(pid, parent_sock)
+        self.children.append(child)
+        self.selector.register(parent_sock, selectors.EVENT_READ, child)
+
+    def _child_main(self, sock: socket.socket):
+        # Drop the supervisor's descriptors; the model and imports stay shared
+        self.selector.close()
+        for other in self.children:
+            other.sock.close()
+        if self.metrics_server is not None:
+            self.metrics_server.socket.close()
+        for signum in ('SIGHUP', 'SIGTERM', 'SIGINT'):
+            if hasattr(signal, signum):
+                signal.signal(getattr(signal, signum), signal.SIG_DFL)
+
+        worker = OptimizationWorker(self.service, timings=self.timings, profile=self.profile)
+        stream = sock.makefile('rwb')
+        for line in stream:
+            timer = StageTimer()
+            message: Any = None
+            errors = metrics.ERRORS.values()
+            try:
+                with timer.stage('parse'):
+                    message = json.loads(line)
+                reply = worker.handle(message, timer)
+            except Exception as e:
+                reply = {'id': message.get('id') if isinstance(message, dict) else None,
+                         'type': 'error', 'error': str(e)}
+            if reply.get('type') == 'optimize':
+                # The supervisor owns the exposed registry, so report what this request recorded
+                result = reply['result']
+                observed = {
+                    'type': 'observed',
+                    'stages_ms': timer.stages,
+                    'seconds': time.perf_counter() - timer.started,
+                    'trains': len(result.get('results', [])),
+                    'success': bool(result.get('success')),
+                    'errors': {key[0]: count - errors.get(key, 0)
+                               for key, count in metrics.ERRORS.values().items() if count != errors.get(key, 0)}
+                }
+                stream.write(CONTROL + json.dumps(observed).encode() + b'\n')
+
+            reason = None
+            if self.max_requests and worker.requests_served >= self.max_requests:
+                reason = 'max_requests'
+            elif self.max_rss_mb and (rss_mb() or 0) >= self.max_rss_mb:
+                reason = 'max_rss'
+            if reason:
+                # Before the reply, so the supervisor never sends this worker another request
+                stream.write(CONTROL + json.dumps({'type': 'retiring', 'reason': reason}).encode() + b'\n')
+            stream.write(json.dumps(reply).encode() + b'\n')
+            stream.flush()
+            if reason:
+                break
+
+    def _retire(self, child: _Child, reason: str):
+        """Ask a worker to exit; a busy one finishes its request first"""
+        child.retiring = child.retiring or reason
+        if child.request is None:
+            try:
+                child.sock.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+    def _retire_all(self, reason: str):
+        for child in list(self.children):
+            self._retire(child, reason)
+
+    def _on_exit(self, child: _Child):
+        self.selector.unregister(child.sock)
+        child.sock.close()
+        os.waitpid(child.pid, 0)
+        self.children.remove(child)
+        if child.request is not None:
+            self.errors += 1
+            metrics.ERRORS.inc(type='worker_crashed')
+            try:
+                self.send({'id': child.request[0], 'type': 'error', 'error': f'Worker {child.pid} exited unexpectedly'})
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not report the failed request of worker {child.pid}: {str(e)}")
+        reason = child.retiring or 'crashed'
+        log = logger.warning if reason == 'crashed' else logger.info
+        log(f"Worker {child.pid} exited ({reason}) after {child.served} requests")
+        if self.running or self.queue:
+            metrics.WORKER_RESTARTS.inc(reason=reason)
+            self._spawn()
+
+    def _read_child(self, child: _Child):
+        try:
+            chunk = child.sock.recv(READ_SIZE)
+        except ConnectionResetError:
+            chunk = b''
+        if not chunk:
+            self._on_exit(child)
+            return
+        lines, child.buffer = _lines(child.buffer, chunk)
+        for line in lines:
+            if line.startswith(CONTROL):
+                self._on_control(child, json.loads(line[1:]))
+                continue
+            self.outstream.write(line.decode() + "\n")
+            self.outstream.flush()
+            child.request = None
+            child.served += 1
+            child.idle_since = time.perf_counter()
+            if child.retiring:
+                self._retire(child, child.retiring)
+
+    def _on_control(self, child: _Child, message: Dict[str, Any]):
+        if message['type'] == 'observed':
+            self.requests_served += 1
+            if not message['success']:
+                self.errors += 1
+            metrics.observe_request(message['stages_ms'], message['seconds'], message['trains'], message['success'])
+            for error_type, count in message['errors'].items():
+                metrics.ERRORS.inc(count, type=error_type)
+        elif message['type'] == 'retiring':
+            # The worker exits on its own after the reply that follows
+            child.retiring = message['reason']
+
+    def _dispatch(self):
+        while self.queue:
+            idle = [c for c in self.children if c.request is None and c.retiring is None]
+            if not idle:
+                break
+            child = min(idle, key=lambda c: c.idle_since)
+            request_id, line = self.queue.popleft()
+            try:
+                child.sock.sendall(line + b'\n')
+            except OSError:
+                # The worker died; its exit is picked up by the next read
+                self.queue.appendleft((request_id, line))
+                child.retiring = 'crashed'
+                continue
+            child.request = (request_id, time.perf_counter())
+
+    # -- input ----------------------------------------------------------------
+
+    def _read_input(self, fd: int):
+        chunk = os.read(fd, READ_SIZE)
+        if not chunk:
+            self._close_input()
+            return
+        lines, self._input = _lines(self._input, chunk)
+        for line in lines:
+            if self.running:
+                self._on_request(line)
+
+    def _close_input(self):
+        self.running = False
+        try:
+            self.selector.unregister(self.instream.fileno())
+        except (KeyError, ValueError):
+            pass
+
+    def _on_request(self, line: bytes):
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError as e:
+            self.errors += 1
+            metrics.ERRORS.inc(type='invalid_json')
+            self.send({'id': None, 'type': 'error', 'error': f"Invalid JSON: {str(e)}"})
+            return
+        if not isinstance(message, dict):
+            self.errors += 1
+            metrics.ERRORS.inc(type='invalid_request')
+            self.send({'id': None, 'type': 'error', 'error': 'Request must be a JSON object'})
+            return
+
+        if self.reload_requested:
+            self.reload()
+        elif self.service.reload_if_changed():
+            # Pick up bundles published by a retraining job in fresh forks
+            self._retire_all('reload')
+
+        message_type = message.get('type', 'optimize')
+        reply: Dict[str, Any] = {'id': message.get('id'), 'type': message_type}
+        if message_type == 'health':
+            self.send({**reply, **self.health()})
+        elif message_type == 'reload':
+            reply['success'] = self.reload()
+            reply['model_loaded'] = self.service.is_ready()
+            reply['model_version'] = self.service.model_version
+            self.send(reply)
+        elif message_type == 'metrics':
+            self._update_gauges()
+            self.send({**reply, 'metrics': metrics.registry.render()})
+        elif message_type == 'shutdown':
+            self.send({**reply, 'success': True})
+            self._close_input()
+        else:
+            # Workers reject unknown types themselves, as the single worker does
+            self.queue.append((message.get('id'), line))
+
+    def _update_gauges(self):
+        busy = sum(c.request is not None for c in self.children)
+        metrics.POOL_WORKERS.set(busy, state='busy')
+        metrics.POOL_WORKERS.set(len(self.children) - busy, state='idle')
+        metrics.POOL_QUEUED.set(len(self.queue))
+
+    # -- metrics --------------------------------------------------------------
+
+    def _start_metrics(self):
+        if self.metrics_port is not None:
+            self.metrics_server = metrics.make_http_server(int(self.metrics_port))
+            self.selector.register(self.metrics_server.socket, selectors.EVENT_READ, 'metrics')
+        if self.metrics_file:
+            self._next_export = time.monotonic() + self.metrics_interval
+
+    def _serve_metrics(self):
+        self._update_gauges()
+        self.metrics_server.handle_request()
+
+    def _export_metrics(self, force: bool = False):
+        if self._next_export is None or (not force and time.monotonic() < self._next_export):
+            return
+        self._next_export = time.monotonic() + self.metrics_interval
+        self._update_gauges()
+        try:
+            metrics.registry.write(self.metrics_file)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {self.metrics_file}: {str(e)}")
+
+    def _stop_metrics(self):
+        self._export_metrics(force=True)
+        if self.metrics_server is not None:
+            self.metrics_server.server_close()
+
+    def _select_timeout(self) -> float:
+        if self._next_export is None:
+            return 1.0
+        return min(1.0, max(0.0, self._next_export - time.monotonic()))
+
+    # -- main loop ------------------------------------------------------------
+
+    def serve(self):
+        """Serve until shutdown or end of input, then let in-flight requests finish"""
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self._request_reload)
+        self._start_metrics()
+        # Keep the loaded model out of the collector's generations, so GC
+        # passes in the workers do not write to (and un-share) its pages.
+        # Once, not per fork, or supervisor garbage piles up in the
+        # permanent generation
+        gc.freeze()
+        for _ in range(self.size):
+            self._spawn()
+        self.running = True
+        self.selector.register(self.instream.fileno(), selectors.EVENT_READ, None)
+        self.send({'type': 'ready', **self.health()})
+        logger.info(f"Worker pool of {self.size} ready (max_requests={self.max_requests}, "
+                    f"max_rss_mb={self.max_rss_mb})")
+
+        try:
+            while self.running or self.queue or any(c.request is not None for c in self.children):
+                for key, _ in self.selector.select(timeout=self._select_timeout()):
+                    if key.data is None:
+                        self._read_input(key.fd)
+                    elif key.data == 'metrics':
+                        self._serve_metrics()
+                    else:
+                        self._read_child(key.data)
+                self._dispatch()
+                self._update_gauges()
+                self._export_metrics()
+        finally:
+            self.running = False
+            self.queue.clear()
+            for child in list(self.children):
+                if child.request is not None:
+                    # Only reached on an error: do not wait on a busy worker
+                    os.kill(child.pid, signal.SIGTERM)
+                self._retire(child, 'shutdown')
+            while self.children:
+                self._on_exit(self.children[0])
+            self._stop_metrics()
+            self.selector.close()
+            gc.unfreeze()
+        logger.info(f"Worker pool exiting after {self.requests_served} requests")
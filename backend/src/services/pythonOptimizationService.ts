@@ -1,4 +1,4 @@
-import { spawn } from 'child_process';
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
 import { logger } from '../utils/logger';
 import path from 'path';
 
@@ -34,14 +34,196 @@ export interface PythonOptimizationResponse {
   error?: string;
 }
 
+interface PendingWorkerRequest {
+  resolve: (message: any) => void;
+  reject: (error: Error) => void;
+  timer: NodeJS.Timeout;
+  worker: ChildProcessWithoutNullStreams;
+}
+
 export class PythonOptimizationService {
   private static readonly PYTHON_SCRIPT_PATH = path.join(__dirname, '../../engine/python_optimization_service.py');
   private static readonly PYTHON_EXECUTABLE = process.env.PYTHON_PATH || (process.platform === 'win32' ? 'python' : 'python3');
+  private static readonly USE_PERSISTENT_WORKER = process.env.PYTHON_WORKER_MODE !== 'false';
+  private static readonly REQUEST_TIMEOUT_MS = 30000;
+
+  private static worker: ChildProcessWithoutNullStreams | null = null;
+  private static workerReady: Promise<void> | null = null;
+  private static workerBuffer = '';
+  private static nextRequestId = 1;
+  private static pending = new Map<number, PendingWorkerRequest>();
 
   /**
    * Run optimization using the Python service
    */
   static async runOptimization(data: any[]): Promise<PythonOptimizationResponse> {
+    if (!this.USE_PERSISTENT_WORKER) {
+      return this.runOptimizationProcess(data);
+    }
+
+    logger.info(`Running Python optimization for ${data.length} trains`);
+    const reply = await this.sendWorkerRequest({ type: 'optimize', data });
+    logger.info(`Python optimization completed successfully`);
+    return reply.result;
+  }
+
+  /**
+   * Ask the persistent worker to reload the model files from disk
+   */
+  static async reloadModel(): Promise<boolean> {
+    const reply = await this.sendWorkerRequest({ type: 'reload' });
+    return Boolean(reply.success);
+  }
+
+  /**
+   * Stop the persistent worker, if one is running
+   */
+  static shutdownWorker(): void {
+    if (this.worker) {
+      this.worker.stdin.write(JSON.stringify({ type: 'shutdown' }) + '\n');
+      this.worker.stdin.end();
+    }
+  }
+
+  /**
+   * Start the long-lived Python worker and wait for its ready message
+   */
+  private static ensureWorker(): Promise<void> {
+    if (this.worker && this.workerReady) {
+      return this.workerReady;
+    }
+
+    const worker = spawn(this.PYTHON_EXECUTABLE, [this.PYTHON_SCRIPT_PATH, '--worker'], {
+      cwd: path.dirname(this.PYTHON_SCRIPT_PATH),
+      stdio: ['pipe', 'pipe', 'pipe']
+    });
+    this.worker = worker;
+    this.workerBuffer = '';
+
+    this.workerReady = new Promise((resolve, reject) => {
+      let ready = false;
+
+      worker.stdout.on('data', (chunk) => {
+        this.workerBuffer += chunk.toString();
+        let newline = this.workerBuffer.indexOf('\n');
+        while (newline >= 0) {
+          const line = this.workerBuffer.slice(0, newline).trim();
+          this.workerBuffer = this.workerBuffer.slice(newline + 1);
+          newline = this.workerBuffer.indexOf('\n');
+          if (!line) {
+            continue;
+          }
+
+          let message: any;
+          try {
+            message = JSON.parse(line);
+          } catch (parseError) {
+            logger.error('Failed to parse Python worker message:', parseError);
+            continue;
+          }
+
+          if (message.type === 'ready') {
+            ready = true;
+            logger.info(`Python optimization worker ready (pid ${message.pid}, model loaded: ${message.model_loaded})`);
+            resolve();
+            continue;
+          }
+
+          const request = this.pending.get(message.id);
+          if (!request) {
+            logger.warn('Python worker replied to an unknown request:', message);
+            continue;
+          }
+          this.pending.delete(message.id);
+          clearTimeout(request.timer);
+          if (message.type === 'error') {
+            request.reject(new Error(`Python optimization failed: ${message.error}`));
+          } else {
+            request.resolve(message);
+          }
+        }
+      });
+
+      worker.stderr.on('data', (chunk) => {
+        logger.debug(`Python worker: ${chunk.toString().trim()}`);
+      });
+
+      const handleExit = (error: Error) => {
+        if (this.worker === worker) {
+          this.worker = null;
+          this.workerReady = null;
+        }
+        // Requests already sent to a replacement worker are unaffected
+        this.pending.forEach((request, id) => {
+          if (request.worker !== worker) {
+            return;
+          }
+          clearTimeout(request.timer);
+          this.pending.delete(id);
+          request.reject(error);
+        });
+        if (!ready) {
+          reject(error);
+        }
+      };
+
+      worker.on('error', (error) => {
+        logger.error('Failed to start Python optimization worker:', error);
+        handleExit(new Error(`Failed to start Python process: ${error.message}`));
+      });
+
+      worker.on('close', (code) => {
+        logger.warn(`Python optimization worker exited with code ${code}`);
+        handleExit(new Error(`Python optimization worker exited with code ${code}`));
+      });
+    });
+
+    return this.workerReady;
+  }
+
+  /**
+   * Send one request to the persistent worker and wait for its reply
+   */
+  private static async sendWorkerRequest(message: Record<string, any>): Promise<any> {
+    await this.ensureWorker();
+    const worker = this.worker;
+    if (!worker) {
+      throw new Error('Python optimization worker is not running');
+    }
+
+    const id = this.nextRequestId++;
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error('Python optimization timeout'));
+        // The worker is serial, so a hung request would stall every later one
+        this.restartWorker(worker);
+      }, this.REQUEST_TIMEOUT_MS);
+
+      this.pending.set(id, { resolve, reject, timer, worker });
+      worker.stdin.write(JSON.stringify({ ...message, id }) + '\n');
+    });
+  }
+
+  /**
+   * Kill a worker that stopped answering and start a fresh one
+   */
+  private static restartWorker(worker: ChildProcessWithoutNullStreams): void {
+    if (this.worker === worker) {
+      this.worker = null;
+      this.workerReady = null;
+    }
+    logger.warn(`Killing unresponsive Python optimization worker (pid ${worker.pid})`);
+    worker.kill('SIGKILL');
+    this.ensureWorker().catch((error) => {
+      logger.error('Failed to restart Python optimization worker:', error);
+    });
+  }
+
+  /**
+   * Run optimization in a one-off Python process
+   */
+  private static async runOptimizationProcess(data: any[]): Promise<PythonOptimizationResponse> {
     return new Promise((resolve, reject) => {
       try {
         // Convert data to JSON string
@@ -49,11 +231,12 @@ export class PythonOptimizationService {
         
         logger.info(`Running Python optimization for ${data.length} trains`);
         
-        // Spawn Python process
-        const pythonProcess = spawn(this.PYTHON_EXECUTABLE, [this.PYTHON_SCRIPT_PATH, jsonData], {
+        // Spawn Python process; the fleet goes over stdin, which has no argv size limit
+        const pythonProcess = spawn(this.PYTHON_EXECUTABLE, [this.PYTHON_SCRIPT_PATH, '--input', '-', '--format', 'json'], {
           cwd: path.dirname(this.PYTHON_SCRIPT_PATH),
           stdio: ['pipe', 'pipe', 'pipe']
         });
+        pythonProcess.stdin.end(jsonData);
 
         let stdout = '';
         let stderr = '';
@@ -95,7 +278,7 @@ export class PythonOptimizationService {
         setTimeout(() => {
           pythonProcess.kill();
           reject(new Error('Python optimization timeout'));
-        }, 30000); // 30 second timeout
+        }, this.REQUEST_TIMEOUT_MS);
 
       } catch (error) {
         logger.error('Error running Python optimization:', error);
@@ -109,6 +292,12 @@ export class PythonOptimizationService {
    */
   static async checkServiceHealth(): Promise<boolean> {
     try {
+      if (this.USE_PERSISTENT_WORKER) {
+        const health = await this.sendWorkerRequest({ type: 'health' });
+        return Boolean(health.model_loaded);
+      }
+
+
       // Test with minimal data
       const testData = [{
         trainId: 'TEST001',